@@ -1,7 +1,13 @@
+import os
+import sys
 import pandas as pd
 from fuzzywuzzy import process
 import hashlib
 
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_athletes import resolve_athlete_ids
+
 # Load data
 iwt_df = pd.read_csv('Athlete Database/Clean Data/iwt_sailors_clean.csv')
 pwa_df = pd.read_csv('Athlete Database/Clean Data/pwa_sailors_clean.csv')
@@ -128,8 +134,8 @@ merged_df = merged_df.merge(pwa_selected, how='left', on='best_match')
 # Rename 'best_match' to 'pwa_Name' for consistency
 merged_df.rename(columns={'best_match': 'pwa_name'}, inplace=True)
 
-# fix ketih tabiul issue 
-merged_df['iwt_id'] = merged_df['iwt_id'].replace(1084037, 1416269)
+# Resolve duplicate LiveHeats profiles (e.g. Keith Teboul) via the alias table
+merged_df['iwt_id'] = resolve_athlete_ids(merged_df['iwt_id'], 'iwt')
 merged_df = merged_df.drop_duplicates()
 
 
@@ -1,12 +1,20 @@
-import requests
 import json
 import os
-import time
+import sys
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_http import http_post, apply_response_store_flags
+from utils.functions_iwt_scrape import GRAPHQL_URL, fetch_event_divisions_batch
+
+# --record / --replay: record responses to, or answer them from, the response store
+apply_response_store_flags()
 
 ########## GET ALL EVENT DATA FROM 'WORLD WAVE TOUR' ON LIVE HEATS ############
 def fetch_wave_tour_events():
-    url = "https://liveheats.com/api/graphql"
+    url = GRAPHQL_URL
     headers = {
         "Content-Type": "application/json",
         "User-Agent": "Mozilla/5.0"
@@ -35,7 +43,7 @@ def fetch_wave_tour_events():
     variables = {"shortName": "WaveTour"}
     payload = {"query": query, "variables": variables}
     
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_post(url, headers=headers, json=payload)
     
     if response.status_code == 200:
         data = response.json()
@@ -71,37 +79,6 @@ def extract_results_published_events(file_path):
     
     return event_ids
 
-def fetch_event_divisions(event_id):
-    url = "https://liveheats.com/api/graphql"
-    headers = {
-        "Content-Type": "application/json",
-        "User-Agent": "Mozilla/5.0"
-    }
-    
-    query = """
-    query getEvent($id: ID!) {
-      event(id: $id) {
-        eventDivisions {
-          id
-        }
-      }
-    }
-    """
-    
-    payload = {"query": query, "variables": {"id": event_id}}
-    response = requests.post(url, headers=headers, json=payload)
-    
-    if response.status_code == 200:
-        data = response.json()
-        event_division_ids = [div["id"] for div in data["data"]["event"]["eventDivisions"]]
-        return event_division_ids
-    else:
-        print(f"Error fetching event {event_id}: {response.status_code}, {response.text}")
-        return []
-
-
-# Define the base URL for the GraphQL API
-GRAPHQL_URL = "https://liveheats.com/api/graphql"
 
 # Define the directory where results will be saved
 OUTPUT_DIR = "iwt_athletes"
@@ -109,6 +86,13 @@ OUTPUT_DIR = "iwt_athletes"
 # Ensure the output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+# Merged unique-athlete output and concurrent roster fetches
+IWT_SAILORS_RAW_JSON = "Athlete Database/Raw Data/iwt_sailors_raw.json"
+ROSTER_WORKERS = 8
+
+def roster_file(event_id, division_id):
+    return f"{OUTPUT_DIR}/event_{event_id}_division_{division_id}_unique_athletes.json"
+
 def fetch_event_division_results(event_id, division_id):
     """
     Fetches athlete details for competitors in a specific event division,
@@ -116,6 +100,7 @@ def fetch_event_division_results(event_id, division_id):
     
     :param event_id: The ID of the event.
     :param division_id: The ID of the event division.
+    :return: The list of unique athletes, or None if the request failed.
     """
     query = """
     query getAthleteInfo($id: ID!) {
@@ -137,7 +122,7 @@ def fetch_event_division_results(event_id, division_id):
 
     variables = {"id": str(division_id)}
 
-    response = requests.post(GRAPHQL_URL, json={"query": query, "variables": variables})
+    response = http_post(GRAPHQL_URL, json={"query": query, "variables": variables})
 
     if response.status_code == 200:
         data = response.json()
@@ -152,14 +137,16 @@ def fetch_event_division_results(event_id, division_id):
         # Convert the unique athletes dictionary into a list.
         unique_athlete_list = list(unique_athletes.values())
 
-        file_name = f"{OUTPUT_DIR}/event_{event_id}_division_{division_id}_unique_athletes.json"
+        file_name = roster_file(event_id, division_id)
         with open(file_name, "w", encoding="utf-8") as file:
             json.dump(unique_athlete_list, file, indent=4, ensure_ascii=False)
         
         print(f"Saved unique athlete details for Event {event_id}, Division {division_id} -> {file_name}")
+        return unique_athlete_list
     else:
         print(f"Failed to fetch data for Event {event_id}, Division {division_id}. HTTP {response.status_code}")
         print(response.text)
+        return None
 
 
 
@@ -167,12 +154,36 @@ def fetch_event_division_results(event_id, division_id):
 # Instead of using hard-coded pairs, extract event IDs from the saved events file
 event_ids = extract_results_published_events("wave_tour_events.json")
 
-# Loop through each event, then fetch and process all divisions for that event
-for event_id in event_ids:
-    division_ids = fetch_event_divisions(event_id)
-    for division_id in division_ids:
-        fetch_event_division_results(event_id, division_id)
-        time.sleep(1)  # Adding a delay to prevent rate limits
+# All events here are results-published, so a division whose roster file
+# already exists is finished and never needs fetching again.
+divisions_by_event = fetch_event_divisions_batch(event_ids)
+all_divisions = [(event_id, division_id)
+                 for event_id in event_ids
+                 for division_id, _ in divisions_by_event.get(event_id, [])]
+to_fetch = [(e, d) for e, d in all_divisions if not os.path.exists(roster_file(e, d))]
+to_fetch_set = set(to_fetch)
+print(f"{len(all_divisions) - len(to_fetch)} division rosters already saved, fetching {len(to_fetch)}")
+
+# Start from the previous merged output (or the saved rosters on a first run)
+# and merge new rosters straight into the unique-athlete map.
+unique_athletes = {}
+if os.path.exists(IWT_SAILORS_RAW_JSON):
+    with open(IWT_SAILORS_RAW_JSON, "r", encoding="utf-8") as f:
+        unique_athletes = {athlete["id"]: athlete for athlete in json.load(f)}
+else:
+    for event_id, division_id in all_divisions:
+        if (event_id, division_id) in to_fetch_set:
+            continue
+        with open(roster_file(event_id, division_id), "r", encoding="utf-8") as f:
+            for athlete in json.load(f):
+                unique_athletes[athlete["id"]] = athlete
+
+# Fetch missing rosters concurrently (paced by the shared liveheats.com rate limit)
+with ThreadPoolExecutor(max_workers=ROSTER_WORKERS) as executor:
+    rosters = executor.map(lambda task: fetch_event_division_results(*task), to_fetch)
+    for roster in rosters:
+        for athlete in roster or []:
+            unique_athletes[athlete["id"]] = athlete
 
 
 def create_unique_athletes_from_directory(directory):
@@ -204,14 +215,15 @@ def create_unique_athletes_from_directory(directory):
     return list(unique_athletes.values())
 
 if __name__ == "__main__":
-    directory = "iwt_athletes"
-    unique_athletes = create_unique_athletes_from_directory(directory)
-    output_file = "Athlete Database/Raw Data/iwt_sailors_raw.json"
+    # Rebuild from every roster file with create_unique_athletes_from_directory("iwt_athletes")
+    # if the merged output ever needs regenerating from scratch.
+    unique_athlete_list = list(unique_athletes.values())
+    output_file = IWT_SAILORS_RAW_JSON
     
     with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(unique_athletes, f, indent=4, ensure_ascii=False)
+        json.dump(unique_athlete_list, f, indent=4, ensure_ascii=False)
     
-    print(f"Saved {len(unique_athletes)} unique athletes to {output_file}")
+    print(f"Saved {len(unique_athlete_list)} unique athletes to {output_file}")
 
 
 #### CREATE RAW CSV
@@ -1,70 +1,63 @@
-import requests
 from bs4 import BeautifulSoup
+import json
+import os
 import re
+import sys
 import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_http import http_get, apply_response_store_flags
+
+# --record / --replay: record responses to, or answer them from, the response store
+apply_response_store_flags()
+
 base_url = "https://www.pwaworldtour.com/"
 initial_url = base_url + "index.php?id=7"
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
 }
 
-response = requests.get(initial_url, headers=headers)
-soup = BeautifulSoup(response.content, 'html.parser')
-
-# Debug: Check if the pagination section is present
-pagination_div = soup.find("div", class_="page-browser")
-if pagination_div:
-    page_links = pagination_div.select("div.page-browser a.page.small-header")
-    # Or, alternatively, search recursively:
-    # page_links = pagination_div.find_all("a", class_="page small-header")
-
-# Extract page URLs from the pagination section
-page_links = soup.select("div.page-browser div.page-browser a.page")
+# Concurrent profile fetches (request pace is set by the pwaworldtour.com rate limit)
+PROFILE_WORKERS = 8
+# Parsed profiles keyed by showUid, each stored with its fetch time. Profiles
+# older than PROFILE_CACHE_TTL are re-fetched (age and sponsors change); run
+# with --refresh to re-fetch every profile
+PROFILE_CACHE_FILE = "Athlete Database/Raw Data/pwa_sailor_profiles_cache.json"
+PROFILE_CACHE_TTL = 30 * 24 * 3600   # seconds
+PROFILE_CACHE_SAVE_EVERY = 25        # profiles fetched between cache saves
 
-page_urls = []
-for link in page_links:
-    href = link.get("href")
-    # Replace HTML entities to get a proper URL
-    href = href.replace("&amp;", "&")
-    full_url = base_url + href
-    if full_url not in page_urls:
-        page_urls.append(full_url)
-
-print("Extracted page URLs:", page_urls)
-
-
-# Now, iterate through the page URLs to extract profile links.
-profile_links = []
 # Regex to match profile hrefs (adjust if necessary)
 pattern = re.compile(r'index\.php\?id=7&amp;tx_pwasailor_pi1%5BshowUid%5D=\d+&amp;cHash=[a-f0-9]+')
+show_uid_pattern = re.compile(r'tx_pwasailor_pi1%5BshowUid%5D=(\d+)')
 
-for url in page_urls:
+
+def extract_profile_links(url):
+    """
+    Return the sailor profile URLs linked from one pagination page.
+    """
     print(f"Scraping page: {url}")
-    response = requests.get(url)
+    response = http_get(url)
     soup = BeautifulSoup(response.content, 'html.parser')
-    
+    links = []
     for a_tag in soup.find_all('a', href=True):
         # Check if the anchor tag matches our pattern
         if pattern.search(str(a_tag)):
             href = a_tag['href'].replace("&amp;", "&")
-            full_profile_url = base_url + href
-            if full_profile_url not in profile_links:
-                profile_links.append(full_profile_url)
-    
-    time.sleep(0.5)  # be polite
+            links.append(base_url + href)
+    return links
 
-# Now profile_links should contain URLs from all pages.
-print("Total profile links found:", len(profile_links))
 
-# The rest of your extraction code goes here...
-data = []
-
-for url in profile_links:
+def parse_profile(url):
+    """
+    Fetch one sailor profile page and extract name, age, nationality,
+    sail number and current sponsors.
+    """
     print(f"Extracting from {url}")
-    response = requests.get(url)
+    response = http_get(url)
     soup = BeautifulSoup(response.content, 'html.parser')
 
     # Extract name
@@ -107,16 +100,97 @@ for url in profile_links:
     except Exception as e:
         current_sponsor = None
     
-    data.append({
+    return {
         'name': name,
         'age': age,
         'nationality': nationality,
         'sail_no': sail_no,
         'pwa_url': url,
         'current_sponsors': current_sponsor
-    })
+    }
+
+
+response = http_get(initial_url, headers=headers)
+soup = BeautifulSoup(response.content, 'html.parser')
+
+# Extract page URLs from the pagination section
+page_links = soup.select("div.page-browser div.page-browser a.page")
+
+page_urls = []
+seen_pages = set()
+for link in page_links:
+    href = link.get("href")
+    # Replace HTML entities to get a proper URL
+    href = href.replace("&amp;", "&")
+    full_url = base_url + href
+    if full_url not in seen_pages:
+        seen_pages.add(full_url)
+        page_urls.append(full_url)
+
+print("Extracted page URLs:", page_urls)
+
+
+# Build the profile frontier: page order preserved, duplicates dropped via a set
+profile_links = []
+seen_profiles = set()
+with ThreadPoolExecutor(max_workers=PROFILE_WORKERS) as executor:
+    for links in executor.map(extract_profile_links, page_urls):
+        for full_profile_url in links:
+            if full_profile_url not in seen_profiles:
+                seen_profiles.add(full_profile_url)
+                profile_links.append(full_profile_url)
+
+# Now profile_links should contain URLs from all pages.
+print("Total profile links found:", len(profile_links))
 
-    time.sleep(0.5)  # Avoid hammering the server
+# Load parsed profiles from earlier runs (keyed by showUid)
+profile_cache = {}
+if os.path.exists(PROFILE_CACHE_FILE) and "--refresh" not in sys.argv:
+    with open(PROFILE_CACHE_FILE, "r", encoding="utf-8") as f:
+        profile_cache = json.load(f)
+    # Entries from before fetch times were stored count as stale
+    profile_cache = {uid: entry if "fetched_at" in entry else {"fetched_at": 0, "profile": entry}
+                     for uid, entry in profile_cache.items()}
+
+def show_uid(url):
+    match = show_uid_pattern.search(url)
+    return match.group(1) if match else url
+
+def save_profile_cache():
+    tmp_path = f"{PROFILE_CACHE_FILE}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile_cache, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, PROFILE_CACHE_FILE)
+
+now = time.time()
+to_fetch = [url for url in profile_links
+            if now - profile_cache.get(show_uid(url), {}).get("fetched_at", 0) >= PROFILE_CACHE_TTL]
+print(f"{len(profile_links) - len(to_fetch)} profiles cached, fetching {len(to_fetch)}")
+
+# Profiles are cached as they arrive and the cache is saved every
+# PROFILE_CACHE_SAVE_EVERY profiles and on exit, so a failed profile or an
+# interrupted run keeps everything fetched so far
+failed = []
+try:
+    with ThreadPoolExecutor(max_workers=PROFILE_WORKERS) as executor:
+        futures = {executor.submit(parse_profile, url): url for url in to_fetch}
+        for done, future in enumerate(as_completed(futures), start=1):
+            url = futures[future]
+            try:
+                profile_cache[show_uid(url)] = {"fetched_at": time.time(), "profile": future.result()}
+            except Exception as e:
+                print(f"Failed to fetch or parse profile {url}: {e}")
+                failed.append(url)
+            if done % PROFILE_CACHE_SAVE_EVERY == 0:
+                save_profile_cache()
+finally:
+    save_profile_cache()
+
+# Assemble rows in frontier order; a failed profile keeps its stale cached copy if it has one
+data = [dict(profile_cache[show_uid(url)]["profile"], pwa_url=url)
+        for url in profile_links if show_uid(url) in profile_cache]
+if failed:
+    print(f"{len(failed)} profile(s) could not be fetched; rerun to retry them")
 
 # Convert to DataFrame
 df = pd.DataFrame(data)
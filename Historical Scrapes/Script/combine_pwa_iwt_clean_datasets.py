@@ -1,34 +1,49 @@
 ########## COMBINED PWA AND IWT CLEAN DATA ###########
+# Reads the typed IWT / PWA clean tables (utils/functions_storage.py) and writes
+# each combined table as a Parquet dataset partitioned by source/year/event_id
+# (query it with read_partitioned). Pass --csv to also export each one as CSV.
+import os
+import sys
+import pandas as pd
+
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_storage import read_table, add_event_year, write_partitioned
+
+EXPORT_CSV = "--csv" in sys.argv
+
+# Event years for the year= partitions
+events = read_table('events', 'Historical Scrapes/Data/Clean/Combined/combined_event_data_v3.parquet')
 
 ## Combine progression data
 # load data sets
-iwt_prog = pd.read_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_progression_clean.csv')
-pwa_prog = pd.read_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_progression_clean.csv')
+iwt_prog = read_table('heat_progression', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_progression_clean.parquet')
+pwa_prog = read_table('heat_progression', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_progression_clean.parquet')
 
 combined_prog = pd.concat([iwt_prog, pwa_prog], ignore_index=True, sort=False)
 combined_prog.rename(columns={'eventDivisionId': 'division_id'}, inplace=True)  # rename eventdividsiond
-combined_prog.to_csv("Historical Scrapes/Data/Clean/Combined/combined_heat_progression_data.csv")
+write_partitioned(add_event_year(combined_prog, events), 'heat_progression', 'Historical Scrapes/Data/Clean/Combined/combined_heat_progression_data', export_csv=EXPORT_CSV)
 
 ## Combine final rank data
-iwt_final_rank = pd.read_csv('Historical Scrapes/Data/Clean/IWT/iwt_final_ranks_clean.csv')
-pwa_final_rank  = pd.read_csv('Historical Scrapes/Data/Clean/PWA/pwa_final_ranks_clean.csv')
+iwt_final_rank = read_table('final_ranks', 'Historical Scrapes/Data/Clean/IWT/iwt_final_ranks_clean.parquet')
+pwa_final_rank  = read_table('final_ranks', 'Historical Scrapes/Data/Clean/PWA/pwa_final_ranks_clean.parquet')
 
 combined_final_ranks = pd.concat([iwt_final_rank, pwa_final_rank], ignore_index=True, sort=False)
-combined_final_ranks.to_csv("Historical Scrapes/Data/Clean/Combined/combined_final_rank_data.csv")
+write_partitioned(add_event_year(combined_final_ranks, events), 'final_ranks', 'Historical Scrapes/Data/Clean/Combined/combined_final_rank_data', export_csv=EXPORT_CSV)
 
 ## combine heat results data
-iwt_heat_results = pd.read_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_results_clean.csv')
-pwa_heat_results= pd.read_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_results_clean.csv')
+iwt_heat_results = read_table('heat_results', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_results_clean.parquet')
+pwa_heat_results= read_table('heat_results', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_results_clean.parquet')
 
 combined_heats_results = pd.concat([iwt_heat_results, pwa_heat_results], ignore_index=True, sort=False)
-combined_heats_results.to_csv("Historical Scrapes/Data/Clean/Combined/combined_heat_results_data.csv")
+write_partitioned(add_event_year(combined_heats_results, events), 'heat_results', 'Historical Scrapes/Data/Clean/Combined/combined_heat_results_data', export_csv=EXPORT_CSV)
 
 ## combine heat scores data
-iwt_heat_scores = pd.read_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_scores_clean.csv')
-pwa_heat_scores = pd.read_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.csv')
+iwt_heat_scores = read_table('heat_scores', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_scores_clean.parquet')
+pwa_heat_scores = read_table('heat_scores', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.parquet')
 
 combined_heat_scores = pd.concat([iwt_heat_scores, pwa_heat_scores], ignore_index = True, sort = False)
-combined_heat_scores.to_csv('Historical Scrapes/Data/Clean/Combined/combined_heat_scores_data.csv')
+write_partitioned(add_event_year(combined_heat_scores, events), 'heat_scores', 'Historical Scrapes/Data/Clean/Combined/combined_heat_scores_data', export_csv=EXPORT_CSV)
 
 
 ### USE BELOW TO CHECK DATATSET BEFORE MERGING
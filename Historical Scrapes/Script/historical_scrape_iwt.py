@@ -1,69 +1,116 @@
 ########## GET ALL EVENT DATA FROM 'WORLD WAVE TOUR' ON LIVE HEATS ############
+# Usage:
+#   python "Historical Scrapes/Script/historical_scrape_iwt.py"          one request per event and division
+#   python "Historical Scrapes/Script/historical_scrape_iwt.py" --crawl  nested events -> divisions -> heats queries
+#   ... --prepare     only fetch the event list (run once before --shard)
+#   ... --shard i/n   only scrape events in shard i of n (run one process per shard)
+#   ... --combine     only write the combined CSVs from the backfill checkpoints
+#   ... --record / --replay   record responses to / answer them from the response store
+# Every finished division is checkpointed (utils/functions_backfill.py), so a
+# rerun resumes where the last one stopped.
+import os
+import sys
 import pandas as pd
-from functions_iwt_progression_results_scores import (
+
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_iwt_scrape import (
     fetch_wave_tour_events,
     extract_results_published_events,
-    fetch_event_divisions,
+    fetch_event_divisions_batch,
     fetch_event_division_results,
-    flatten_heat_progression,
-    flatten_heat_results_and_scores,
-    process_event_division,
-    clean_heat_order
+    crawl_event_division_results,
+    flatten_event_division
 )
+from utils.functions_backfill import BackfillManifest, in_shard, shard_from_argv
+from utils.functions_http import apply_response_store_flags
 
-def main():
-    # Step 1: Fetch events
-    print("Fetching Wave Tour events...")
-    fetch_wave_tour_events()
-    event_ids = extract_results_published_events()
-
-    # Prepare lists for collected DataFrames
-    progression_dfs = []
-    results_dfs = []
-    scores_dfs = []
-    final_rank_dfs = []
+TABLES = {
+    "heat_progression": "combined_iwt_heat_progression.csv",
+    "heat_results": "combined_iwt_heat_results.csv",
+    "heat_scores": "combined_iwt_heat_scores.csv",
+    "final_ranks": "combined_iwt_final_ranks.csv",
+}
 
-    # Process each event and division
-    for event_id in event_ids:
-        division_ids = fetch_event_divisions(event_id)
+def iter_division_results(pending):
+    """
+    Fetch the pending divisions with one request per event and division.
+    pending maps event_id -> list of division IDs.
+    Yields (event_id, division_id, data) like crawl_event_division_results.
+    """
+    for event_id, division_ids in pending.items():
         for division_id in division_ids:
             print(f"Processing Event {event_id}, Division {division_id}...")
             data = fetch_event_division_results(event_id, division_id)
             if not data:
                 print(f"Skipping Event {event_id}, Division {division_id} due to missing data.")
                 continue
+            yield event_id, division_id, data
+
+def combine_and_export(manifest):
+    """
+    Write each combined CSV from the checkpointed units of every shard.
+    """
+    for table, filename in TABLES.items():
+        df_combined = manifest.combine(table)
+        if df_combined is not None:
+            df_combined.to_csv(filename, index=False)
+            print(f"Exported {filename}")
 
-            # Flatten progression and clean
-            df_prog = flatten_heat_progression(data, event_id, division_id)
-            if df_prog is not None:
-                df_prog = clean_heat_order(df_prog, "heat_order")
-                progression_dfs.append(df_prog)
+def main():
+    apply_response_store_flags()
+    manifest = BackfillManifest("iwt")
+    if "--combine" in sys.argv:
+        combine_and_export(manifest)
+        return
 
-            # Flatten results and scores
-            df_res, df_scr = flatten_heat_results_and_scores(data, event_id, division_id)
-            if df_res is not None:
-                results_dfs.append(df_res)
-            if df_scr is not None:
-                scores_dfs.append(df_scr)
+    # Step 1: Fetch events. Shards share the event list saved by --prepare,
+    # so the event files are fetched and written once rather than per shard
+    shard_index, shard_count = shard_from_argv()
+    if shard_count > 1 and "--prepare" not in sys.argv:
+        all_event_ids = manifest.load_events()
+    else:
+        print("Fetching Wave Tour events...")
+        fetch_wave_tour_events()
+        all_event_ids = extract_results_published_events("wave_tour_events_raw.json")
+        manifest.save_events(all_event_ids)
+        if "--prepare" in sys.argv:
+            return
+    event_order = {event_id: i for i, event_id in enumerate(all_event_ids)}
 
-            # Final ranking
-            event_data = process_event_division(data, event_id, division_id)
-            df_final = event_data.get("df_final_rank")
-            if df_final is not None:
-                final_rank_dfs.append(df_final)
+    # Step 2: Work out this shard's divisions that are not checkpointed yet
+    event_ids = [e for e in all_event_ids if in_shard(e, shard_index, shard_count)]
+    completed = manifest.completed()
+    division_order = {}
+    pending = {}
+    for event_id, divisions in fetch_event_divisions_batch(event_ids).items():
+        for i, (division_id, _) in enumerate(divisions):
+            division_order[(event_id, division_id)] = i
+            if (str(event_id), str(division_id)) not in completed:
+                pending.setdefault(event_id, []).append(division_id)
+    print(f"Shard {shard_index}/{shard_count}: {sum(map(len, pending.values()))} divisions to scrape "
+          f"({len(completed)} already checkpointed)")
 
-    # Combine and export utility
-    def combine_and_export(dfs, filename):
-        if dfs:
-            df_combined = pd.concat(dfs, ignore_index=True)
-            df_combined.to_csv(filename, index=False)
-            print(f"Exported {filename}")
+    # Step 3: Process and checkpoint each pending division
+    if "--crawl" in sys.argv:
+        division_results = crawl_event_division_results(list(pending))
+    else:
+        division_results = iter_division_results(pending)
+
+    for event_id, division_id, data in division_results:
+        if division_id not in pending.get(event_id, []):
+            continue  # Already checkpointed (the nested crawl returns whole events)
+        if data is None:
+            print(f"Skipping Event {event_id}, Division {division_id} due to missing data.")
+            continue  # Left pending for the next run
+        frames = flatten_event_division(data, event_id, division_id)
+        manifest.save_unit(event_id, division_id, frames,
+                           event_order=event_order[event_id],
+                           division_order=division_order[(event_id, division_id)])
 
-    # Export all CSVs
-    combine_and_export(progression_dfs, "combined_iwt_heat_progression.csv")
-    combine_and_export(results_dfs, "combined_iwt_heat_results.csv")
-    combine_and_export(scores_dfs, "combined_iwt_heat_scores.csv")
-    combine_and_export(final_rank_dfs, "combined_iwt_final_ranks.csv")
+    # Sharded workers only checkpoint; run once more with --combine when all are done
+    if shard_count == 1:
+        combine_and_export(manifest)
 
 if __name__ == "__main__":
     main()
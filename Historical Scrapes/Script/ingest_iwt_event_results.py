@@ -0,0 +1,43 @@
+########## INGEST CACHED LIVE HEATS DIVISION JSON INTO PARQUET ############
+# Rebuilds the IWT result tables from the division payloads already saved under
+# Historical Scrapes/Data/Raw/event_results, without touching the API. Files are
+# decoded (orjson if installed) and flattened across a process pool, and every
+# division is written to <output>/<table>/event_id=<id>/division_<id>.parquet.
+#
+# Usage:
+#   python "Historical Scrapes/Script/ingest_iwt_event_results.py"
+#   ... --workers 4      number of worker processes (default: all cores)
+#   ... --input DIR      directory of event_*_division_*.json files
+#   ... --output DIR     root of the Parquet tables
+# Exits with status 1 if any division file could not be ingested.
+#
+# heat_results, heat_scores and final_ranks match the combined_iwt_*.csv tables
+# row for row. heat_progression covers every division with heats, while
+# combined_iwt_heat_progression_format.csv is a hand-formatted table that leaves
+# out 50 of them (71 heats, e.g. single-heat finals and divisions without a
+# progression format); the divisions it does hold match heat for heat.
+import argparse
+import os
+import sys
+
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_ingest import IWT_EVENT_RESULTS_DIR, IWT_PARQUET_DIR, ingest_event_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest cached LiveHeats division JSON into Parquet.")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--input", default=IWT_EVENT_RESULTS_DIR, help="directory of division JSON files")
+    parser.add_argument("--output", default=IWT_PARQUET_DIR, help="root directory of the Parquet tables")
+    args = parser.parse_args()
+
+    failures = ingest_event_results(args.input, args.output, args.workers)
+    for path, error in failures.items():
+        print(f"Skipped {os.path.basename(path)}: {error}")
+    # Non-zero exit so a partial ingest does not pass for a complete one
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
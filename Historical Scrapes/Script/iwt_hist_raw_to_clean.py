@@ -2,10 +2,23 @@
 # This script cleans the pwa raw exports and preps them so they can be appended to iwt data.
 
 # packages
+import os
+import sys
 import pandas as pd
 import ast
 from urllib.parse import urlparse, parse_qs
 
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_storage import write_table
+from utils.functions_athletes import load_athlete_aliases, resolve_athlete_ids
+
+# Clean tables are written as typed Parquet; --csv also exports them as CSV
+EXPORT_CSV = "--csv" in sys.argv
+
+# LiveHeats athlete ID aliases -> canonical IDs (Athlete Database/Clean Data/athlete_id_aliases.csv)
+aliases = load_athlete_aliases()
+
 
 # data load
 #heat_scores_df = pd.read_csv('Historical Scrapes/Data/Raw/PWA/pwa_aggregated_heat_scores_raw.csv')
@@ -18,6 +31,8 @@ from urllib.parse import urlparse, parse_qs
 heat_scores_df = pd.read_csv('Historical Scrapes/Data/Raw/IWT/combined_iwt_heat_scores.csv')
 
 
+# Resolve duplicate LiveHeats profiles to canonical athlete IDs
+heat_scores_df['athleteId'] = resolve_athlete_ids(heat_scores_df['athleteId'], 'iwt', aliases)
 # Create new column by combining heat_id and athleteid
 heat_scores_df['heat_id_athlete_id'] = heat_scores_df['heat_id'].astype(str) + '_' + heat_scores_df['athleteId'].astype(str)
 
@@ -26,13 +41,15 @@ heat_scores_df = heat_scores_df.rename(columns={
     'winBy': 'win_by',
     'eventDivisionId': 'division_id'})
 
-heat_scores_df.to_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_scores_clean.csv', index=False)
+write_table(heat_scores_df, 'heat_scores', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_scores_clean.parquet', export_csv=EXPORT_CSV)
 
 # -----------------------------------
 # heat results data cleaning
 # -----------------------------------
 heat_results_df = pd.read_csv('Historical Scrapes/Data/Raw/IWT/combined_iwt_heat_results.csv')
 
+# Resolve duplicate LiveHeats profiles to canonical athlete IDs
+heat_results_df['athleteId'] = resolve_athlete_ids(heat_results_df['athleteId'], 'iwt', aliases)
 # Create new column by combining heat_id and athleteid
 heat_results_df['heat_id_athlete_id'] = heat_results_df['heat_id'].astype(str) + '_' + heat_results_df['athleteId'].astype(str)
 heat_results_df = heat_results_df.rename(columns={
@@ -41,7 +58,7 @@ heat_results_df = heat_results_df.rename(columns={
     'eventDivisionId': 'division_id',
     'roundPosition': 'round_position'})
 
-heat_results_df.to_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_results_clean.csv', index=False)
+write_table(heat_results_df, 'heat_results', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_results_clean.parquet', export_csv=EXPORT_CSV)
 
 
 
@@ -53,6 +70,7 @@ heat_results_df.to_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_results_clean
 # -----------------------------------
 
 final_rank_df = pd.read_csv('Historical Scrapes/Data/Raw/IWT/combined_iwt_final_ranks.csv')
+final_rank_df['athleteId'] = resolve_athlete_ids(final_rank_df['athleteId'], 'iwt', aliases)
 
 final_rank_df = final_rank_df.rename(columns={
     'athleteId': 'athlete_id', 
@@ -63,7 +81,7 @@ final_rank_df = final_rank_df.rename(columns={
 final_rank_df['incomplete'] = final_rank_df.groupby(['event_id', 'division_id'])['place'] \
                                              .transform(lambda x: (x == 1).sum() > 1)
 
-final_rank_df.to_csv('Historical Scrapes/Data/Clean/IWT/iwt_final_ranks_clean.csv', index=False)
+write_table(final_rank_df, 'final_ranks', 'Historical Scrapes/Data/Clean/IWT/iwt_final_ranks_clean.parquet', export_csv=EXPORT_CSV)
 
 # -----------------------------------
 # heat progression cleaning
@@ -103,7 +121,7 @@ heat_progression_df['y_pos'] = (
 )
 
 
-heat_progression_df.to_csv('Historical Scrapes/Data/Clean/IWT/iwt_heat_progression_clean.csv', index=False)
+write_table(heat_progression_df, 'heat_progression', 'Historical Scrapes/Data/Clean/IWT/iwt_heat_progression_clean.parquet', export_csv=EXPORT_CSV)
 
 
 
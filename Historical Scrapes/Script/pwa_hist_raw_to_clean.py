@@ -2,10 +2,23 @@
 # This script cleans the pwa raw exports and preps them so they can be appended to iwt data.
 
 # packages
+import os
+import sys
 import pandas as pd
 import ast
 from urllib.parse import urlparse, parse_qs
 
+# Make the repo-level utils package importable when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.functions_storage import write_table
+from utils.functions_athletes import load_athlete_aliases, resolve_athlete_ids, strip_pwa_name_prefix
+
+# Clean tables are written as typed Parquet; --csv also exports them as CSV
+EXPORT_CSV = "--csv" in sys.argv
+
+# Sail number aliases -> canonical IDs (Athlete Database/Clean Data/athlete_id_aliases.csv)
+aliases = load_athlete_aliases()
+
 
 # -----------------------------------
 # heat scores data cleaning
@@ -13,19 +26,17 @@ from urllib.parse import urlparse, parse_qs
 heat_scores_df = pd.read_csv('Historical Scrapes/Data/Raw/PWA/pwa_aggregated_heat_scores_raw.csv')
 
 # Remove anything before "_" in athleteid so "Browne_BRA-105" becomes "BRA-105"
-heat_scores_df['athleteId'] = heat_scores_df['athleteId'].apply(lambda x: x.split('_')[-1])
+heat_scores_df['athleteId'] = strip_pwa_name_prefix(heat_scores_df['athleteId'])
+# Resolve alias sail numbers (e.g. "E-510" -> "E-51") to canonical athlete IDs
+heat_scores_df['athleteId'] = resolve_athlete_ids(heat_scores_df['athleteId'], 'pwa', aliases)
 # Create new column by combining heat_id and athleteid
 heat_scores_df['heat_id_athleteid'] = heat_scores_df['heat_id'].astype(str) + '_' + heat_scores_df['athleteId']
-# Replace all occurrence of "E-510" with "E-51" in athleteid
-heat_scores_df['athleteId'] = heat_scores_df['athleteId'].str.replace("E-510", "E-51")
-heat_scores_df['athleteId'] = heat_scores_df['athleteId'].str.replace("K-579", "K-90")
 heat_scores_df = heat_scores_df.rename(columns={
     'athleteId': 'athlete_id', 
     'winBy': 'win_by',
     'eventDivisionId': 'division_id',
     'heat_id_athleteid' : 'heat_id_athlete_id'})
 
-heat_scores_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.csv', index=False)
 
 # -----------------------------------
 # heat results data cleaning
@@ -33,19 +44,18 @@ heat_scores_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.c
 heat_results_df = pd.read_csv('Historical Scrapes/Data/Raw/PWA/pwa_aggregated_heat_results_raw.csv')
 
 # Remove anything before "_" in athleteid so "Browne_BRA-105" becomes "BRA-105"
-heat_results_df['athleteId'] = heat_results_df['athleteId'].apply(lambda x: x.split('_')[-1])
+heat_results_df['athleteId'] = strip_pwa_name_prefix(heat_results_df['athleteId'])
+# Resolve alias sail numbers (e.g. "E-510" -> "E-51") to canonical athlete IDs
+heat_results_df['athleteId'] = resolve_athlete_ids(heat_results_df['athleteId'], 'pwa', aliases)
 # Create new column by combining heat_id and athleteid
 heat_results_df['heat_id_athlete_id'] = heat_results_df['heat_id'].astype(str) + '_' + heat_results_df['athleteId']
-# Replace all occurrence of "E-510" with "E-51" in athleteid
-heat_results_df['athleteId'] = heat_results_df['athleteId'].str.replace("E-510", "E-51")
-heat_results_df['athleteId'] = heat_results_df['athleteId'].str.replace("K-579", "K-90")
 heat_results_df = heat_results_df.rename(columns={
     'athleteId': 'athlete_id', 
     'winBy': 'win_by',
     'eventDivisionId': 'division_id'})
 
 
-heat_results_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_results_clean.csv', index=False)
+write_table(heat_results_df, 'heat_results', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_results_clean.parquet', export_csv=EXPORT_CSV)
 
 
 # -----------------------------------
@@ -54,8 +64,8 @@ heat_results_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_results_clean
 
 final_rank_df = pd.read_csv('Historical Scrapes/Data/Raw/PWA/pwa_final_ranks_raw.csv')
 
-# Replace all occurrence of "E-510" with "E-51" in the new athleteid column (assumed to be from sail_no)
-final_rank_df['sail_no'] = final_rank_df['sail_no'].astype(str).str.replace("E-510", "E-51")
+# Resolve alias sail numbers to canonical athlete IDs in the new athleteid column (from sail_no)
+final_rank_df['sail_no'] = resolve_athlete_ids(final_rank_df['sail_no'].astype(str), 'pwa', aliases)
 # Drop the original athleteid column
 final_rank_df = final_rank_df.drop(columns=['athlete_id', 'Points'])
 # Rename columns: sail_no to athleteId and Name to name
@@ -70,7 +80,6 @@ final_rank_df = final_rank_df.rename(columns={
 final_rank_df['incomplete'] = final_rank_df.groupby(['event_id', 'division_id'])['place'] \
                                              .transform(lambda x: (x == 1).sum() > 1)
 
-final_rank_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_final_ranks_clean.csv', index=False)
 # -----------------------------------
 # heat progression cleaning
 # -----------------------------------
@@ -116,7 +125,7 @@ heat_progression_df['y_pos'] = (
 # TBC
 
 
-# Optionally, save the cleaned data back to CSV files
-heat_scores_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.csv', index=False)
-final_rank_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_final_ranks_clean.csv', index=False)
-heat_progression_df.to_csv('Historical Scrapes/Data/Clean/PWA/pwa_heat_progression_clean.csv', index=False)
+# Save the cleaned tables
+write_table(heat_scores_df, 'heat_scores', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_scores_clean.parquet', export_csv=EXPORT_CSV)
+write_table(final_rank_df, 'final_ranks', 'Historical Scrapes/Data/Clean/PWA/pwa_final_ranks_clean.parquet', export_csv=EXPORT_CSV)
+write_table(heat_progression_df, 'heat_progression', 'Historical Scrapes/Data/Clean/PWA/pwa_heat_progression_clean.parquet', export_csv=EXPORT_CSV)
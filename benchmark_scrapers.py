@@ -0,0 +1,133 @@
+########## SCRAPER THROUGHPUT BENCHMARK AGAINST LOCAL MOCK SERVERS ############
+# Starts the LiveHeats / PWA stand-ins from utils/functions_mock_servers.py,
+# points the scrapers at them and times end-to-end scrapes. Everything the
+# scrapers write (event_results/, http_cache/) goes to a temporary directory,
+# and responses are not recorded to the response store.
+#
+# Usage:
+#   python benchmark_scrapers.py
+#   python benchmark_scrapers.py --latency 0.05 --error-rate 0.02 --events 20
+#   python benchmark_scrapers.py --scenario iwt-crawl --rate 5 --burst 10
+#   python benchmark_scrapers.py --replay   record one untimed pass, then time the replay
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.abspath(os.path.dirname(__file__))
+sys.path.insert(0, REPO_DIR)
+from utils.functions_mock_servers import MockServers
+
+SCENARIOS = ["iwt-divisions", "iwt-crawl", "pwa-heats"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the scrapers against local mock servers.")
+    parser.add_argument("--scenario", choices=SCENARIOS, action="append",
+                        help="scenario to run (repeatable; default: all)")
+    parser.add_argument("--events", type=int, default=10, help="events per scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="server latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failed with 503")
+    parser.add_argument("--rate", type=float, default=1000.0, help="client token-bucket rate (req/s)")
+    parser.add_argument("--burst", type=int, default=1000, help="client token-bucket burst")
+    parser.add_argument("--seed", type=int, default=0, help="seed for injected latency/errors")
+    parser.add_argument("--replay", action="store_true",
+                        help="time each scenario answered from the response store (recorded in an untimed pass)")
+    return parser.parse_args()
+
+
+def run_iwt_divisions(servers, events):
+    """One aliased division listing per 25 events, then one request per division."""
+    from utils.functions_iwt_scrape import fetch_event_divisions_batch, fetch_event_division_results
+    event_ids = list(servers.liveheats.fixtures.divisions_by_event)[:events]
+    units = 0
+    for event_id, divisions in fetch_event_divisions_batch(event_ids).items():
+        for division_id, _ in divisions:
+            if fetch_event_division_results(event_id, division_id):
+                units += 1
+    return units, "divisions"
+
+
+def run_iwt_crawl(servers, events):
+    """Nested events -> divisions -> heats queries."""
+    from utils.functions_iwt_scrape import crawl_event_division_results
+    event_ids = list(servers.liveheats.fixtures.divisions_by_event)[:events]
+    units = sum(1 for _, _, data in crawl_event_division_results(event_ids, save=False) if data)
+    return units, "divisions"
+
+
+def run_pwa_heats(servers, events):
+    """Ladder codes, live_ladder XML and every live_score heatsheet per event."""
+    import utils.functions_pwa_scrape as fpprs
+    progression = servers.pwa.fixtures.progression
+    event_ids = list(dict.fromkeys(progression["event_id"]))[:events]
+    units = 0
+    for event_id in event_ids:
+        _, category_codes, _ = fpprs.fetch_pwa_ladder_codes(event_id)
+        for category_code in category_codes:
+            results_df, _, heat_ids = fpprs.export_heat_progression_and_results(event_id, category_code)
+            if results_df is not None and heat_ids:
+                fpprs.export_heat_scores(event_id, category_code, heat_ids)
+                units += len(heat_ids)
+    return units, "heats"
+
+
+RUNNERS = {
+    "iwt-divisions": run_iwt_divisions,
+    "iwt-crawl": run_iwt_crawl,
+    "pwa-heats": run_pwa_heats,
+}
+
+
+def main():
+    args = parse_args()
+    scenarios = args.scenario or SCENARIOS
+
+    # Fixtures are read relative to the repo root
+    os.chdir(REPO_DIR)
+    servers = MockServers(latency=args.latency, jitter=args.jitter,
+                          error_rate=args.error_rate, seed=args.seed)
+
+    # The scrapers read their base URLs and store settings at import time
+    os.environ.update(servers.environ())
+    work_dir = tempfile.mkdtemp(prefix="scraper_benchmark_")
+    os.chdir(work_dir)
+
+    from utils.functions_http import set_rate_limit, set_record_mode, set_replay_mode
+    set_rate_limit("127.0.0.1", args.rate, args.burst)
+    set_record_mode(False)
+
+    print(f"latency={args.latency}s jitter={args.jitter}s error_rate={args.error_rate} "
+          f"client_rate={args.rate}/s burst={args.burst} events={args.events}")
+    print(f"{'scenario':<15}{'units':>8}{'seconds':>10}{'units/s':>10}{'requests':>10}{'req/s':>10}{'errors':>8}")
+    try:
+        for scenario in scenarios:
+            if args.replay:
+                # Record every response in an untimed pass, then time the replay
+                set_replay_mode(False)
+                set_record_mode(True)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    RUNNERS[scenario](servers, args.events)
+                set_record_mode(False)
+                set_replay_mode(True)
+            requests_before, errors_before = servers.faults.requests, servers.faults.errors
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                units, unit_name = RUNNERS[scenario](servers, args.events)
+            elapsed = time.perf_counter() - start
+            requests = servers.faults.requests - requests_before
+            errors = servers.faults.errors - errors_before
+            print(f"{scenario:<15}{units:>8}{elapsed:>10.2f}{units / elapsed:>10.1f}"
+                  f"{requests:>10}{requests / elapsed:>10.1f}{errors:>8}  ({unit_name})")
+    finally:
+        servers.shutdown()
+        os.chdir(REPO_DIR)
+    print(f"Scraper output left in {work_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 #### CREATE HISTORICAL ALL EVENT RECORD #####
 import os
+import sys
 import requests
 import json
 import pandas as pd
@@ -8,6 +9,10 @@ import numpy as np
 
 from utils.functions_iwt_scrape import fetch_wave_tour_events
 from utils.functions_clean import _parse_rank, standardise_event_name, pwa_clean_events, iwt_clean_events
+from utils.functions_storage import write_table
+
+# The combined table is written as typed Parquet; --csv also exports it as CSV
+EXPORT_CSV = "--csv" in sys.argv
 
 
 #### Load IWT Events and clean
@@ -26,8 +31,8 @@ pwa_df = pd.read_csv('Historical Scrapes/Data/Clean/PWA/pwa_event_data_clean.csv
 #### Combined clean datasets
 combined_df = pd.concat([iwt_df, pwa_df], ignore_index=True, sort=False)
 
-### Write combined dataframe to csv
-combined_df.to_csv('Historical Scrapes/Data/Clean/Combined/combined_event_data_v3.csv')
+### Write combined dataframe
+write_table(combined_df, 'events', 'Historical Scrapes/Data/Clean/Combined/combined_event_data_v3.parquet', export_csv=EXPORT_CSV)
 
 
 
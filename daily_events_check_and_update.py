@@ -1,10 +1,16 @@
 import os
-import requests
 import json
 import pandas as pd
 import re
 from sqlalchemy import create_engine, MetaData, Table, Column, BigInteger, Text
-from sqlalchemy.dialects.mysql import insert
+
+from utils.functions_http import http_post, apply_response_store_flags
+from utils.functions_incremental import refresh_event_results
+from utils.functions_diff import diff_frames, updates_text
+from utils.functions_db import bulk_upsert
+
+# --record / --replay: record responses to, or answer them from, the response store
+apply_response_store_flags()
 
 # ------------------------------
 # Database Configuration & Setup
@@ -82,7 +88,7 @@ def fetch_wave_tour_events():
     variables = {"shortName": "WaveTour"}
     payload = {"query": query, "variables": variables}
     
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_post(url, headers=headers, json=payload)
     
     if response.status_code == 200:
         data = response.json()
@@ -147,42 +153,26 @@ def compare_and_update_events_db(new_df, engine):
 
     # Ensure event IDs are treated as strings for consistent comparison.
     new_df["id"] = new_df["id"].astype(str)
-    if not old_df.empty:
-        old_df["id"] = old_df["id"].astype(str)
-    
-    # Create a lookup dictionary for existing events using 'id' as key.
-    old_events = old_df.set_index("id").to_dict("index") if not old_df.empty else {}
-
-    # Add a new column 'Updates' to track changes.
-    new_df["Updates"] = ""
-
-    changes_found = False
-
-    # Iterate through the new events to check for updates.
-    for idx, new_row in new_df.iterrows():
-        event_id = new_row["id"]
-        if event_id not in old_events:
-            # Flag new events.
-            new_df.at[idx, "Updates"] = "New Event Added"
-            print(f"New event found: {new_row['name']} (ID: {event_id}) -> New Event Added")
-            changes_found = True
+
+    # One outer merge on id flags new events and status changes, and finds
+    # events that are no longer returned.
+    diff, removed = diff_frames(old_df, new_df, "id", "status")
+    new_df["Updates"] = updates_text(diff, "status")
+
+    flagged = diff["change"] != "unchanged"
+    for event_id, name, change, update_text in zip(
+        diff.loc[flagged, "id"], diff.loc[flagged, "name"],
+        diff.loc[flagged, "change"], new_df.loc[flagged, "Updates"]
+    ):
+        if change == "new":
+            print(f"New event found: {name} (ID: {event_id}) -> New Event Added")
         else:
-            # Compare the status field.
-            old_status = old_events[event_id].get("status")
-            new_status = new_row["status"]
-            if old_status != new_status:
-                update_text = f"{old_status} -> {new_status}"
-                new_df.at[idx, "Updates"] = update_text
-                print(f"Status changed for event '{new_row['name']}' (ID: {event_id}): {update_text}")
-                changes_found = True
-
-    # Optionally: Check for events that are in the old data but missing in the new data.
-    if not old_df.empty:
-        new_ids = set(new_df["id"])
-        for event_id, details in old_events.items():
-            if event_id not in new_ids:
-                print(f"Event missing in latest data (might have been removed): {details.get('name')} (ID: {event_id})")
-                # You can decide to handle missing events as needed.
+            print(f"Status changed for event '{name}' (ID: {event_id}): {update_text}")
+    changes_found = bool(flagged.any())
+
+    # Events that are in the old data but missing in the new data.
+    for details in removed.to_dict("records"):
+        print(f"Event missing in latest data (might have been removed): {details.get('name')} (ID: {details['id']})")
 
     return new_df, changes_found
 
@@ -192,23 +182,21 @@ def compare_and_update_events_db(new_df, engine):
 def upsert_all_events(engine, table, df):
     """
     Upsert events into the MySQL database table.
-    For each row, if the event id exists it will update the record,
-    otherwise it will insert a new row.
+    Rows go out as multi-row INSERT ... ON DUPLICATE KEY UPDATE batches
+    (see utils/functions_db.py): an existing event id updates the record,
+    otherwise a new row is inserted.
     """
-    with engine.begin() as conn:  # This begins a transaction that commits on exit.
-        for idx, row in df.iterrows():
-            data = row.to_dict()
-            # Convert id to integer since the DB table expects a BigInteger
-            try:
-                data['id'] = int(data['id'])
-            except Exception as e:
-                print(f"Error converting id {data['id']} to integer: {e}")
-                continue
-            stmt = insert(table).values(**data)
-            # Exclude 'id' from the update values
-            update_dict = {c.name: stmt.inserted[c.name] for c in table.c if c.name != 'id'}
-            upsert_stmt = stmt.on_duplicate_key_update(**update_dict)
-            conn.execute(upsert_stmt)
+    # The DB table expects a BigInteger id; rows whose id does not convert are skipped
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    for bad_id in df.loc[ids.isna(), 'id']:
+        print(f"Error converting id {bad_id} to integer")
+    df = df[ids.notna()].assign(id=ids[ids.notna()].astype('int64'))
+
+    connection = engine.raw_connection()
+    try:
+        bulk_upsert(connection, table.name, df)
+    finally:
+        connection.close()
 
 # ------------------------------
 # Main Function
@@ -223,7 +211,12 @@ def main():
     # 2. Compare with existing events in the ALL_EVENTS table and update 'Updates' field if necessary.
     updated_events_df, changes_found = compare_and_update_events_db(new_events_df, engine)
     
-    # 3. Upsert the latest events data into the MySQL database.
+    # 3. Re-fetch results for new, changed, Live and On Hold events only. This runs
+    # before the upsert clears the 'Updates' flags it works from, so a failed
+    # refresh is retried on the next run.
+    refresh_event_results(updated_events_df)
+
+    # 4. Upsert the latest events data into the MySQL database.
     upsert_all_events(engine, all_events, updated_events_df)
     print("Database update completed.")
 
@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 import pandas as pd
 import re
@@ -10,6 +9,14 @@ from datetime import datetime
 import paramiko
 from io import StringIO
 
+from utils.functions_http import http_post, apply_response_store_flags
+from utils.functions_incremental import refresh_event_results
+from utils.functions_diff import diff_frames, updates_text
+from utils.functions_db import bulk_upsert
+
+# --record / --replay: record responses to, or answer them from, the response store
+apply_response_store_flags()
+
 # ------------------------------
 # SSH Tunnel & Database Configuration
 # ------------------------------
@@ -69,7 +76,7 @@ def fetch_wave_tour_events():
     variables = {"shortName": "WaveTour"}
     payload = {"query": query, "variables": variables}
     
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_post(url, headers=headers, json=payload)
     
     if response.status_code == 200:
         data = response.json()
@@ -169,41 +176,26 @@ def compare_and_update_events_db(new_df, connection):
 
     # Ensure event IDs are treated as strings for consistent comparison.
     new_df["id"] = new_df["id"].astype(str)
-    if not old_df.empty:
-        old_df["id"] = old_df["id"].astype(str)
-    
-    # Create a lookup dictionary for existing events using 'id' as key.
-    old_events = old_df.set_index("id").to_dict("index") if not old_df.empty else {}
 
-    # Add a new column 'Updates' to track changes.
-    new_df["Updates"] = ""
+    # One outer merge on id flags new events and status changes, and finds
+    # events that are no longer returned.
+    diff, removed = diff_frames(old_df, new_df, "id", "status")
+    new_df["Updates"] = updates_text(diff, "status")
 
-    changes_found = False
-
-    # Iterate through the new events to check for updates.
-    for idx, new_row in new_df.iterrows():
-        event_id = new_row["id"]
-        if event_id not in old_events:
-            # Flag new events.
-            new_df.at[idx, "Updates"] = "New Event Added"
-            print(f"New event found: {new_row['name']} (ID: {event_id}) -> New Event Added")
-            changes_found = True
+    flagged = diff["change"] != "unchanged"
+    for event_id, name, change, update_text in zip(
+        diff.loc[flagged, "id"], diff.loc[flagged, "name"],
+        diff.loc[flagged, "change"], new_df.loc[flagged, "Updates"]
+    ):
+        if change == "new":
+            print(f"New event found: {name} (ID: {event_id}) -> New Event Added")
         else:
-            # Compare the status field.
-            old_status = old_events[event_id].get("status")
-            new_status = new_row["status"]
-            if old_status != new_status:
-                update_text = f"{old_status} -> {new_status}"
-                new_df.at[idx, "Updates"] = update_text
-                print(f"Status changed for event '{new_row['name']}' (ID: {event_id}): {update_text}")
-                changes_found = True
+            print(f"Status changed for event '{name}' (ID: {event_id}): {update_text}")
+    changes_found = bool(flagged.any())
 
-    # Optionally: Check for events that are in the old data but missing in the new data.
-    if not old_df.empty:
-        new_ids = set(new_df["id"])
-        for event_id, details in old_events.items():
-            if event_id not in new_ids:
-                print(f"Event missing in latest data (might have been removed): {details.get('name')} (ID: {event_id})")
+    # Events that are in the old data but missing in the new data.
+    for details in removed.to_dict("records"):
+        print(f"Event missing in latest data (might have been removed): {details.get('name')} (ID: {details['id']})")
 
     return new_df, changes_found
 
@@ -213,33 +205,17 @@ def compare_and_update_events_db(new_df, connection):
 def upsert_all_events(connection, df):
     """
     Upsert events into the MySQL database table.
-    For each row, if the event id exists it will update the record,
-    otherwise it will insert a new row.
+    Rows go out as multi-row INSERT ... ON DUPLICATE KEY UPDATE batches
+    (see utils/functions_db.py), so the SSH tunnel round trip is paid per
+    batch rather than per row.
     """
-    with connection.cursor() as cursor:
-        for idx, row in df.iterrows():
-            data = row.to_dict()
-            # Convert id to integer since the DB table expects a BIGINT
-            try:
-                data['id'] = int(data['id'])
-            except Exception as e:
-                print(f"Error converting id {data['id']} to integer: {e}")
-                continue
-            
-            # Prepare the upsert query (MySQL INSERT ... ON DUPLICATE KEY UPDATE)
-            columns = ', '.join(data.keys())
-            placeholders = ', '.join(['%s'] * len(data))
-            update_clause = ', '.join([f"{col} = VALUES({col})" for col in data.keys() if col != 'id'])
-            
-            query = f"""
-                INSERT INTO {DB_NAME}.ALL_EVENTS ({columns})
-                VALUES ({placeholders})
-                ON DUPLICATE KEY UPDATE {update_clause}
-            """
-            
-            cursor.execute(query, list(data.values()))
-        
-        connection.commit()
+    # The DB table expects a BIGINT id; rows whose id does not convert are skipped
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    for bad_id in df.loc[ids.isna(), 'id']:
+        print(f"Error converting id {bad_id} to integer")
+    df = df[ids.notna()].assign(id=ids[ids.notna()].astype('int64'))
+
+    bulk_upsert(connection, f"{DB_NAME}.ALL_EVENTS", df)
 
 # ------------------------------
 # Main Function
@@ -303,12 +279,18 @@ def main():
             print("\n🔍 Comparing with existing data...")
             updated_events_df, changes_found = compare_and_update_events_db(new_events_df, connection)
             
-            # 3. Upsert the latest events data into the MySQL database.
+            # 3. Re-fetch results for new, changed, Live and On Hold events only.
+            # This runs before the upsert clears the 'Updates' flags it works
+            # from, so a failed refresh is retried on the next run.
+            print("\n🏄 Refreshing event results...")
+            refresh_event_results(updated_events_df)
+
+            # 4. Upsert the latest events data into the MySQL database.
             print("\n💾 Updating database...")
             upsert_all_events(connection, updated_events_df)
             print("✅ Database update completed.")
             
-            # 4. Show summary
+            # 5. Show summary
             with connection.cursor() as cursor:
                 cursor.execute(f"SELECT COUNT(*) as total FROM {DB_NAME}.ALL_EVENTS")
                 total_events = cursor.fetchone()['total']
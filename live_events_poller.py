@@ -0,0 +1,195 @@
+########## POLL LIVE 'WORLD WAVE TOUR' EVENTS ON LIVE HEATS ############
+# Long-running poller for events with status Live / On Hold. Each live division
+# is polled on its own adaptive interval: every POLL_INTERVAL_MIN seconds while
+# a heat is running (startTime set, no endTime) or results are changing, then
+# backing off towards POLL_INTERVAL_MAX while the division is idle. Only the
+# heats whose payload changed are written to the raw IWT result tables.
+#
+# Usage:
+#   python live_events_poller.py          poll until stopped
+#   python live_events_poller.py --once   poll every live division once and exit
+#   ... --record / --replay   record responses to / answer them from the response store
+import sys
+import time
+
+import requests
+
+from utils.functions_http import apply_response_store_flags
+from utils.functions_iwt_scrape import (
+    fetch_wave_tour_events,
+    fetch_event_divisions_batch,
+    fetch_event_division_results,
+    flatten_event_division
+)
+from utils.functions_incremental import (
+    REFRESH_STATUSES,
+    payload_fingerprint,
+    write_result_rows
+)
+
+# Poller settings (seconds)
+POLL_INTERVAL_MIN = 20          # while heats are running or results changing
+POLL_INTERVAL_MAX = 600         # ceiling for idle divisions
+POLL_BACKOFF = 2                # interval multiplier per idle poll
+EVENTS_REFRESH_INTERVAL = 900   # how often the live event list is re-read
+
+# Column each raw table is keyed on when a heat changes
+HEAT_KEY_COLUMNS = {
+    "heat_progression": "heat_id",
+    "heat_results": "heat_id",
+    "heat_scores": "heat_id",
+}
+
+
+def heat_fingerprints(data):
+    """
+    Map heat_id -> canonical-JSON fingerprint, so a heat counts as changed
+    only when its content does (not key order or whitespace).
+    """
+    heats = ((data.get("data") or {}).get("eventDivision") or {}).get("heats") or []
+    return {str(heat["id"]): payload_fingerprint(heat) for heat in heats}
+
+
+def has_running_heat(data):
+    """True if any heat has started but not finished."""
+    heats = ((data.get("data") or {}).get("eventDivision") or {}).get("heats") or []
+    return any(heat.get("startTime") and not heat.get("endTime") for heat in heats)
+
+
+def fetch_live_divisions():
+    """
+    Return [(event_id, division_id)] for every Live / On Hold event.
+    """
+    events_df = fetch_wave_tour_events()
+    live = events_df[events_df["results_status"].isin(REFRESH_STATUSES)]
+    event_ids = live["event_id"].astype(str).tolist()
+    if not event_ids:
+        return []
+    return [
+        (event_id, division_id)
+        for event_id, divisions in fetch_event_divisions_batch(event_ids).items()
+        for division_id, _ in divisions
+    ]
+
+
+def write_changed_heats(data, event_id, division_id, changed_heat_ids, fingerprint, **kwargs):
+    """
+    Flatten the division and replace only the changed heats' rows in the heat
+    tables; the division's final ranks are replaced whole. The division's
+    fingerprint is stored with the rows, so the daily refresh skips it.
+    kwargs (tables, fingerprints_file) are passed to write_result_rows.
+    """
+    frames = flatten_event_division(data, event_id, division_id)
+    replacements = []
+    for table, key_column in HEAT_KEY_COLUMNS.items():
+        df = frames[table]
+        if df is not None:
+            df = df[df[key_column].astype(str).isin(changed_heat_ids)]
+        replacements.append((table, key_column, changed_heat_ids, df))
+    replacements.append(("final_ranks", "eventDivisionId", [division_id], frames["final_ranks"]))
+    write_result_rows(replacements, {str(event_id): {str(division_id): fingerprint}}, **kwargs)
+
+
+def poll_division(state):
+    """
+    Poll one division, write its changed heats and schedule the next poll.
+    state holds event_id, division_id, the last division and per-heat
+    fingerprints, interval and next_poll. An identical payload is skipped
+    before any per-heat work.
+    """
+    event_id, division_id = state["event_id"], state["division_id"]
+    try:
+        data = fetch_event_division_results(event_id, division_id)
+    except requests.RequestException as e:
+        print(f"Polling Event {event_id}, Division {division_id} failed: {e}")
+        data = None
+
+    changed = []
+    running = False
+    if data:
+        running = has_running_heat(data)
+        division_fingerprint = payload_fingerprint(data)
+        if division_fingerprint == state.get("division_fingerprint"):
+            data = None  # Same content as the last poll
+
+    if data:
+        fingerprints = heat_fingerprints(data)
+        changed = [heat_id for heat_id, fp in fingerprints.items()
+                   if state["fingerprints"].get(heat_id) != fp]
+        if changed:
+            write_changed_heats(data, event_id, division_id, changed, division_fingerprint)
+            print(f"Event {event_id}, Division {division_id}: {len(changed)} heat(s) updated")
+        state["fingerprints"] = fingerprints
+        state["division_fingerprint"] = division_fingerprint
+
+    schedule_next_poll(state, active=changed or running)
+
+
+def schedule_next_poll(state, active):
+    """Poll an active division again soon; back an idle or failing one off."""
+    if active:
+        state["interval"] = POLL_INTERVAL_MIN
+    else:
+        state["interval"] = min(POLL_INTERVAL_MAX, state["interval"] * POLL_BACKOFF)
+    state["next_poll"] = time.monotonic() + state["interval"]
+
+
+def poll_due_divisions(states):
+    """
+    Poll every division whose next poll is due. A poll that fails (bad
+    payload, flatten or write error) is logged and that division backed
+    off, so one division cannot stop the poller.
+    """
+    for state in list(states.values()):
+        if state["next_poll"] > time.monotonic():
+            continue
+        try:
+            poll_division(state)
+        except Exception as e:
+            print(f"Polling Event {state['event_id']}, Division {state['division_id']} failed: "
+                  f"{type(e).__name__}: {e}")
+            schedule_next_poll(state, active=False)
+
+
+def main():
+    once = "--once" in sys.argv
+    apply_response_store_flags()
+    states = {}
+    next_events_refresh = 0
+
+    while True:
+        now = time.monotonic()
+        if now >= next_events_refresh:
+            try:
+                live_divisions = fetch_live_divisions()
+            except Exception as e:
+                # Keep polling the known divisions and re-read the list soon
+                print(f"Refreshing the live event list failed: {type(e).__name__}: {e}")
+                live_divisions = list(states)
+                next_events_refresh = now + POLL_INTERVAL_MIN
+            else:
+                next_events_refresh = now + EVENTS_REFRESH_INTERVAL
+            for event_id, division_id in live_divisions:
+                states.setdefault((event_id, division_id), {
+                    "event_id": event_id,
+                    "division_id": division_id,
+                    "fingerprints": {},
+                    "interval": POLL_INTERVAL_MIN,
+                    "next_poll": now,
+                })
+            for key in set(states) - set(live_divisions):
+                print(f"Event {key[0]}, Division {key[1]} is no longer live; stopping polls.")
+                del states[key]
+            print(f"Polling {len(states)} live division(s).")
+
+        poll_due_divisions(states)
+
+        if once:
+            break
+
+        wake_at = min([s["next_poll"] for s in states.values()] + [next_events_refresh])
+        time.sleep(max(0.0, wake_at - time.monotonic()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+## Shared test setup: make the repo-level utils package importable
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+# Division payloads committed under Historical Scrapes/Data/Raw/event_results
+EVENT_RESULTS_DIR = os.path.join(REPO_ROOT, "Historical Scrapes", "Data", "Raw", "event_results")
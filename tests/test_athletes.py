@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import REPO_ROOT
+from utils.functions_athletes import (
+    ATHLETE_ALIASES_FILE,
+    load_athlete_aliases,
+    resolve_athlete_ids,
+    strip_pwa_name_prefix,
+)
+
+ALIASES = {"pwa": {"E-510": "E-51", "K-579": "K-90"}, "iwt": {"1084037": "1416269"}}
+
+
+def test_committed_alias_table_loads():
+    aliases = load_athlete_aliases(os.path.join(REPO_ROOT, ATHLETE_ALIASES_FILE))
+    assert aliases["pwa"]["E-510"] == "E-51"
+
+
+def test_chained_aliases_are_rejected(tmp_path):
+    path = tmp_path / "aliases.csv"
+    pd.DataFrame({"source": ["pwa", "pwa"], "raw_id": ["A-1", "A-2"],
+                  "canonical_id": ["A-2", "A-3"], "note": ["", ""]}).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="A-2"):
+        load_athlete_aliases(path)
+
+
+def test_only_exact_matches_are_replaced():
+    ids = pd.Series(["E-510", "E-5100", "K-579", None, "E-510"], name="athlete_id")
+    resolved = resolve_athlete_ids(ids, "pwa", ALIASES)
+    assert resolved.drop(3).tolist() == ["E-51", "E-5100", "K-90", "E-51"]
+    assert pd.isna(resolved[3])
+    assert resolved.name == "athlete_id"
+
+
+def test_numeric_ids_keep_their_dtype():
+    ids = pd.Series([1084037, 5, 1084037])
+    resolved = resolve_athlete_ids(ids, "iwt", ALIASES)
+    assert resolved.dtype == ids.dtype and resolved.tolist() == [1416269, 5, 1416269]
+
+    floats = resolve_athlete_ids(pd.Series([1084037.0, float("nan")]), "iwt", ALIASES)
+    assert floats.iloc[0] == 1416269.0 and pd.isna(floats.iloc[1])
+
+
+def test_unknown_source_is_a_no_op():
+    ids = pd.Series(["E-510"])
+    assert resolve_athlete_ids(ids, "other", ALIASES).tolist() == ["E-510"]
+
+
+def test_strip_pwa_name_prefix():
+    assert strip_pwa_name_prefix(["Browne_BRA-105", "E-51", "van_der_Berg_NED-1"]).tolist() \
+        == ["BRA-105", "E-51", "NED-1"]
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+import utils.functions_pwa_scrape as fpprs
+from utils.functions_backfill import BackfillManifest, in_shard, shard_from_argv
+
+
+def test_shard_from_argv():
+    assert shard_from_argv(["script.py"]) == (0, 1)
+    assert shard_from_argv(["script.py", "--shard", "2/4"]) == (2, 4)
+    with pytest.raises(ValueError):
+        shard_from_argv(["script.py", "--shard", "4/4"])
+
+
+def test_every_event_has_exactly_one_shard():
+    for event_id in range(200):
+        owners = [i for i in range(4) if in_shard(event_id, i, 4)]
+        assert len(owners) == 1
+        assert in_shard(event_id, owners[0], 4) == in_shard(str(event_id), owners[0], 4)
+
+
+def test_manifest_resumes_and_combines_in_order(tmp_path):
+    manifest = BackfillManifest("test", directory=str(tmp_path))
+    manifest.save_unit("2", "b", {"heat_results": pd.DataFrame({"x": [3]}), "heat_scores": None},
+                       event_order=1, division_order=0)
+    manifest.save_unit("1", "a", {"heat_results": pd.DataFrame({"x": [1, 2]})}, event_order=0)
+
+    reopened = BackfillManifest("test", directory=str(tmp_path))
+    assert reopened.completed() == {("1", "a"), ("2", "b")}
+    assert reopened.is_done(2, "b") and not reopened.is_done(3, "c")
+    assert reopened.combine("heat_results")["x"].tolist() == [1, 2, 3]
+    assert reopened.combine("heat_scores") is None
+
+
+def test_manifest_events(tmp_path):
+    manifest = BackfillManifest("test", directory=str(tmp_path))
+    with pytest.raises(FileNotFoundError, match="--prepare"):
+        manifest.load_events()
+    events = [{"event_id": "1", "category_codes": ["a", "b"]}]
+    manifest.save_events(events)
+    assert BackfillManifest("test", directory=str(tmp_path)).load_events() == events
+
+
+def test_export_heat_scores_reports_failed_heats(monkeypatch):
+    def fetch(url):
+        if url.endswith("/2.json"):
+            raise ValueError("bad heatsheet")
+        return {"heat": {"heatId": "1", "heatNo": 1, "waveCount": 2, "jumpsCount": 1,
+                         "waveFactor": 1, "jumpFactor": 1, "sailors": [
+                             {"sailor": {"sailorName": "A", "sailNo": "E-1", "totalPoints": 5.0,
+                                         "scores": {"wave": [{"score": 5.0, "counting": True}]}}}]}}
+
+    monkeypatch.setattr(fpprs, "_fetch_heatsheet", fetch)
+    df, failed = fpprs.export_heat_scores("100", "cat", ["1", "2"], max_workers=2, return_failed=True)
+    assert failed == ["2"]
+    assert df["athleteId"].tolist() == ["A_E-1"]
+    assert fpprs.export_heat_scores("100", "cat", ["1"], max_workers=1).equals(df)
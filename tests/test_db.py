@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.functions_db import bulk_upsert
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        if self.connection.fail_on == len(self.connection.statements):
+            raise RuntimeError("lost connection")
+        self.connection.statements.append((query, params))
+
+
+class FakeConnection:
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.fail_on = fail_on
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_batches_in_one_transaction():
+    df = pd.DataFrame({"id": np.arange(5), "status": ["Live", None, "Upcoming", "Live", np.nan]})
+    connection = FakeConnection()
+    assert bulk_upsert(connection, "db.ALL_EVENTS", df, batch_size=2) == 5
+
+    assert [len(params) for _, params in connection.statements] == [4, 4, 2]
+    query, params = connection.statements[0]
+    assert query.startswith("INSERT INTO `db`.`ALL_EVENTS` (`id`, `status`) VALUES (%s, %s), (%s, %s)")
+    assert query.endswith("ON DUPLICATE KEY UPDATE `status` = VALUES(`status`)")
+    assert params == [0, "Live", 1, None] and type(params[0]) is int
+    assert connection.statements[2][1] == [4, None]
+    assert (connection.commits, connection.rollbacks) == (1, 0)
+
+
+def test_failed_batch_rolls_back():
+    connection = FakeConnection(fail_on=1)
+    with pytest.raises(RuntimeError):
+        bulk_upsert(connection, "ALL_EVENTS", pd.DataFrame({"id": range(3)}), batch_size=2)
+    assert (connection.commits, connection.rollbacks) == (0, 1)
+
+
+def test_empty_frame_is_a_no_op():
+    connection = FakeConnection()
+    assert bulk_upsert(connection, "ALL_EVENTS", pd.DataFrame({"id": []})) == 0
+    assert connection.statements == [] and connection.commits == 0
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from utils.functions_diff import diff_frames, updates_text
+
+
+def events(ids, statuses):
+    return pd.DataFrame({"id": ids, "status": statuses})
+
+
+def test_new_changed_unchanged_and_removed():
+    old = events([1, 2, 3], ["Upcoming", "Live", "Completed"])
+    new = events(["3", "2", "4"], ["Completed", "Completed", "Upcoming"])
+    new.index = [10, 11, 12]
+
+    diff, removed = diff_frames(old, new, "id", "status")
+
+    assert diff.index.tolist() == [10, 11, 12]
+    assert diff["change"].tolist() == ["unchanged", "changed", "new"]
+    assert diff["status_old"].tolist()[:2] == ["Completed", "Live"]
+    assert pd.isna(diff["status_old"].iloc[2])
+    assert removed["id"].tolist() == [1]
+    assert updates_text(diff).tolist() == ["", "Live -> Completed", "New Event Added"]
+
+
+def test_missing_on_both_sides_is_unchanged():
+    old = events([1, 2], ["Live", None])
+    new = events([1, 2], [None, None])
+    diff, _ = diff_frames(old, new, "id", "status")
+    assert diff["change"].tolist() == ["changed", "unchanged"]
+
+
+def test_empty_old_frame_marks_everything_new():
+    diff, removed = diff_frames(events([], []), events([1, 2], ["Live", "Upcoming"]), "id", "status")
+    assert diff["change"].tolist() == ["new", "new"]
+    assert removed.empty
+
+
+def test_composite_key_and_duplicate_old_keys():
+    old = pd.DataFrame({"heat_id": ["h1", "h1", "h1"], "athleteId": ["a", "b", "b"], "score": [1.0, 2.0, 3.0]})
+    new = pd.DataFrame({"heat_id": ["h1", "h1"], "athleteId": ["a", "b"], "score": [1.0, 3.0]})
+    diff, removed = diff_frames(old, new, ["heat_id", "athleteId"], ["score"])
+    assert diff["change"].tolist() == ["unchanged", "unchanged"]
+    assert removed.empty
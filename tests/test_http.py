@@ -0,0 +1,226 @@
+import email.utils
+import importlib
+import io
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import utils.functions_http as http
+
+
+@pytest.fixture
+def store_modes(monkeypatch):
+    monkeypatch.setattr(http, "RESPONSE_STORE_RECORD", False)
+    monkeypatch.setattr(http, "RESPONSE_STORE_REPLAY", False)
+    return http
+
+
+def test_recording_is_opt_in(monkeypatch):
+    monkeypatch.delenv("RESPONSE_STORE_RECORD", raising=False)
+    monkeypatch.delenv("RESPONSE_STORE_REPLAY", raising=False)
+    monkeypatch.setattr("sys.argv", ["script.py", "--replay"])
+    module = importlib.reload(http)
+    try:
+        # Importing the module never reads the command line
+        assert not module.RESPONSE_STORE_RECORD
+        assert not module.RESPONSE_STORE_REPLAY
+    finally:
+        monkeypatch.undo()
+        importlib.reload(http)
+
+
+def test_apply_response_store_flags(store_modes):
+    store_modes.apply_response_store_flags(["script.py", "--once"])
+    assert not store_modes.RESPONSE_STORE_RECORD and not store_modes.RESPONSE_STORE_REPLAY
+    store_modes.apply_response_store_flags(["script.py", "--record"])
+    assert store_modes.RESPONSE_STORE_RECORD and not store_modes.RESPONSE_STORE_REPLAY
+    store_modes.apply_response_store_flags(["script.py", "--replay"])
+    assert store_modes.RESPONSE_STORE_REPLAY
+
+
+def test_replay_miss_never_hits_the_network(store_modes, monkeypatch, tmp_path):
+    from utils import functions_response_store as store
+
+    monkeypatch.setattr(store, "_store", store.ResponseStore(directory=str(tmp_path)))
+    monkeypatch.setattr(http, "get_session", lambda: pytest.fail("network used in replay mode"))
+    store_modes.set_replay_mode()
+    with pytest.raises(store.ReplayMissError):
+        http.http_get("https://liveheats.com/api/graphql")
+
+
+@pytest.fixture
+def rate_limits(monkeypatch):
+    monkeypatch.setattr(http, "HOST_RATE_LIMITS", {"liveheats.com": (5.0, 10), "pwaworldtour.com": (4.0, 8)})
+    monkeypatch.setattr(http, "_buckets", {})
+    return http
+
+
+def test_most_specific_domain_wins(rate_limits):
+    rate_limits.set_rate_limit("www.pwaworldtour.com", 1.0, 2)
+    assert rate_limits._rate_limit_for("www.pwaworldtour.com") == ("www.pwaworldtour.com", (1.0, 2))
+    assert rate_limits._rate_limit_for("pwaworldtour.com") == ("pwaworldtour.com", (4.0, 8))
+    assert rate_limits._rate_limit_for("api.liveheats.com") == ("liveheats.com", (5.0, 10))
+    assert rate_limits._rate_limit_for("notliveheats.com") == ("notliveheats.com", http.DEFAULT_RATE_LIMIT)
+
+
+def test_parse_rate_limits():
+    assert http.parse_rate_limits("") == {}
+    assert http.parse_rate_limits(" liveheats.com=5:10, www.pwaworldtour.com=0.5:1 ") == {
+        "liveheats.com": (5.0, 10), "www.pwaworldtour.com": (0.5, 1)}
+    for value in ("liveheats.com", "liveheats.com=5", "liveheats.com=fast:10", "=5:10", "a.com=0:1"):
+        with pytest.raises(ValueError, match="Invalid HTTP_RATE_LIMITS entry"):
+            http.parse_rate_limits(value)
+
+
+def test_token_bucket_allows_burst_then_paces(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(http.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(http.time, "sleep", sleep)
+    bucket = http.TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert sleeps == []
+    bucket.acquire()
+    assert sleeps == [pytest.approx(0.5)]
+    clock[0] += 10   # Refills up to burst, not beyond
+    for _ in range(3):
+        bucket.acquire()
+    assert len(sleeps) == 1
+
+
+def fake_response(status_code, body=b"", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.raw = io.BytesIO(body)
+    response.headers = CaseInsensitiveDict(headers or {})
+    return response
+
+
+@pytest.fixture
+def origin(store_modes, monkeypatch):
+    """Stand-in for http_get: answers from a queue and records the request headers."""
+    server = {"responses": [], "requests": []}
+
+    def http_get(url, headers=None, **kwargs):
+        server["requests"].append((kwargs.get("params"), dict(headers or {})))
+        return server["responses"].pop(0)
+
+    monkeypatch.setattr(http, "http_get", http_get)
+    return server
+
+
+def test_cached_body_returned_on_304(origin, tmp_path):
+    url = "https://www.pwaworldtour.com/ladder.xml"
+    origin["responses"] = [fake_response(200, b"<ladder/>", {"ETag": '"v1"', "Content-Type": "text/xml"}),
+                           fake_response(304)]
+
+    first = http.http_get_cached(url, cache_dir=str(tmp_path))
+    second = http.http_get_cached(url, cache_dir=str(tmp_path))
+
+    assert origin["requests"][0][1] == {}
+    assert origin["requests"][1][1] == {"If-None-Match": '"v1"'}
+    assert first.content == second.content == b"<ladder/>"
+    assert second.status_code == 200 and second.from_cache
+    assert second.headers["Content-Type"] == "text/xml"
+
+
+def test_params_get_their_own_cache_entry(origin, tmp_path):
+    url = "https://www.pwaworldtour.com/index.php"
+    origin["responses"] = [fake_response(200, b"event 1", {"ETag": '"a"'}),
+                           fake_response(200, b"event 2", {"ETag": '"b"'}),
+                           fake_response(304)]
+
+    http.http_get_cached(url, cache_dir=str(tmp_path), params={"id": 1})
+    http.http_get_cached(url, cache_dir=str(tmp_path), params={"id": 2})
+    again = http.http_get_cached(url, cache_dir=str(tmp_path), params={"id": 1})
+
+    assert again.content == b"event 1"
+    assert origin["requests"][2] == ({"id": 1}, {"If-None-Match": '"a"'})
+
+
+def test_responses_without_validators_are_refetched(origin, tmp_path):
+    url = "https://www.pwaworldtour.com/live.json"
+    origin["responses"] = [fake_response(200, b"old"), fake_response(200, b"new")]
+
+    http.http_get_cached(url, cache_dir=str(tmp_path))
+    second = http.http_get_cached(url, cache_dir=str(tmp_path))
+
+    assert origin["requests"][1][1] == {}
+    assert second.content == b"new" and not getattr(second, "from_cache", False)
+
+
+class FakeSession:
+    """Answers session.request from a queue; an exception in it is raised."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def retry_client(store_modes, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(http, "wait_for_host", lambda url: None)
+    monkeypatch.setattr(http.time, "sleep", sleeps.append)
+    monkeypatch.setattr(http.random, "uniform", lambda low, high: high)
+
+    def use(*outcomes):
+        session = FakeSession(*outcomes)
+        monkeypatch.setattr(http, "get_session", lambda: session)
+        return session, sleeps
+    return use
+
+
+def test_retries_429_and_5xx_with_backoff(retry_client):
+    session, sleeps = retry_client(fake_response(503), fake_response(429), fake_response(200, b"ok"))
+    response = http.http_get("https://liveheats.com/api")
+    assert response.content == b"ok" and session.calls == 3
+    assert sleeps == [http.HTTP_BACKOFF_BASE, http.HTTP_BACKOFF_BASE * 2]
+
+
+def test_client_errors_are_not_retried(retry_client):
+    session, sleeps = retry_client(fake_response(404))
+    assert http.http_get("https://liveheats.com/api").status_code == 404
+    assert session.calls == 1 and sleeps == []
+
+
+def test_retry_after_seconds_and_date_are_capped(retry_client, monkeypatch):
+    monkeypatch.setattr(http.time, "time", lambda: 1_000_000.0)
+    in_30s = email.utils.formatdate(1_000_030.0, usegmt=True)
+    _, sleeps = retry_client(
+        fake_response(429, headers={"Retry-After": "7"}),
+        fake_response(503, headers={"Retry-After": in_30s}),
+        fake_response(429, headers={"Retry-After": "3600"}),
+        fake_response(200),
+    )
+    http.http_get("https://liveheats.com/api")
+    assert sleeps == [7.0, pytest.approx(30.0), http.HTTP_BACKOFF_MAX]
+
+
+def test_last_response_returned_once_retries_are_exhausted(retry_client):
+    session, sleeps = retry_client(*[fake_response(502) for _ in range(3)])
+    assert http.http_get("https://liveheats.com/api", max_retries=2).status_code == 502
+    assert session.calls == 3 and len(sleeps) == 2
+
+
+def test_network_error_raised_on_the_final_attempt(retry_client):
+    session, sleeps = retry_client(requests.ConnectionError("reset"), requests.Timeout("slow"),
+                                   requests.ConnectionError("reset again"))
+    with pytest.raises(requests.ConnectionError, match="reset again"):
+        http.http_get("https://liveheats.com/api", max_retries=2)
+    assert session.calls == 3 and len(sleeps) == 2
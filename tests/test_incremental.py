@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from utils.functions_incremental import (
+    load_fingerprints,
+    payload_fingerprint,
+    save_fingerprints,
+    tables_lock,
+    write_result_rows,
+)
+
+
+def test_payload_fingerprint_ignores_key_order_only():
+    a = {"id": 1, "heats": [{"score": 7.5, "athlete": "x"}]}
+    b = {"heats": [{"athlete": "x", "score": 7.5}], "id": 1}
+    assert payload_fingerprint(a) == payload_fingerprint(b)
+    assert payload_fingerprint(a) != payload_fingerprint({**a, "id": 2})
+    assert payload_fingerprint({"heats": [1, 2]}) != payload_fingerprint({"heats": [2, 1]})
+
+
+@pytest.fixture
+def tables(tmp_path):
+    return {"heat_scores": str(tmp_path / "scores.csv")}
+
+
+def read(path):
+    return pd.read_csv(path, dtype=str)
+
+
+def test_write_result_rows_merges_fingerprints(tmp_path, tables):
+    fingerprints_file = str(tmp_path / "fingerprints.json")
+    save_fingerprints({"1": {"10": "a", "11": "b"}, "2": {"20": "c"}}, fingerprints_file)
+
+    new_df = pd.DataFrame({"heat_id": ["h1", "h2"], "score": ["5.0", "6.0"]})
+    counts = write_result_rows([("heat_scores", "heat_id", ["h1", "h2"], new_df)],
+                               {"1": {"10": "z", "11": None}, "3": {"30": "d"}},
+                               tables=tables, fingerprints_file=fingerprints_file)
+
+    assert counts == {"heat_scores": (0, 2)}
+    assert read(tables["heat_scores"])["heat_id"].tolist() == ["h1", "h2"]
+    assert load_fingerprints(fingerprints_file) == {"1": {"10": "z"}, "2": {"20": "c"}, "3": {"30": "d"}}
+    assert not os.path.exists(fingerprints_file + ".lock")
+
+
+def test_concurrent_writers_keep_each_others_rows(tmp_path, tables):
+    fingerprints_file = str(tmp_path / "fingerprints.json")
+
+    def writer(name):
+        for i in range(10):
+            heat_id = f"{name}{i}"
+            write_result_rows([("heat_scores", "heat_id", [heat_id],
+                                pd.DataFrame({"heat_id": [heat_id], "score": ["1.0"]}))],
+                              {name: {str(i): "fp"}}, tables=tables, fingerprints_file=fingerprints_file)
+
+    threads = [threading.Thread(target=writer, args=(name,)) for name in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(read(tables["heat_scores"])) == 30
+    assert {event: len(divisions) for event, divisions in load_fingerprints(fingerprints_file).items()} \
+        == {"a": 10, "b": 10, "c": 10}
+
+
+def test_tables_lock_times_out_and_takes_over_stale_locks(tmp_path):
+    lock_path = str(tmp_path / "results.lock")
+    open(lock_path, "w").close()
+    with pytest.raises(TimeoutError):
+        with tables_lock(lock_path, timeout=0.2):
+            pass
+
+    old = time.time() - 60
+    os.utime(lock_path, (old, old))
+    with tables_lock(lock_path, timeout=0.2, stale_after=30):
+        assert os.path.exists(lock_path)
+    assert not os.path.exists(lock_path)
+
+
+def test_refresh_replaces_changed_and_dropped_divisions(tmp_path, tables, monkeypatch):
+    import utils.functions_incremental as incremental
+
+    fingerprints_file = str(tmp_path / "fingerprints.json")
+    save_fingerprints({"1": {"10": "old", "11": "same", "12": "gone"}}, fingerprints_file)
+    pd.DataFrame({"eventDivisionId": ["10", "11", "12"], "score": ["1", "2", "3"]}) \
+        .to_csv(tables["heat_scores"], index=False)
+
+    frames = {"heat_scores": pd.DataFrame({"eventDivisionId": ["10"], "score": ["9"]})}
+    monkeypatch.setattr(incremental, "fetch_changed_division_frames",
+                        lambda event_ids, fingerprints: (frames, ["10"], {"1": {"10": "new", "11": "same"}}))
+    events_df = pd.DataFrame({"id": [1], "status": ["Live"], "Updates": [""]})
+
+    assert incremental.refresh_event_results(events_df, tables, fingerprints_file) == ["10"]
+    assert read(tables["heat_scores"]).values.tolist() == [["11", "2"], ["10", "9"]]
+    assert load_fingerprints(fingerprints_file) == {"1": {"10": "new", "11": "same"}}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+def test_failed_division_fetch_keeps_its_rows(tmp_path, tables, monkeypatch):
+    import utils.functions_incremental as incremental
+    import utils.functions_iwt_scrape as fis
+    from utils.functions_ingest import load_division_file
+    from conftest import EVENT_RESULTS_DIR
+
+    payload = next(
+        data for data in (load_division_file(os.path.join(EVENT_RESULTS_DIR, name))
+                          for name in sorted(os.listdir(EVENT_RESULTS_DIR)))
+        if data["data"]["eventDivision"]["heats"]
+    )
+    # Rows carry the payload's own division ID
+    changed = str(payload["data"]["eventDivision"]["id"])
+
+    def post(url, json=None, **kwargs):
+        division_id = json["variables"]["id"]
+        return FakeResponse(500) if division_id == "11" else FakeResponse(200, payload)
+
+    # The nested query is rejected, so event 1 goes through the per-division fallback
+    monkeypatch.setattr(fis, "_crawl_event_chunk", lambda event_ids: None)
+    monkeypatch.setattr(fis, "fetch_event_divisions", lambda event_id: [(changed, "Men"), ("11", "Women")])
+    monkeypatch.setattr(fis, "http_post", post)
+    monkeypatch.setattr(fis, "save_event_division_results",
+                        lambda *args: pytest.fail("the daily refresh must not save payloads"))
+
+    fingerprints_file = str(tmp_path / "fingerprints.json")
+    save_fingerprints({"1": {changed: "old", "11": "kept", "12": "gone"}}, fingerprints_file)
+    pd.DataFrame({"eventDivisionId": [changed, "11", "12"], "score": ["1", "2", "3"]}) \
+        .to_csv(tables["heat_scores"], index=False)
+    events_df = pd.DataFrame({"id": [1], "status": ["Live"], "Updates": [""]})
+
+    assert incremental.refresh_event_results(events_df, tables, fingerprints_file) == [changed]
+    scores = read(tables["heat_scores"])
+    assert scores.loc[scores["eventDivisionId"] == "11", "score"].tolist() == ["2"]
+    assert "12" not in set(scores["eventDivisionId"])
+    assert (scores["eventDivisionId"] == changed).sum() > 1
+    assert load_fingerprints(fingerprints_file) == {"1": {changed: payload_fingerprint(payload), "11": "kept"}}
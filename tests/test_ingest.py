@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from conftest import EVENT_RESULTS_DIR, REPO_ROOT
+from utils.functions_ingest import division_files, ingest_event_results, load_division_file
+from utils.functions_incremental import IWT_RESULT_TABLES
+from utils.functions_iwt_scrape import flatten_event_division
+
+TABLES = ["heat_progression", "heat_results", "heat_scores", "final_ranks"]
+
+
+def expected_rows(input_dir):
+    rows = dict.fromkeys(TABLES, 0)
+    for path, event_id, division_id in division_files(input_dir):
+        for table, df in flatten_event_division(load_division_file(path), event_id, division_id).items():
+            rows[table] += 0 if df is None else len(df)
+    return rows
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    """The first few committed fixtures, including divisions without heats."""
+    directory = tmp_path / "event_results"
+    directory.mkdir()
+    for name in sorted(os.listdir(EVENT_RESULTS_DIR))[:12]:
+        shutil.copy(os.path.join(EVENT_RESULTS_DIR, name), directory)
+    return str(directory)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_ingest_reads_back(tmp_path, input_dir, workers):
+    output_dir = str(tmp_path / "parquet")
+    assert ingest_event_results(input_dir, output_dir, workers=workers) == {}
+
+    for table, rows in expected_rows(input_dir).items():
+        if rows == 0:
+            continue
+        df = pd.read_parquet(os.path.join(output_dir, table))
+        assert len(df) == rows
+        assert set(df["event_id"].astype(str)) <= {event_id for _, event_id, _ in division_files(input_dir)}
+
+
+def test_failed_files_are_reported(tmp_path, input_dir):
+    with open(os.path.join(input_dir, "event_1_division_2.json"), "w") as f:
+        f.write("{not json")
+    failures = ingest_event_results(input_dir, str(tmp_path / "parquet"), workers=1)
+    assert list(map(os.path.basename, failures)) == ["event_1_division_2.json"]
+
+
+@pytest.fixture(scope="module")
+def full_ingest(tmp_path_factory):
+    output_dir = str(tmp_path_factory.mktemp("parquet"))
+    assert ingest_event_results(EVENT_RESULTS_DIR, output_dir, workers=2) == {}
+    return output_dir
+
+
+def division_counts(df):
+    return df["eventDivisionId"].astype(str).value_counts().sort_index()
+
+
+@pytest.mark.parametrize("table", TABLES)
+def test_full_ingest_matches_the_raw_tables(full_ingest, table):
+    ingested = pd.read_parquet(os.path.join(full_ingest, table))
+    raw = pd.read_csv(os.path.join(REPO_ROOT, IWT_RESULT_TABLES[table]), dtype=str)
+    if table == "heat_progression":
+        # The raw progression table is hand-formatted and leaves some
+        # divisions out; the ones it holds must match heat for heat
+        assert set(raw["heat_id"]) <= set(ingested["heat_id"])
+        ingested = ingested[ingested["eventDivisionId"].astype(str).isin(set(raw["eventDivisionId"]))]
+    assert len(ingested) == len(raw)
+    pd.testing.assert_series_equal(division_counts(ingested), division_counts(raw))
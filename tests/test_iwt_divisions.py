@@ -0,0 +1,138 @@
+import pytest
+
+import utils.functions_iwt_scrape as fis
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+def serve(monkeypatch, answer):
+    """Answer each aliased division query with answer({alias: event_id})."""
+    queries = []
+
+    def post(url, headers=None, json=None):
+        queries.append(json["variables"])
+        return FakeResponse(answer(json["variables"]))
+
+    monkeypatch.setattr(fis, "http_post", post)
+    return queries
+
+
+def divisions(event_id):
+    return {"eventDivisions": [{"id": f"{event_id}0", "division": {"id": "1", "name": "Men"}}]}
+
+
+def test_batches_split_back_per_event(monkeypatch):
+    queries = serve(monkeypatch, lambda variables: {"data": {
+        a: (divisions(ev) if ev != "2" else {"eventDivisions": []}) for a, ev in variables.items()
+    }})
+    result = fis.fetch_event_divisions_batch(["1", "2", "3", "1"], chunk_size=2)
+    assert result == {"1": [("10", "Men")], "2": [], "3": [("30", "Men")]}
+    assert len(queries) == 2
+
+
+def test_rejected_chunk_is_split_and_retried(monkeypatch):
+    queries = serve(monkeypatch, lambda variables: (
+        {"data": None, "errors": [{"message": "too complex"}]} if len(variables) > 1
+        else {"data": {a: divisions(ev) for a, ev in variables.items()}}
+    ))
+    assert fis.fetch_event_divisions_batch(["1", "2"]) == {"1": [("10", "Men")], "2": [("20", "Men")]}
+    assert [len(q) for q in queries] == [2, 1, 1]
+
+
+def test_rejected_single_event_raises(monkeypatch):
+    serve(monkeypatch, lambda variables: {"data": None, "errors": [{"message": "boom"}]})
+    with pytest.raises(RuntimeError, match="rejected"):
+        fis.fetch_event_divisions_batch(["1"])
+
+
+def test_null_alias_with_error_raises(monkeypatch):
+    serve(monkeypatch, lambda variables: {
+        "data": {"e0": divisions("1"), "e1": None},
+        "errors": [{"message": "internal error", "path": ["e1"]}],
+    })
+    with pytest.raises(RuntimeError, match="event 2"):
+        fis.fetch_event_divisions_batch(["1", "2"])
+
+
+def crawl_server(monkeypatch, nested):
+    """
+    Answer nested crawl queries with nested({alias: event_id}); the
+    per-event division listing and per-division queries of the fallback
+    are answered from divisions(). Returns the kinds of queries sent.
+    """
+    sent = []
+
+    def post(url, headers=None, json=None):
+        variables = json["variables"]
+        if "getEventsNested" in json["query"]:
+            sent.append(("nested", tuple(variables.values())))
+            return FakeResponse(nested(variables))
+        if "getEventDivision(" in json["query"]:
+            sent.append(("division", variables["id"]))
+            return FakeResponse({"data": {"eventDivision": {"id": variables["id"], "heats": []}}})
+        sent.append(("listing", variables["id"]))
+        return FakeResponse({"data": {"event": divisions(variables["id"])}})
+
+    monkeypatch.setattr(fis, "http_post", post)
+    monkeypatch.setattr(fis, "save_event_division_results", lambda *args: sent.append(("save",) + args[1:]))
+    return sent
+
+
+def nested_event(event_id):
+    return {"id": event_id, "eventDivisions": [{"id": f"{event_id}0", "heats": []},
+                                               {"id": f"{event_id}1", "heats": []}]}
+
+
+def crawl(event_ids, **kwargs):
+    return [(ev, div, data["data"]["eventDivision"]["id"] if data else None)
+            for ev, div, data in fis.crawl_event_division_results(event_ids, save=False, **kwargs)]
+
+
+def test_crawl_fetches_whole_events_per_query(monkeypatch):
+    sent = crawl_server(monkeypatch, lambda variables: {
+        "data": {a: nested_event(ev) for a, ev in variables.items()}
+    })
+    assert crawl(["1", "2", "3"], chunk_size=2) == [
+        ("1", "10", "10"), ("1", "11", "11"), ("2", "20", "20"),
+        ("2", "21", "21"), ("3", "30", "30"), ("3", "31", "31"),
+    ]
+    assert sent == [("nested", ("1", "2")), ("nested", ("3",))]
+
+
+def test_crawl_splits_rejected_chunks_then_falls_back(monkeypatch):
+    sent = crawl_server(monkeypatch, lambda variables: (
+        {"data": None, "errors": [{"message": "too complex"}]}
+        if len(variables) > 1 or "2" in variables.values()
+        else {"data": {a: nested_event(ev) for a, ev in variables.items()}}
+    ))
+    assert crawl(["1", "2"]) == [("1", "10", "10"), ("1", "11", "11"), ("2", "20", "20")]
+    assert sent == [("nested", ("1", "2")), ("nested", ("1",)), ("nested", ("2",)),
+                    ("listing", "2"), ("division", "20")]
+
+
+def test_crawl_sends_events_with_errors_to_the_fallback(monkeypatch):
+    sent = crawl_server(monkeypatch, lambda variables: {
+        "data": {"e0": nested_event("1"), "e1": None, "e2": None},
+        "errors": [{"message": "internal error", "path": ["e1", "eventDivisions"]}],
+    })
+    # Event 3 is simply unknown (null without an error) and has no divisions
+    assert crawl(["1", "2", "3"]) == [("1", "10", "10"), ("1", "11", "11"), ("2", "20", "20")]
+    assert sent[1:] == [("listing", "2"), ("division", "20")]
+
+
+def test_crawl_saves_only_when_asked(monkeypatch):
+    sent = crawl_server(monkeypatch, lambda variables: {"data": None, "errors": [{"message": "no"}]})
+    list(fis.crawl_event_division_results(["1"], save=False))
+    assert not [s for s in sent if s[0] == "save"]
+    list(fis.crawl_event_division_results(["1"]))
+    assert ("save", "1", "10") in sent
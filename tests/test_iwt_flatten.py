@@ -0,0 +1,153 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import EVENT_RESULTS_DIR
+from utils.functions_iwt_scrape import (
+    calculate_final_rank_heat_info,
+    flatten_event_division,
+    flatten_heat_results_and_scores,
+    is_no_heat_info,
+    rank_final_heat_info,
+)
+
+
+def division(heats):
+    return {"data": {"eventDivision": {
+        "heats": heats,
+        "division": {"name": "Men"},
+        "formatDefinition": {"progression": None},
+    }}}
+
+
+def heat(heat_id, results, round_position=0):
+    return {"id": heat_id, "eventDivisionId": "10", "round": "Final",
+            "roundPosition": round_position, "position": 0, "result": results}
+
+
+def result(athlete_id, place, rides):
+    return {"athleteId": athlete_id, "total": None, "winBy": None, "needs": None,
+            "place": place, "rides": {athlete_id: rides}}
+
+
+def test_no_heats_or_results_gives_none():
+    assert flatten_heat_results_and_scores(division([]), "1", "10") == (None, None)
+    assert flatten_heat_results_and_scores(division([heat("h1", [])]), "1", "10") == (None, None)
+    assert flatten_heat_results_and_scores({"data": None}, "1", "10") == (None, None)
+
+
+def test_results_without_rides_give_no_scores():
+    df_res, df_scr = flatten_heat_results_and_scores(division([heat("h1", [result("a", "1", [])])]), "1", "10")
+    assert df_scr is None
+    assert df_res["athleteId"].tolist() == ["a"]
+
+
+def test_missing_category_and_scoring_ride_get_defaults():
+    rides = [
+        {"total": 6.5, "modified_total": 6.5, "modifier": None, "category": "waves", "scoring_ride": True},
+        {"total": 3.0, "modified_total": 3.0, "modifier": None, "scoring_ride": True},
+        {"total": 9.0, "modified_total": 9.0, "modifier": None},
+    ]
+    _, df_scr = flatten_heat_results_and_scores(division([heat("h1", [result("a", "1", rides)])]), "1", "10")
+    assert df_scr["type"].iloc[0] == "wave"
+    assert df_scr["type"].iloc[1:].isna().all()
+    assert df_scr["counting"].tolist() == [True, True, False]
+    # Only counting rides add up
+    assert df_scr["total_points"].tolist() == [9.5, 9.5, 9.5]
+
+
+def test_total_points_per_heat_and_athlete():
+    ride = lambda total, counting: {"total": total, "modified_total": total, "modifier": None,
+                                    "category": "jumps", "scoring_ride": counting}
+    data = division([
+        heat("h1", [result("a", "1", [ride(5.0, True), ride(4.0, True)]),
+                    result("b", "2", [ride(7.0, None)])]),
+        heat("h2", [result("a", "1", [ride(1.0, True)])], round_position=1),
+    ])
+    _, df_scr = flatten_heat_results_and_scores(data, "1", "10")
+    totals = df_scr.groupby(["heat_id", "athleteId"])["total_points"].first().to_dict()
+    assert totals == {("h1", "a"): 9.0, ("h1", "b"): 0.0, ("h2", "a"): 1.0}
+    assert df_scr["type"].eq("jump").all()
+
+
+@pytest.mark.parametrize("name", sorted(os.listdir(EVENT_RESULTS_DIR)))
+def test_committed_fixtures_flatten(name):
+    event_id, division_id = name[len("event_"):-len(".json")].split("_division_")
+    with open(os.path.join(EVENT_RESULTS_DIR, name)) as f:
+        frames = flatten_event_division(json.load(f), event_id, division_id)
+    assert set(frames) == {"heat_progression", "heat_results", "heat_scores", "final_ranks"}
+    scores = frames["heat_scores"]
+    if scores is not None:
+        assert scores["counting"].dtype == bool
+        assert not scores[["score", "total_points"]].isna().any().any()
+        assert set(frames["heat_results"]["athleteId"]) >= set(scores["athleteId"])
+    assert all(df is None or isinstance(df, pd.DataFrame) for df in frames.values())
+
+
+def row_loop_final_ranks(df_results, event_id, division_id):
+    """The row-by-row ranking rank_final_heat_info replaced, kept as the reference."""
+    athlete_best = {}
+    for _, row in df_results.iterrows():
+        aid = row['athleteId']
+        rp = row.get('roundPosition', 0)
+        pl = int(row.get('place', 999))
+        stored = athlete_best.get(aid)
+        if stored:
+            if rp > stored[0] or (rp == stored[0] and pl < stored[1]):
+                athlete_best[aid] = (rp, pl)
+        else:
+            athlete_best[aid] = (rp, pl)
+    sorted_ath = sorted(athlete_best.items(), key=lambda x: (-x[1][0], x[1][1]))
+    rows = []
+    prev_key = None
+    for i, (aid, (rp, pl)) in enumerate(sorted_ath):
+        rank = 1 if i == 0 else (i + 1 if (rp, pl) != prev_key else rank)
+        rows.append({'source': 'Live Heats', 'event_id': event_id, 'eventDivisionId': division_id,
+                     'athleteId': aid, 'place': rank})
+        prev_key = (rp, pl)
+    return pd.DataFrame(rows) if rows else None
+
+
+def results_frame(rows):
+    return pd.DataFrame(rows, columns=["event_id", "eventDivisionId", "athleteId", "roundPosition", "place"])
+
+
+def test_final_ranks_ties_and_first_seen_order():
+    df = results_frame([
+        ("1", "10", "a", 0, "1"), ("1", "10", "b", 0, "2"), ("1", "10", "c", 0, "2"),
+        ("1", "10", "d", 0, "3"), ("1", "10", "a", 1, "1"),
+        ("1", "10", "e", 1, "2"), ("1", "10", "f", 1, "2"),
+    ])
+    ranks = rank_final_heat_info(df)
+    # a won round 1; e and f tie second there; then round 0's b and c tie, ahead of d
+    assert ranks["athleteId"].tolist() == ["a", "e", "f", "b", "c", "d"]
+    assert ranks["place"].tolist() == [1, 2, 2, 4, 4, 6]
+
+
+def test_final_ranks_for_several_divisions_in_one_frame():
+    df = results_frame([
+        ("2", "20", "x", 0, "2"), ("1", "10", "a", 0, "1"), ("2", "20", "y", 0, "1"),
+        ("1", "10", "b", 0, "1"), ("1", "10", "c", 0, "3"),
+    ])
+    ranks = rank_final_heat_info(df)
+    assert ranks[["eventDivisionId", "athleteId", "place"]].values.tolist() == [
+        ["20", "y", 1], ["20", "x", 2], ["10", "a", 1], ["10", "b", 1], ["10", "c", 3],
+    ]
+
+
+def test_final_ranks_match_the_row_loop():
+    compared = 0
+    for name in sorted(os.listdir(EVENT_RESULTS_DIR)):
+        event_id, division_id = name[len("event_"):-len(".json")].split("_division_")
+        with open(os.path.join(EVENT_RESULTS_DIR, name)) as f:
+            data = json.load(f)
+        df_results, _ = flatten_heat_results_and_scores(data, event_id, division_id)
+        if df_results is None or is_no_heat_info(data):
+            continue
+        pd.testing.assert_frame_equal(calculate_final_rank_heat_info(df_results, event_id, division_id),
+                                      row_loop_final_ranks(df_results, event_id, division_id),
+                                      check_dtype=False, obj=name)
+        compared += 1
+    assert compared > 0
@@ -0,0 +1,47 @@
+import time
+
+import live_events_poller as poller
+
+
+def payload(*heats):
+    return {"data": {"eventDivision": {"heats": list(heats)}}}
+
+
+def new_state(event_id, division_id):
+    return {"event_id": event_id, "division_id": division_id, "fingerprints": {},
+            "interval": poller.POLL_INTERVAL_MIN, "next_poll": 0}
+
+
+def test_heat_fingerprints_ignore_key_order():
+    a = poller.heat_fingerprints(payload({"id": 1, "round": "Final", "result": []}))
+    b = poller.heat_fingerprints(payload({"result": [], "round": "Final", "id": 1}))
+    assert a == b and list(a) == ["1"]
+
+
+def test_has_running_heat():
+    assert poller.has_running_heat(payload({"id": 1, "startTime": "t", "endTime": None}))
+    assert not poller.has_running_heat(payload({"id": 1, "startTime": "t", "endTime": "t2"}))
+    assert not poller.has_running_heat({"data": None})
+
+
+def test_failed_poll_backs_off_and_others_still_run(monkeypatch):
+    written = []
+
+    def write(data, event_id, division_id, changed_heat_ids, fingerprint):
+        if division_id == "bad":
+            raise ValueError("cannot flatten")
+        written.append((event_id, division_id, changed_heat_ids))
+
+    monkeypatch.setattr(poller, "fetch_event_division_results",
+                        lambda event_id, division_id: payload({"id": division_id, "endTime": "t"}))
+    monkeypatch.setattr(poller, "write_changed_heats", write)
+
+    states = {("1", "bad"): new_state("1", "bad"), ("1", "good"): new_state("1", "good")}
+    poller.poll_due_divisions(states)
+
+    assert written == [("1", "good", ["good"])]
+    bad, good = states[("1", "bad")], states[("1", "good")]
+    assert bad["interval"] == poller.POLL_INTERVAL_MIN * poller.POLL_BACKOFF
+    assert bad["fingerprints"] == {}   # Retried in full on the next poll
+    assert good["interval"] == poller.POLL_INTERVAL_MIN and good["fingerprints"]
+    assert bad["next_poll"] > time.monotonic()
@@ -0,0 +1,123 @@
+import xml.etree.ElementTree as ET
+
+from utils.functions_pwa_scrape import parse_ladder_xml
+
+
+def text(elem, tag):
+    return elem.find(tag).text if elem.find(tag) is not None else None
+
+
+def fromstring_parse(xml_content, event_id, category_code):
+    """The ET.fromstring + find/findall parse parse_ladder_xml replaced, kept as the reference."""
+    all_data, heat_progression_data = [], []
+    for elimination in ET.fromstring(xml_content).findall('elimination'):
+        discipline = text(elimination, 'discipline')
+        if discipline != 'wave':
+            continue
+        event, elimination_name, sex = text(elimination, 'event'), text(elimination, 'name'), text(elimination, 'sex')
+        elimination_toadvance = text(elimination, 'toAdvance')
+        rounds = elimination.find('rounds')
+        if rounds is None:
+            continue
+        for round_elem in rounds.findall('round'):
+            round_name_raw = text(round_elem, 'name')
+            round_toadvance_elem = round_elem.find('toAdvance')
+            if round_toadvance_elem is not None and round_toadvance_elem.text is not None:
+                toadvance = round_toadvance_elem.text
+            else:
+                toadvance = elimination_toadvance
+            if round_name_raw and round_name_raw.isdigit():
+                round_order, round_name = int(round_name_raw) - 1, f"Round {round_name_raw}"
+            else:
+                round_order, round_name = None, f"Round {round_name_raw}" if round_name_raw else None
+            for heat in round_elem.findall('heats/heatGroup/heat'):
+                heat_progression_data.append({
+                    'event_id': event_id, 'eventDivisionId': category_code, 'sex': sex,
+                    'round_name': round_name, 'round_order': round_order,
+                    'heat_id': text(heat, 'heatId'), 'heat_order': text(heat, 'heatName'),
+                    'total_winners_progressing': toadvance, 'winners_progressing_to_round_order': '',
+                    'total_losers_progressing': '', 'losers_progressing_to_round_order': ''
+                })
+            for heat in round_elem.findall('heats/heatGroup/heat'):
+                sailors_node = heat.find('sailors')
+                if sailors_node is None:
+                    continue
+                for sailor in sailors_node.findall('sailor'):
+                    all_data.append({
+                        'event_id': event_id, 'Event': event, 'Elimination Name': elimination_name,
+                        'Discipline': discipline, 'eventDivision': sex, 'Round': round_name,
+                        'Heat ID': text(heat, 'heatId'), 'Heat Name': text(heat, 'heatName'),
+                        'Sailor Name': text(sailor, 'sailorName'), 'Sailor Number': text(sailor, 'sailNr'),
+                        'Place': text(sailor, 'place'), 'Category Code': category_code
+                    })
+    return all_data, heat_progression_data
+
+
+def heat(heat_id, *sailors):
+    sailor_xml = "".join(
+        f"<sailor><sailorName>{name}</sailorName><sailNr>{nr}</sailNr><place>{place}</place></sailor>"
+        for name, nr, place in sailors
+    )
+    return (f"<heat><heatId>{heat_id}</heatId><heatName>Heat {heat_id}</heatName>"
+            f"<sailors>{sailor_xml}</sailors></heat>")
+
+
+LADDER_XML = f"""<?xml version="1.0" encoding="UTF-8"?>
+<ladder>
+  <elimination>
+    <event>Sylt</event>
+    <name>Single Elimination</name>
+    <toAdvance>2</toAdvance>
+    <rounds>
+      <round><name>1</name><heats><heatGroup>
+        {heat("11", ("Browne", "BRA-105", "1"), ("Meldrum", "K-90", "2"))}
+        {heat("12", ("Koster", "G-44", "1"))}
+        <heat><heatId>13</heatId><heatName>Heat 13</heatName></heat>
+      </heatGroup></heats></round>
+      <round><name>Final</name><toAdvance>1</toAdvance><heats><heatGroup>
+        {heat("21", ("Browne", "BRA-105", "1"))}
+      </heatGroup><heatGroup>
+        {heat("22", ("Koster", "G-44", "2"))}
+      </heatGroup></heats></round>
+    </rounds>
+    <rounds>
+      <round><name>9</name><heats><heatGroup>{heat("99", ("Ignored", "X-1", "1"))}</heatGroup></heats></round>
+    </rounds>
+    <discipline>wave</discipline>
+    <sex>male</sex>
+  </elimination>
+  <elimination>
+    <event>Sylt</event>
+    <name>Slalom</name>
+    <discipline>slalom</discipline>
+    <sex>male</sex>
+    <rounds><round><name>1</name><heats><heatGroup>{heat("31", ("Fast", "F-1", "1"))}</heatGroup></heats></round></rounds>
+  </elimination>
+  <elimination>
+    <event>Sylt</event>
+    <name>Double Elimination</name>
+    <rounds>
+      <round><name>2</name><toAdvance/><heats><heatGroup>{heat("41", ("Offringa", "NB-1", "1"))}</heatGroup></heats></round>
+    </rounds>
+    <toAdvance>4</toAdvance>
+    <sex>female</sex>
+    <discipline>wave</discipline>
+  </elimination>
+  <elimination>
+    <name>Freestyle</name>
+    <discipline>freestyle</discipline>
+  </elimination>
+</ladder>
+""".encode("utf-8")
+
+
+def test_parse_ladder_xml_matches_the_tree_parse():
+    results, progression = parse_ladder_xml(LADDER_XML, "900", "1234")
+    assert (results, progression) == fromstring_parse(LADDER_XML, "900", "1234")
+
+    assert [row["heat_id"] for row in progression] == ["11", "12", "13", "21", "22", "41"]
+    assert [row["Sailor Number"] for row in results] == ["BRA-105", "K-90", "G-44", "BRA-105", "G-44", "NB-1"]
+    # discipline/sex given after the rounds still apply; an empty round toAdvance falls back
+    assert {row["sex"] for row in progression} == {"male", "female"}
+    assert [row["total_winners_progressing"] for row in progression] == ["2", "2", "2", "1", "1", "4"]
+    assert progression[3]["round_name"] == "Round Final" and progression[3]["round_order"] is None
@@ -0,0 +1,129 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.functions_storage import (
+    SHARED_KEYS,
+    KeyDictionary,
+    compact_frame,
+    read_partitioned,
+    write_partitioned,
+)
+
+TABLES = {
+    "heat_scores": {"heat_id": ["h1", "h2", "h3"], "athlete_id": ["a", "BRA-105", "c"],
+                    "score": [1.5, 2.0, 3.0], "counting": [True, False, None], "type": ["Wave", "Jump", None]},
+    "heat_results": {"heat_id": ["h1", "h2", "h3"], "athlete_id": ["a", "BRA-105", "c"],
+                     "place": [1, 2, None], "round": ["Final", "Final", "Semi"]},
+    "heat_progression": {"heat_id": ["h1", "h2", "h3"], "round_name": ["Final", "Final", "Semi"],
+                         "round_order": [0, 1, 2], "y_pos": [1.0, 1.5, 2.0]},
+    "final_ranks": {"athlete_id": ["a", "BRA-105", "c"], "name": ["A", "B", "C"],
+                    "place": [1, 1, 3], "incomplete": [False, True, False]},
+}
+
+
+def frame(table):
+    return pd.DataFrame({
+        "source": ["Live Heats", "PWA", "PWA"],
+        "event_id": [1, 2, 3],
+        "year": [2023, 2024, None],
+        **TABLES[table],
+    })
+
+
+def sort(df, columns):
+    return df[columns].sort_values("event_id").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("table", TABLES)
+def test_round_trip(tmp_path, table):
+    root = str(tmp_path / table)
+    written = write_partitioned(frame(table), table, root)
+    read = read_partitioned(table, root, compact=False)
+    pd.testing.assert_frame_equal(sort(read, written.columns), sort(written, written.columns))
+
+
+def test_partition_directories_are_not_percent_encoded(tmp_path):
+    root = str(tmp_path / "heat_scores")
+    write_partitioned(frame("heat_scores"), "heat_scores", root)
+    assert sorted(os.listdir(root)) == ["source=Live Heats", "source=PWA"]
+    assert sorted(os.listdir(os.path.join(root, "source=PWA"))) == ["year=2024", "year=__HIVE_DEFAULT_PARTITION__"]
+
+
+def test_filters(tmp_path):
+    root = str(tmp_path / "heat_scores")
+    write_partitioned(frame("heat_scores"), "heat_scores", root)
+    assert read_partitioned("heat_scores", root, source="Live Heats")["event_id"].tolist() == [1]
+    assert read_partitioned("heat_scores", root, years=(2024, 2030))["event_id"].tolist() == [2]
+    assert read_partitioned("heat_scores", root, years=2023)["event_id"].tolist() == [1]
+    assert sorted(read_partitioned("heat_scores", root, event_ids=["3", 1])["event_id"]) == [1, 3]
+    by_athlete = read_partitioned("heat_scores", root, athlete_ids=["BRA-105"], columns=["athlete_id", "score"],
+                                  keys=None)
+    assert by_athlete.to_dict("list") == {"athlete_id": ["BRA-105"], "score": [2.0]}
+
+
+def test_compact_read(tmp_path):
+    root = str(tmp_path / "heat_scores")
+    write_partitioned(frame("heat_scores"), "heat_scores", root)
+    df = read_partitioned("heat_scores", root, source="PWA")
+    assert str(df["event_id"].dtype) == "Int8"
+    assert df["score"].dtype == "float32"
+
+
+def test_default_read_codes_ids_with_shared_keys(tmp_path):
+    for table in ("heat_scores", "heat_results"):
+        write_partitioned(frame(table).assign(heat_id_athlete_id=lambda df: df["heat_id"] + "_" + df["athlete_id"]),
+                          table, str(tmp_path / table))
+    scores = read_partitioned("heat_scores", str(tmp_path / "heat_scores"))
+    results = read_partitioned("heat_results", str(tmp_path / "heat_results"))
+
+    assert scores["athlete_id"].dtype == np.int32 and scores["heat_id_athlete_id"].dtype == np.int64
+    joined = scores.merge(results, on="heat_id_athlete_id")
+    assert len(joined) == 3
+    assert sorted(SHARED_KEYS.decode("athlete_id", joined["athlete_id_x"])) == ["BRA-105", "a", "c"]
+
+
+def test_codes_are_stable_and_shared_between_frames():
+    keys = KeyDictionary()
+    first = keys.encode("athlete_id", ["BRA-105", "E-51", None, "BRA-105"])
+    second = keys.encode("athlete_id", ["K-90", "E-51"])
+
+    assert first.dtype == np.int32
+    assert first.tolist() == [0, 1, -1, 0]
+    assert second.tolist() == [2, 1]
+    assert keys.decode("athlete_id", [2, -1, 0]).tolist() == ["K-90", None, "BRA-105"]
+
+
+def test_composite_round_trip():
+    heat_codes = np.array([0, 5, -1, 70000])
+    athlete_codes = np.array([3, -1, 2, 2**31 - 1])
+    composite = KeyDictionary.composite(heat_codes, athlete_codes)
+
+    assert composite.dtype == np.int64
+    assert composite.tolist()[1:3] == [-1, -1]
+    heats, athletes = KeyDictionary.split(composite)
+    assert heats.tolist() == [0, -1, -1, 70000]
+    assert athletes.tolist() == [3, -1, -1, 2**31 - 1]
+
+
+def test_compact_frame_with_keys():
+    keys = KeyDictionary()
+    df = pd.DataFrame({
+        "heat_id": pd.array(["h1", "h1", "h2", "h2"], dtype="string"),
+        "athlete_id": pd.array(["a", "b", "a", None], dtype="string"),
+        "heat_id_athlete_id": ["h1_a", "h1_b", "h2_a", None],
+        "event_id": pd.array([1, 1, 2, None], dtype="Int64"),
+        "score": [7.5, 6.25, 0.1, np.nan],
+        "type": ["Wave", "Wave", "Wave", "Jump"],
+    })
+    compact = compact_frame(df, keys)
+
+    assert compact["heat_id"].dtype == np.int32 and compact["athlete_id"].tolist() == [0, 1, 0, -1]
+    assert compact["heat_id_athlete_id"].tolist()[:2] == [0, 1] and compact["heat_id_athlete_id"].iloc[3] == -1
+    assert str(compact["event_id"].dtype) == "Int8"
+    # 0.1 has no exact float32 form, so the scores stay float64
+    assert compact["score"].dtype == np.float64
+    assert isinstance(compact["type"].dtype, pd.CategoricalDtype)
+    assert keys.decode("heat_id", compact["heat_id"]).tolist() == ["h1", "h1", "h2", "h2"]
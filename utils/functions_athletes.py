@@ -0,0 +1,60 @@
+## Athlete ID canonicalisation (aliases -> one ID per athlete)
+import os
+
+import numpy as np
+import pandas as pd
+
+# source ('pwa' sail numbers / 'iwt' LiveHeats athlete IDs), raw_id, canonical_id, note
+ATHLETE_ALIASES_FILE = os.path.join("Athlete Database", "Clean Data", "athlete_id_aliases.csv")
+
+
+def load_athlete_aliases(path=ATHLETE_ALIASES_FILE):
+    """
+    Load the alias table as {source: {raw_id: canonical_id}} (IDs as strings).
+    Raises ValueError if a canonical ID is itself listed as an alias, so one
+    lookup always lands on the final ID.
+    """
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    aliases = {}
+    for source, group in df.groupby("source"):
+        mapping = dict(zip(group["raw_id"].str.strip(), group["canonical_id"].str.strip()))
+        chained = set(mapping.values()) & set(mapping)
+        if chained:
+            raise ValueError(f"{path}: canonical IDs {sorted(chained)} are also aliases ({source})")
+        aliases[source] = mapping
+    return aliases
+
+
+def strip_pwa_name_prefix(ids):
+    """'Browne_BRA-105' -> 'BRA-105': PWA heat sheets prefix sail numbers with the surname."""
+    return pd.Series(ids).str.rsplit("_", n=1).str[-1]
+
+
+def resolve_athlete_ids(ids, source, aliases=None):
+    """
+    Replace every ID that exactly matches an alias of source with its
+    canonical ID; other IDs (and missing values) are returned unchanged.
+    The lookup runs once per distinct ID and is broadcast back through the
+    factorized codes, so it stays O(n) on full-history frames. Numeric
+    LiveHeats IDs keep their dtype.
+    """
+    aliases = load_athlete_aliases() if aliases is None else aliases
+    mapping = aliases.get(source, {})
+    ids = pd.Series(ids)
+    if not mapping:
+        return ids
+
+    codes, uniques = pd.factorize(ids)
+    if uniques.dtype.kind in "iuf":
+        cast = float if uniques.dtype.kind == "f" else int
+        mapping = {cast(raw): cast(canonical) for raw, canonical in mapping.items()
+                   if raw.isdigit() and canonical.isdigit()}
+        resolved = [mapping.get(value, value) for value in uniques]
+    else:
+        resolved = [mapping.get(str(value), value) for value in uniques]
+
+    # Missing values have code -1: they pick the trailing placeholder and are
+    # then put back as they were
+    values = np.array(resolved + [None], dtype=object)[codes]
+    resolved_ids = pd.Series(values, index=ids.index, name=ids.name).where(codes != -1, ids)
+    return resolved_ids.astype(ids.dtype)
@@ -0,0 +1,138 @@
+## Checkpointed, resumable historical backfills
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+import pandas as pd
+
+# Root directory for backfill checkpoints (env var overrides the default)
+BACKFILL_DIR = os.getenv("BACKFILL_DIR", "backfill")
+
+
+def shard_from_argv(argv=None):
+    """
+    Read "--shard i/n" from the command line and return (shard_index, shard_count).
+    Shards are 0-based, so "--shard 0/4" ... "--shard 3/4" cover a backfill.
+    Returns (0, 1) when no shard is given.
+    """
+    argv = sys.argv if argv is None else argv
+    if "--shard" not in argv:
+        return 0, 1
+    value = argv[argv.index("--shard") + 1]
+    shard_index, shard_count = (int(x) for x in value.split("/"))
+    if not 0 <= shard_index < shard_count:
+        raise ValueError(f"Invalid shard {value}: expected i/n with 0 <= i < n")
+    return shard_index, shard_count
+
+
+def in_shard(event_id, shard_index=0, shard_count=1):
+    """
+    Stable event -> shard assignment (crc32 of the event ID), so every worker
+    process agrees on who owns an event without coordinating.
+    """
+    return zlib.crc32(str(event_id).encode("utf-8")) % shard_count == shard_index
+
+
+class BackfillManifest:
+    """
+    Manifest of completed (event_id, division_id) units for one source.
+
+    Each unit's frames are pickled under units/<event_id>/<division_id>/ as
+    soon as the unit finishes, and only then recorded in a SQLite manifest, so
+    a crashed run resumes from the last completed unit. SQLite handles the
+    locking, so several shard processes can share one manifest.
+    """
+
+    def __init__(self, source, directory=BACKFILL_DIR):
+        self.directory = os.path.join(directory, source)
+        os.makedirs(os.path.join(self.directory, "units"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.directory, "manifest.sqlite"), timeout=60)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS units (
+                event_id TEXT,
+                division_id TEXT,
+                event_order INTEGER,
+                division_order INTEGER,
+                tables TEXT,
+                finished_at REAL,
+                PRIMARY KEY (event_id, division_id)
+            )
+        """)
+        self._db.commit()
+
+    def save_events(self, events):
+        """
+        Store the backfill's event list (JSON-serialisable) so shard workers
+        share one calendar crawl instead of each repeating it.
+        """
+        path = os.path.join(self.directory, "events.json")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(events, f)
+        os.replace(tmp_path, path)
+
+    def load_events(self):
+        """Return the event list stored by save_events."""
+        path = os.path.join(self.directory, "events.json")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found: run the backfill with --prepare before starting shards")
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _unit_dir(self, event_id, division_id):
+        return os.path.join(self.directory, "units", str(event_id), str(division_id))
+
+    def completed(self):
+        """Return the set of completed (event_id, division_id) units as strings."""
+        return {(ev, div) for ev, div in self._db.execute("SELECT event_id, division_id FROM units")}
+
+    def is_done(self, event_id, division_id):
+        return self._db.execute(
+            "SELECT 1 FROM units WHERE event_id = ? AND division_id = ?",
+            (str(event_id), str(division_id))
+        ).fetchone() is not None
+
+    def save_unit(self, event_id, division_id, frames, event_order=0, division_order=0):
+        """
+        Persist a finished unit. frames maps table name -> DataFrame (None is
+        skipped). event_order/division_order fix the unit's place when the
+        tables are combined, whichever shard or run produced it.
+        """
+        unit_dir = self._unit_dir(event_id, division_id)
+        os.makedirs(unit_dir, exist_ok=True)
+        tables = []
+        for name, df in frames.items():
+            if df is None:
+                continue
+            path = os.path.join(unit_dir, f"{name}.pkl")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+            tables.append(name)
+
+        self._db.execute(
+            "INSERT OR REPLACE INTO units VALUES (?, ?, ?, ?, ?, ?)",
+            (str(event_id), str(division_id), event_order, division_order,
+             json.dumps(tables), time.time())
+        )
+        self._db.commit()
+
+    def combine(self, table):
+        """
+        Concatenate one table across all completed units in event/division
+        order. Returns None if no unit produced the table.
+        """
+        rows = self._db.execute(
+            "SELECT event_id, division_id, tables FROM units ORDER BY event_order, division_order"
+        ).fetchall()
+        dfs = [
+            pd.read_pickle(os.path.join(self._unit_dir(ev, div), f"{table}.pkl"))
+            for ev, div, tables in rows
+            if table in json.loads(tables)
+        ]
+        if not dfs:
+            return None
+        return pd.concat(dfs, ignore_index=True)
@@ -5,7 +5,7 @@ import re
 import numpy as np
 import json
 
-from utils.functions_iwt_scrape import fetch_event_divisions  
+from utils.functions_iwt_scrape import fetch_event_divisions_batch
 
 def _parse_rank(cell):
     """
@@ -232,10 +232,11 @@ def iwt_clean_events(input_json: str,
     with open(input_json, 'r') as f:
         events = json.load(f)
     
-    # 2) fetch divisions for each event
+    # 2) fetch divisions for all events (batched aliased queries)
+    divisions_by_event = fetch_event_divisions_batch([int(ev['event_id']) for ev in events])
     for ev in events:
         ev_id = int(ev['event_id'])
-        divs = fetch_event_divisions(ev_id) or []
+        divs = divisions_by_event.get(ev_id) or []
         ids, names = zip(*divs) if divs else ([], [])
         ev['division_ids']   = list(ids)
         ev['division_names'] = list(names)
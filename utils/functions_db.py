@@ -0,0 +1,54 @@
+## Bulk writes to the MySQL databases (ALL_EVENTS and the result tables)
+
+# Rows per multi-row INSERT statement
+UPSERT_BATCH_SIZE = 1000
+
+
+def _quote(name):
+    """Backtick-quote a (possibly schema-qualified) table name."""
+    return ".".join(f"`{part}`" for part in name.split("."))
+
+
+def _insert_batches(cursor, table, df, key_columns, batch_size):
+    """Send df as multi-row INSERT ... ON DUPLICATE KEY UPDATE statements."""
+    columns = list(df.columns)
+    column_sql = ", ".join(f"`{col}`" for col in columns)
+    row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    update_sql = ", ".join(f"`{col}` = VALUES(`{col}`)" for col in columns if col not in key_columns)
+    # Plain Python values (numpy scalars are not escapable), NaN/NaT as NULL
+    rows = list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        query = f"INSERT INTO {_quote(table)} ({column_sql}) VALUES {', '.join([row_sql] * len(batch))}"
+        if update_sql:
+            query += f" ON DUPLICATE KEY UPDATE {update_sql}"
+        cursor.execute(query, [value for row in batch for value in row])
+
+
+def bulk_upsert(connection, table, df, key_columns=("id",), batch_size=UPSERT_BATCH_SIZE):
+    """
+    Upsert df into table in batches of batch_size rows, so a load costs
+    rows / batch_size round trips rather than one per row.
+
+    connection is a DB-API (PyMySQL) connection and table may be schema
+    qualified ('db.ALL_EVENTS'). key_columns are left out of the UPDATE
+    clause. All batches run in one transaction that is committed at the
+    end and rolled back if any batch fails: on InnoDB, readers keep seeing
+    the table as it was until the commit and never a half-applied load,
+    and concurrent writes to other rows are not lost. (The connection must
+    not be in autocommit mode.)
+    Returns the number of rows sent.
+    """
+    if df.empty:
+        return 0
+    key_columns = set(key_columns)
+
+    try:
+        with connection.cursor() as cursor:
+            _insert_batches(cursor, table, df, key_columns, batch_size)
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    return len(df)
@@ -0,0 +1,68 @@
+## Set-based change detection between a stored table and a fresh fetch
+import numpy as np
+import pandas as pd
+
+
+def diff_frames(old_df, new_df, key, compare):
+    """
+    Diff new_df against old_df on the key column(s) with a single outer merge.
+
+    Returns (diff, removed):
+      diff    - new_df (same rows, order and index) plus a 'change' column
+                ('new', 'changed' or 'unchanged') and a '<col>_old' column
+                for every compared column
+      removed - the old_df rows whose key is no longer in new_df
+    Keys whose dtypes differ between the frames (e.g. integer ids read back
+    from the database vs. the API's strings) are compared as strings. A
+    compared column has changed when the values differ; missing on both
+    sides counts as equal. Duplicate keys in old_df keep their last row.
+    Works for composite keys too, e.g.
+    diff_frames(old_scores, new_scores, ['heat_id', 'athleteId'], ['score']).
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    compare = [compare] if isinstance(compare, str) else list(compare)
+    as_str = {k: str for k in keys
+              if old_df.empty or k not in old_df or old_df[k].dtype != new_df[k].dtype}
+
+    left = new_df[keys + compare].astype(as_str)
+    left["_new_row"] = np.arange(len(new_df))
+    if old_df.empty:
+        right = pd.DataFrame(columns=keys + compare + ["_old_row"]).astype(as_str)
+    else:
+        right = old_df[keys + compare].astype(as_str)
+        right["_old_row"] = np.arange(len(old_df))
+        right = right.drop_duplicates(keys, keep="last")
+
+    merged = left.merge(right, on=keys, how="outer", suffixes=("", "_old"), indicator=True)
+
+    changed = np.zeros(len(merged), dtype=bool)
+    for col in compare:
+        new_values, old_values = merged[col], merged[f"{col}_old"]
+        changed |= ((new_values != old_values) & ~(new_values.isna() & old_values.isna())).to_numpy()
+    merged["change"] = np.select(
+        [merged["_merge"] == "left_only", changed], ["new", "changed"], default="unchanged"
+    )
+
+    in_new = merged[merged["_merge"] != "right_only"].sort_values("_new_row")
+    diff = new_df.copy()
+    diff["change"] = in_new["change"].to_numpy()
+    for col in compare:
+        diff[f"{col}_old"] = in_new[f"{col}_old"].to_numpy()
+
+    removed_rows = merged.loc[merged["_merge"] == "right_only", "_old_row"].astype(int).sort_values()
+    removed = old_df.iloc[removed_rows.to_numpy()]
+    return diff, removed
+
+
+def updates_text(diff, column="status"):
+    """
+    The ALL_EVENTS 'Updates' text for a diff_frames result, aligned to its
+    rows: 'New Event Added', '<old> -> <new>' for a changed column, else ''.
+    """
+    transition = diff[f"{column}_old"].astype(str) + " -> " + diff[column].astype(str)
+    text = np.select(
+        [diff["change"] == "new", diff["change"] == "changed"],
+        ["New Event Added", transition.to_numpy(dtype=object)],
+        default=""
+    )
+    return pd.Series(text, index=diff.index, dtype=object)
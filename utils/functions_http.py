@@ -0,0 +1,355 @@
+## Shared HTTP client for all scrapers
+import json
+import os
+import random
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from utils.functions_response_store import ReplayMissError, get_response_store, request_key
+
+# Client settings
+HTTP_TIMEOUT = 30             # seconds per request
+HTTP_POOL_MAXSIZE = 16        # keep-alive connections kept per host
+HTTP_MAX_RETRIES = 5
+HTTP_BACKOFF_BASE = 0.5       # seconds, doubled on every retry
+HTTP_BACKOFF_MAX = 60         # cap for a single wait (also caps Retry-After)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# On-disk cache for conditional GETs (ETag / Last-Modified revalidation)
+HTTP_CACHE_DIR = "http_cache"
+
+# Response store modes, both off unless asked for: when recording, successful
+# live responses are written to the store; in replay mode requests are
+# answered exclusively from the store and never hit the network. Scripts turn
+# them on with --record / --replay (apply_response_store_flags), or set
+# RESPONSE_STORE_RECORD=1 / RESPONSE_STORE_REPLAY=1.
+RESPONSE_STORE_RECORD = os.getenv("RESPONSE_STORE_RECORD", "0") == "1"
+RESPONSE_STORE_REPLAY = os.getenv("RESPONSE_STORE_REPLAY", "0") == "1"
+
+# Per-host token-bucket limits: domain -> (requests per second, burst size).
+# A host matches a domain exactly or as a subdomain (www.pwaworldtour.com);
+# the longest matching domain wins, so overrides for a subdomain take effect.
+# Override with HTTP_RATE_LIMITS="liveheats.com=5:10,pwaworldtour.com=4:8".
+HOST_RATE_LIMITS = {
+    "liveheats.com": (5.0, 10),
+    "pwaworldtour.com": (4.0, 8),
+}
+DEFAULT_RATE_LIMIT = (5.0, 10)
+
+
+def parse_rate_limits(value):
+    """
+    Parse an HTTP_RATE_LIMITS value ("domain=rate:burst,...") into
+    {domain: (rate, burst)}; raises ValueError naming the bad entry.
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            domain, limit = item.split("=")
+            rate, burst = limit.split(":")
+            rate, burst = float(rate), int(burst)
+        except ValueError:
+            raise ValueError(
+                f"Invalid HTTP_RATE_LIMITS entry {item!r}: expected domain=rate:burst, "
+                f"e.g. liveheats.com=5:10"
+            ) from None
+        if not domain.strip() or rate <= 0 or burst < 1:
+            raise ValueError(f"Invalid HTTP_RATE_LIMITS entry {item!r}: need a domain, rate > 0 and burst >= 1")
+        limits[domain.strip()] = (rate, burst)
+    return limits
+
+
+HOST_RATE_LIMITS.update(parse_rate_limits(os.getenv("HTTP_RATE_LIMITS", "")))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session, creating it on first use.
+    The session keeps connections alive and pooled per host, so repeated
+    calls to the same site reuse the TCP+TLS connection.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at rate tokens per second up to burst,
+    and acquire() blocks until a token is available.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _rate_limit_for(host):
+    """
+    Return (domain, limit) for host: the most specific configured domain it
+    matches (www.pwaworldtour.com before pwaworldtour.com), else the host
+    itself with DEFAULT_RATE_LIMIT.
+    """
+    with _buckets_lock:
+        limits = list(HOST_RATE_LIMITS.items())
+    matches = [(domain, limit) for domain, limit in limits
+               if host == domain or host.endswith("." + domain)]
+    if not matches:
+        return host, DEFAULT_RATE_LIMIT
+    return max(matches, key=lambda match: len(match[0]))
+
+
+def set_rate_limit(domain, rate, burst):
+    """Set (or replace) the token-bucket limit for a domain."""
+    with _buckets_lock:
+        HOST_RATE_LIMITS[domain] = (rate, burst)
+        _buckets.pop(domain, None)
+
+
+def wait_for_host(url):
+    """
+    Block until the token bucket for the URL's host allows another request.
+    Buckets are shared by every thread in the process.
+    """
+    domain, (rate, burst) = _rate_limit_for(urlparse(url).hostname or "")
+    with _buckets_lock:
+        bucket = _buckets.get(domain)
+        if bucket is None:
+            bucket = _buckets[domain] = TokenBucket(rate, burst)
+    bucket.acquire()
+
+
+def _retry_after_seconds(response):
+    """
+    Parse a Retry-After header (delta-seconds or HTTP date) into seconds.
+    Returns None if the header is missing or unreadable.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_seconds(attempt):
+    """
+    Exponential backoff with full jitter for the given retry attempt (0-based).
+    """
+    ceiling = min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * (2 ** attempt))
+    return random.uniform(0, ceiling)
+
+
+def set_replay_mode(enabled=True):
+    """Switch replay mode on or off for this process."""
+    global RESPONSE_STORE_REPLAY
+    RESPONSE_STORE_REPLAY = enabled
+
+
+def set_record_mode(enabled=True):
+    """Switch response recording on or off for this process."""
+    global RESPONSE_STORE_RECORD
+    RESPONSE_STORE_RECORD = enabled
+
+
+def apply_response_store_flags(argv=None):
+    """
+    Turn recording / replay on for --record / --replay on a script's
+    command line (sys.argv by default). Modes set through the environment
+    are left as they are.
+    """
+    argv = sys.argv if argv is None else argv
+    if "--record" in argv:
+        set_record_mode()
+    if "--replay" in argv:
+        set_replay_mode()
+
+
+def http_request(method, url, max_retries=HTTP_MAX_RETRIES, **kwargs):
+    """
+    Send a request through the shared session, retrying transient failures.
+
+    Connection errors, timeouts and 429/5xx responses are retried with
+    exponential backoff and jitter; a Retry-After header takes precedence
+    over the computed backoff. Once retries are exhausted the last response
+    is returned (so callers can keep checking status_code) or the last
+    network exception is raised.
+
+    Every attempt first takes a token from the host's rate limiter.
+    Successful responses are recorded in the response store. In replay mode
+    the stored response is returned instead, and ReplayMissError is raised
+    if the request was never recorded.
+    """
+    key = request_key(method, url, params=kwargs.get("params"),
+                      json_body=kwargs.get("json"), data=kwargs.get("data"))
+    if RESPONSE_STORE_REPLAY:
+        response = get_response_store().get(key)
+        if response is None:
+            raise ReplayMissError(f"No stored response for {method} {url}")
+        return response
+
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    session = get_session()
+
+    for attempt in range(max_retries + 1):
+        wait_for_host(url)
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                raise
+            wait = _backoff_seconds(attempt)
+            print(f"{method} {url} failed ({e.__class__.__name__}); retrying in {wait:.1f}s")
+            time.sleep(wait)
+            continue
+
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            if RESPONSE_STORE_RECORD and response.status_code == 200:
+                get_response_store().put(key, method, response)
+            return response
+
+        wait = _retry_after_seconds(response)
+        if wait is None:
+            wait = _backoff_seconds(attempt)
+        wait = min(wait, HTTP_BACKOFF_MAX)
+        print(f"{method} {url} returned {response.status_code}; retrying in {wait:.1f}s")
+        response.close()
+        time.sleep(wait)
+
+
+def http_get(url, **kwargs):
+    """GET through the shared client (see http_request)."""
+    return http_request("GET", url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """POST through the shared client (see http_request)."""
+    return http_request("POST", url, **kwargs)
+
+
+def _cache_paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.body"), os.path.join(cache_dir, f"{key}.meta.json")
+
+
+def _write_atomic(path, data, mode="wb"):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, mode) as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _response_from_cache(url, body, meta):
+    """
+    Build a 200 requests.Response from a cached body so callers can use
+    .status_code/.content/.json() exactly as for a live response.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.url = url
+    response.headers = CaseInsensitiveDict(meta.get("headers", {}))
+    response.encoding = meta.get("encoding")
+    response.from_cache = True
+    return response
+
+
+def http_get_cached(url, cache_dir=HTTP_CACHE_DIR, **kwargs):
+    """
+    GET with on-disk revalidation.
+
+    The body plus ETag/Last-Modified of every successful response is stored
+    under cache_dir. Later calls send If-None-Match/If-Modified-Since and, on a
+    304, return the cached body as a normal 200 response, so unchanged files
+    cost a round trip but no transfer. Responses without either validator
+    are still cached but always re-downloaded. Entries are keyed like the
+    response store (URL plus params), so each query string has its own.
+    """
+    key = request_key("GET", url, params=kwargs.get("params"))
+    body_path, meta_path = _cache_paths(key, cache_dir)
+    meta = None
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            meta = None
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = http_get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304 and meta:
+        with open(body_path, "rb") as f:
+            body = f.read()
+        response = _response_from_cache(url, body, meta)
+        if RESPONSE_STORE_RECORD:
+            get_response_store().put(key, "GET", response)
+        return response
+
+    if response.status_code == 200 and not getattr(response, "from_store", False):
+        os.makedirs(cache_dir, exist_ok=True)
+        new_meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "encoding": response.encoding,
+            "headers": {k: v for k, v in response.headers.items()
+                        if k.lower() in ("content-type", "etag", "last-modified")},
+        }
+        _write_atomic(body_path, response.content)
+        _write_atomic(meta_path, json.dumps(new_meta, indent=4), mode="w")
+
+    return response
@@ -0,0 +1,217 @@
+## Incremental refresh of IWT results for new / changed events
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from utils.functions_iwt_scrape import crawl_event_division_results, flatten_event_division
+
+# Raw IWT result tables the historical backfill produced (table name -> CSV)
+IWT_RAW_DIR = os.path.join("Historical Scrapes", "Data", "Raw", "IWT")
+IWT_RESULT_TABLES = {
+    "heat_progression": os.path.join(IWT_RAW_DIR, "combined_iwt_heat_progression_format.csv"),
+    "heat_results": os.path.join(IWT_RAW_DIR, "combined_iwt_heat_results.csv"),
+    "heat_scores": os.path.join(IWT_RAW_DIR, "combined_iwt_heat_scores.csv"),
+    "final_ranks": os.path.join(IWT_RAW_DIR, "combined_iwt_final_ranks.csv"),
+}
+
+# Canonical-JSON fingerprint of every division payload behind the tables above
+IWT_FINGERPRINTS_FILE = os.path.join(IWT_RAW_DIR, "division_fingerprints.json")
+
+# The result tables and fingerprints are rewritten while holding
+# <fingerprints file>.lock, so the daily refresh and the live poller never
+# interleave their read-modify-writes
+LOCK_TIMEOUT = 300       # seconds to wait for the lock before giving up
+LOCK_STALE_AFTER = 900   # a lock file older than this was left by a dead process
+
+# Events in these statuses are refreshed every run, changed or not
+REFRESH_STATUSES = {"Live", "On Hold"}
+
+
+def events_to_refresh(events_df):
+    """
+    Return the IDs (as strings) of events whose results need re-fetching:
+    anything flagged in the 'Updates' column by compare_and_update_events_db
+    (new events and status changes) plus events that are Live or On Hold.
+    """
+    changed = events_df["Updates"].fillna("").astype(str).str.strip() != ""
+    active = events_df["status"].isin(REFRESH_STATUSES)
+    return events_df.loc[changed | active, "id"].astype(str).tolist()
+
+
+def payload_fingerprint(payload):
+    """
+    sha256 of the payload's canonical JSON (sorted keys, no whitespace), so
+    two payloads match whenever their content does.
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load_fingerprints(path=IWT_FINGERPRINTS_FILE):
+    """Load {event_id: {division_id: fingerprint}}; empty if the file is missing."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_fingerprints(fingerprints, path=IWT_FINGERPRINTS_FILE):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(fingerprints, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def fetch_changed_division_frames(event_ids, fingerprints):
+    """
+    Crawl the given events' divisions and heats, and flatten only the
+    divisions whose payload fingerprint differs from fingerprints.
+    Returns (frames, changed_division_ids, seen) where frames maps table
+    name -> DataFrame (None if no changed division produced that table) and
+    seen maps event_id -> {division_id: fingerprint} for every division the
+    events list; one whose fetch failed keeps its stored fingerprint.
+    """
+    dfs = {table: [] for table in IWT_RESULT_TABLES}
+    changed_division_ids = []
+    seen = {}
+    for event_id, division_id, data in crawl_event_division_results(event_ids, save=False):
+        event_id, division_id = str(event_id), str(division_id)
+        stored = fingerprints.get(event_id, {}).get(division_id)
+        if data is None:
+            # Listed but not fetched: keep its rows and fingerprint until a run gets it
+            if stored is not None:
+                seen.setdefault(event_id, {})[division_id] = stored
+            continue
+        fingerprint = payload_fingerprint(data)
+        seen.setdefault(event_id, {})[division_id] = fingerprint
+        if stored == fingerprint:
+            continue  # Unchanged since the tables were last written
+        print(f"Refreshing Event {event_id}, Division {division_id}...")
+        changed_division_ids.append(division_id)
+        for table, df in flatten_event_division(data, event_id, division_id).items():
+            if df is not None:
+                dfs[table].append(df)
+    frames = {table: pd.concat(tables, ignore_index=True) if tables else None
+              for table, tables in dfs.items()}
+    return frames, changed_division_ids, seen
+
+
+def replace_rows(csv_path, key_column, keys, new_df):
+    """
+    Replace the rows of csv_path whose key_column is in keys with new_df
+    (None just removes them). Untouched rows are read and written back as
+    text, so they come out byte for byte as they went in.
+    Returns (rows_removed, rows_added).
+    """
+    keys = {str(k) for k in keys}
+    if os.path.exists(csv_path):
+        existing = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    else:
+        existing = pd.DataFrame(columns=[key_column])
+    stale = existing[key_column].isin(keys)
+    kept = existing[~stale]
+    combined = kept if new_df is None else pd.concat([kept, new_df], ignore_index=True)
+
+    tmp_path = f"{csv_path}.{os.getpid()}.tmp"
+    combined.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, csv_path)
+    return int(stale.sum()), 0 if new_df is None else len(new_df)
+
+
+@contextmanager
+def tables_lock(lock_path, timeout=LOCK_TIMEOUT, stale_after=LOCK_STALE_AFTER):
+    """
+    Cross-process lock on the result tables: a lock file created
+    exclusively, removed on exit. Raises TimeoutError after timeout seconds;
+    a lock file older than stale_after seconds is taken over.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except FileNotFoundError:
+                continue  # Released between the two calls
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{lock_path} is still held after {timeout}s")
+            time.sleep(0.1)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(lock_path)
+
+
+def write_result_rows(replacements, fingerprints=None, tables=IWT_RESULT_TABLES,
+                      fingerprints_file=IWT_FINGERPRINTS_FILE):
+    """
+    The one writer of the raw IWT result tables. Under tables_lock, apply
+    each (table, key_column, keys, new_df) in replacements with replace_rows,
+    then merge fingerprints ({event_id: {division_id: fingerprint}}, None
+    removing a division) into the fingerprints file as it is now on disk.
+    Returns {table: (rows_removed, rows_added)}.
+    """
+    counts = {}
+    with tables_lock(f"{fingerprints_file}.lock"):
+        for table, key_column, keys, new_df in replacements:
+            counts[table] = replace_rows(tables[table], key_column, keys, new_df)
+        if fingerprints:
+            stored = load_fingerprints(fingerprints_file)
+            for event_id, divisions in fingerprints.items():
+                event = stored.setdefault(str(event_id), {})
+                for division_id, fingerprint in divisions.items():
+                    if fingerprint is None:
+                        event.pop(str(division_id), None)
+                    else:
+                        event[str(division_id)] = fingerprint
+                if not event:
+                    del stored[str(event_id)]
+            save_fingerprints(stored, fingerprints_file)
+    return counts
+
+
+def refresh_event_results(events_df, tables=IWT_RESULT_TABLES, fingerprints_file=IWT_FINGERPRINTS_FILE):
+    """
+    Incremental daily stage: re-fetch only new, changed, Live and On Hold
+    events, and swap the rows of divisions whose payload changed since the
+    last run in the raw IWT result tables. Unchanged divisions skip all
+    flatten/rank work and writes; divisions that disappeared from a fetched
+    event lose their rows. Events the API returned no divisions for keep
+    their existing rows. Returns the list of refreshed division IDs.
+    """
+    event_ids = events_to_refresh(events_df)
+    if not event_ids:
+        print("No new or changed events - results tables are up to date.")
+        return []
+
+    print(f"Checking results for {len(event_ids)} event(s): {', '.join(event_ids)}")
+    fingerprints = load_fingerprints(fingerprints_file)
+    frames, changed, seen = fetch_changed_division_frames(event_ids, fingerprints)
+    dropped = [division_id
+               for event_id, divisions in seen.items()
+               for division_id in fingerprints.get(event_id, {})
+               if division_id not in divisions]
+    if not changed and not dropped:
+        print("All division payloads unchanged - results tables left as they are.")
+        return []
+
+    # Divisions no longer in a fetched event lose their fingerprint too
+    updates = {event_id: {**dict.fromkeys(fingerprints.get(event_id, {})), **divisions}
+               for event_id, divisions in seen.items()}
+    counts = write_result_rows(
+        [(table, "eventDivisionId", changed + dropped, frames[table]) for table in tables],
+        updates, tables=tables, fingerprints_file=fingerprints_file
+    )
+    for table, (removed, added) in counts.items():
+        print(f"{os.path.basename(tables[table])}: replaced {removed} row(s) with {added}")
+    return changed
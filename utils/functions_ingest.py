@@ -0,0 +1,128 @@
+## Parallel ingest of cached LiveHeats division JSON into partitioned Parquet
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard json module is used instead
+    orjson = None
+
+from utils.functions_iwt_scrape import flatten_event_division
+from utils.functions_incremental import IWT_RAW_DIR, IWT_RESULT_TABLES
+
+# Division payloads saved by fetch_event_division_results / the backfill
+IWT_EVENT_RESULTS_DIR = os.path.join("Historical Scrapes", "Data", "Raw", "event_results")
+IWT_PARQUET_DIR = os.path.join(IWT_RAW_DIR, "parquet")
+
+DIVISION_FILE_PATTERN = re.compile(r"event_(\d+)_division_(\d+)\.json$")
+
+# Column types of the ingested tables, so every division file of a table
+# has the same schema and the table reads back as one dataset (event_id is
+# the partition directory). IDs and place labels stay as the API's strings.
+IWT_PARQUET_SCHEMAS = {
+    "heat_progression": pa.schema([
+        ("source", pa.string()), ("eventDivisionId", pa.string()), ("sex", pa.string()),
+        ("round_name", pa.string()), ("round_order", pa.int64()), ("heat_id", pa.string()),
+        ("heat_order", pa.int64()), ("total_winners_progressing", pa.int64()),
+        ("winners_progressing_to_round_order", pa.int64()), ("total_losers_progressing", pa.int64()),
+        ("losers_progressing_to_round_order", pa.int64()),
+    ]),
+    "heat_results": pa.schema([
+        ("source", pa.string()), ("heat_id", pa.string()), ("eventDivisionId", pa.string()),
+        ("athleteId", pa.string()), ("result_total", pa.float64()), ("winBy", pa.float64()),
+        ("needs", pa.float64()), ("place", pa.string()), ("round", pa.string()),
+        ("roundPosition", pa.int64()),
+    ]),
+    "heat_scores": pa.schema([
+        ("source", pa.string()), ("heat_id", pa.string()), ("eventDivisionId", pa.string()),
+        ("athleteId", pa.string()), ("score", pa.float64()), ("modified_total", pa.float64()),
+        ("modifier", pa.string()), ("type", pa.string()), ("counting", pa.bool_()),
+        ("total_points", pa.float64()),
+    ]),
+    "final_ranks": pa.schema([
+        ("source", pa.string()), ("eventDivisionId", pa.string()), ("athleteId", pa.string()),
+        ("place", pa.int64()),
+    ]),
+}
+
+
+def load_division_file(path):
+    """Decode one division JSON file, with orjson when it is installed."""
+    with open(path, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def division_files(input_dir=IWT_EVENT_RESULTS_DIR):
+    """Return [(path, event_id, division_id)] for every cached division file, sorted."""
+    files = []
+    for name in sorted(os.listdir(input_dir)):
+        match = DIVISION_FILE_PATTERN.search(name)
+        if match:
+            files.append((os.path.join(input_dir, name), match.group(1), match.group(2)))
+    return files
+
+
+def ingest_division_file(unit, output_dir=IWT_PARQUET_DIR):
+    """
+    Decode and flatten one division file and write each table it produces
+    to <output_dir>/<table>/event_id=<event_id>/division_<division_id>.parquet.
+    The event_id column is carried by the partition directory, not the file.
+    Runs in a worker process; returns (path, rows written, error or None).
+    """
+    path, event_id, division_id = unit
+    try:
+        frames = flatten_event_division(load_division_file(path), event_id, division_id)
+    except Exception as e:
+        return path, 0, f"{type(e).__name__}: {e}"
+
+    rows = 0
+    try:
+        for table, df in frames.items():
+            if df is None or df.empty:
+                continue
+            if "modifier" in df.columns:
+                # Modifiers are JSON objects in the payload
+                df = df.assign(modifier=[None if m is None else json.dumps(m) for m in df["modifier"]])
+            data = pa.Table.from_pandas(df, schema=IWT_PARQUET_SCHEMAS[table], preserve_index=False)
+            part_dir = os.path.join(output_dir, table, f"event_id={event_id}")
+            os.makedirs(part_dir, exist_ok=True)
+            pq.write_table(data.replace_schema_metadata(None),
+                           os.path.join(part_dir, f"division_{division_id}.parquet"))
+            rows += len(df)
+    except Exception as e:
+        return path, rows, f"{type(e).__name__}: {e}"
+    return path, rows, None
+
+
+def ingest_event_results(input_dir=IWT_EVENT_RESULTS_DIR, output_dir=IWT_PARQUET_DIR, workers=None):
+    """
+    Rebuild the partitioned Parquet tables from every cached division file,
+    spreading decode + flatten + write over a process pool (workers=None
+    uses every core, 1 runs in-process). Existing table directories under
+    output_dir are replaced. Returns {path: error} for files that failed.
+    """
+    units = division_files(input_dir)
+    for table in IWT_RESULT_TABLES:
+        shutil.rmtree(os.path.join(output_dir, table), ignore_errors=True)
+
+    workers = workers or os.cpu_count() or 1
+    worker = partial(ingest_division_file, output_dir=output_dir)
+    if workers == 1:
+        results = list(map(worker, units))
+    else:
+        # A few chunks per worker: files vary in size, so keep the pool balanced
+        chunksize = max(1, len(units) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(worker, units, chunksize=chunksize))
+    failures = {path: error for path, _, error in results if error}
+    print(f"Ingested {len(units) - len(failures)} of {len(units)} division files "
+          f"({sum(rows for _, rows, _ in results)} rows) into {output_dir}; {len(failures)} failed")
+    return failures
@@ -1,4 +1,3 @@
-import requests
 import json
 import os
 import time
@@ -6,9 +5,27 @@ import copy
 import pandas as pd
 import re
 
+from utils.functions_http import http_post
+
 # Constants
-GRAPHQL_URL = "https://liveheats.com/api/graphql"
+GRAPHQL_URL = os.getenv("LIVEHEATS_GRAPHQL_URL", "https://liveheats.com/api/graphql")
 OUTPUT_DIR = "event_results"
+DIVISION_BATCH_SIZE = 25  # events per aliased division query
+CRAWL_BATCH_SIZE = 5      # events per nested events -> divisions -> heats query
+
+# Event division fields shared by the single-division fetch and the nested crawl
+EVENT_DIVISION_FIELDS = """
+        id
+        heatDurationMinutes
+        defaultEventDurationMinutes
+        formatDefinition { progression runProgression heatSizes seeds defaultHeatDurationMinutes numberOfRounds }
+        heatConfig { hasPriority totalCountingRides athleteRidesLimit }
+        division { id name }
+        heats {
+          id eventDivisionId round roundPosition position startTime endTime heatDurationMinutes
+          config { maxRideScore heatSize }
+          result { athleteId total winBy needs rides place }
+        }"""
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 # def fetch_wave_tour_events(short_name="WaveTour", output_file="wave_tour_events.json"):
@@ -48,7 +65,7 @@ def fetch_wave_tour_events():
       - 'wave_tour_events_cleaned.json'
     Returns a DataFrame with the required and newly formatted columns.
     """
-    url = "https://liveheats.com/api/graphql"
+    url = GRAPHQL_URL
     headers = {
         "Content-Type": "application/json",
         "User-Agent": "Mozilla/5.0"
@@ -76,7 +93,7 @@ def fetch_wave_tour_events():
     variables = {"shortName": "WaveTour"}
     payload = {"query": query, "variables": variables}
     
-    response = requests.post(url, headers=headers, json=payload)
+    response = http_post(url, headers=headers, json=payload)
     if response.status_code != 200:
         raise RuntimeError(f"Error fetching data: {response.status_code}\n{response.text}")
     
@@ -166,50 +183,182 @@ def fetch_event_divisions(event_id):
       }
     }"""
     payload = {"query": query, "variables": {"id": event_id}}
-    resp = requests.post(GRAPHQL_URL, headers=headers, json=payload)
+    resp = http_post(GRAPHQL_URL, headers=headers, json=payload)
     resp.raise_for_status()
     divisions = resp.json()["data"]["event"]["eventDivisions"]
     return [(d["id"], d["division"]["name"]) for d in divisions]
 
-def fetch_event_division_results(event_id, division_id):
+def fetch_event_divisions_batch(event_ids, chunk_size=DIVISION_BATCH_SIZE):
     """
-    Fetch JSON for a specific event division and save to OUTPUT_DIR.
+    Fetch division IDs and names for many events at once.
+    Builds one aliased GraphQL query per chunk of events
+    (e0: event(id: $e0) {...} e1: event(id: $e1) {...}) and splits the
+    response back per event.
+    Returns a dict of event_id -> list of (division_id, division_name) tuples;
+    an event with no divisions (or that the API returns as null without an
+    error) maps to an empty list. A chunk the server rejects without data is
+    split in half and retried; an event that still fails, or whose alias
+    comes back null with an error, raises RuntimeError rather than passing
+    for an event without divisions.
     """
-    query = """query getEventDivision($id: ID!) {
-      eventDivision(id: $id) {
-        id
-        heatDurationMinutes
-        defaultEventDurationMinutes
-        formatDefinition { progression runProgression heatSizes seeds defaultHeatDurationMinutes numberOfRounds }
-        heatConfig { hasPriority totalCountingRides athleteRidesLimit }
-        division { id name }
-        heats {
-          id eventDivisionId round roundPosition position startTime endTime heatDurationMinutes
-          config { maxRideScore heatSize }
-          result { athleteId total winBy needs rides place }
-        }
-      }
-    }"""
+    headers = {"Content-Type": "application/json","User-Agent": "Mozilla/5.0"}
+    event_ids = list(dict.fromkeys(event_ids))
+    divisions_by_event = {}
+    pending = [event_ids[i:i + chunk_size] for i in range(0, len(event_ids), chunk_size)]
+    while pending:
+        chunk = pending.pop(0)
+        aliases = [f"e{i}" for i in range(len(chunk))]
+        var_defs = ", ".join(f"${a}: ID!" for a in aliases)
+        fields = "\n".join(
+            f"  {a}: event(id: ${a}) {{ eventDivisions {{ id division {{ id name }} }} }}"
+            for a in aliases
+        )
+        query = f"query getEvents({var_defs}) {{\n{fields}\n}}"
+        variables = {a: str(ev_id) for a, ev_id in zip(aliases, chunk)}
+        resp = http_post(GRAPHQL_URL, headers=headers, json={"query": query, "variables": variables})
+        resp.raise_for_status()
+        body = resp.json()
+        errors = body.get("errors") or []
+        data = body.get("data")
+        if errors and not data:
+            if len(chunk) > 1:
+                mid = len(chunk) // 2
+                pending[:0] = [chunk[:mid], chunk[mid:]]
+                continue
+            raise RuntimeError(f"Division query rejected for event {chunk[0]}: {errors}")
+        # Aliases an error points at; an error without a path could be any of them
+        failed_aliases = {(e.get("path") or [None])[0] for e in errors}
+        for a, ev_id in zip(aliases, chunk):
+            event = data.get(a)
+            if event is None and (a in failed_aliases or None in failed_aliases):
+                raise RuntimeError(f"Division query failed for event {ev_id}: "
+                                   f"{[e for e in errors if (e.get('path') or [None])[0] == a]}")
+            divisions = (event or {}).get("eventDivisions") or []
+            divisions_by_event[ev_id] = [(d["id"], d["division"]["name"]) for d in divisions]
+    return {ev_id: divisions_by_event[ev_id] for ev_id in event_ids}
+
+def fetch_event_division_results(event_id, division_id, save=True):
+    """
+    Fetch JSON for a specific event division and, with save=True, save it to
+    OUTPUT_DIR. Returns None if the request failed.
+    """
+    query = f"""query getEventDivision($id: ID!) {{
+      eventDivision(id: $id) {{{EVENT_DIVISION_FIELDS}
+      }}
+    }}"""
     payload = {"query": query, "variables": {"id": division_id}}
-    resp = requests.post(GRAPHQL_URL, json=payload)
+    resp = http_post(GRAPHQL_URL, json=payload)
     if resp.status_code != 200:
         print(f"Error fetching division {division_id}: {resp.status_code}")
         return None
     data = resp.json()
+    if save:
+        save_event_division_results(data, event_id, division_id)
+    return data
+
+def save_event_division_results(data, event_id, division_id):
+    """
+    Write a division payload to OUTPUT_DIR as event_{event_id}_division_{division_id}.json.
+    """
     file_name = os.path.join(OUTPUT_DIR, f"event_{event_id}_division_{division_id}.json")
     with open(file_name, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4)
-    return data
+
+def _crawl_event_chunk(event_ids):
+    """
+    Run one nested events -> eventDivisions -> heats query for a chunk of events.
+    Returns {event_id: event} (None for an event the server does not know),
+    leaving out events whose alias came back null with an error; returns
+    None if the server rejected the query (e.g. complexity limit) without
+    returning data.
+    """
+    aliases = [f"e{i}" for i in range(len(event_ids))]
+    var_defs = ", ".join(f"${a}: ID!" for a in aliases)
+    fields = "\n".join(
+        f"      {a}: event(id: ${a}) {{ id eventDivisions {{{EVENT_DIVISION_FIELDS}\n      }} }}"
+        for a in aliases
+    )
+    query = f"query getEventsNested({var_defs}) {{\n{fields}\n    }}"
+    variables = {a: str(ev_id) for a, ev_id in zip(aliases, event_ids)}
+    resp = http_post(GRAPHQL_URL, json={"query": query, "variables": variables})
+    if resp.status_code != 200:
+        print(f"Error crawling events {event_ids}: {resp.status_code}")
+        return None
+    body = resp.json()
+    errors = body.get("errors") or []
+    data = body.get("data")
+    if errors and not data:
+        print(f"Crawl query rejected for events {event_ids}: {errors}")
+        return None
+    data = data or {}
+    # Aliases an error points at; an error without a path could be any of them
+    failed_aliases = {(e.get("path") or [None])[0] for e in errors}
+    events = {}
+    for a, ev_id in zip(aliases, event_ids):
+        event = data.get(a)
+        if event is None and (a in failed_aliases or None in failed_aliases):
+            print(f"Crawl query failed for event {ev_id}: "
+                  f"{[e for e in errors if (e.get('path') or [None])[0] == a]}")
+            continue
+        events[ev_id] = event
+    return events
+
+def _fetch_event_one_by_one(event_id, save):
+    """
+    Per-division fallback of crawl_event_division_results for one event.
+    Yields (event_id, division_id, data), data None where the fetch failed.
+    """
+    for division_id, _ in fetch_event_divisions(event_id):
+        yield event_id, division_id, fetch_event_division_results(event_id, division_id, save=save)
+
+def crawl_event_division_results(event_ids, chunk_size=CRAWL_BATCH_SIZE, save=True):
+    """
+    Crawl events, their divisions and heats/results with nested GraphQL
+    queries (chunk_size events per request) instead of one request per event
+    and per division.
+    Yields (event_id, division_id, data) for every division the events list,
+    where data has the same {"data": {"eventDivision": {...}}} shape as
+    fetch_event_division_results, so it can be fed straight into the
+    flatten/rank functions, or is None if that division could not be
+    fetched. Chunks the server rejects are split in half and retried; a
+    single event that is still rejected, or that the server returns an
+    error for, falls back to the per-division requests. With save=True
+    each payload is also written to OUTPUT_DIR.
+    """
+    event_ids = list(event_ids)
+    pending = [event_ids[i:i + chunk_size] for i in range(0, len(event_ids), chunk_size)]
+    while pending:
+        chunk = pending.pop(0)
+        events = _crawl_event_chunk(chunk)
+        if events is None:
+            if len(chunk) > 1:
+                mid = len(chunk) // 2
+                pending[:0] = [chunk[:mid], chunk[mid:]]
+                continue
+            yield from _fetch_event_one_by_one(chunk[0], save)
+            continue
+        for ev_id in chunk:
+            if ev_id not in events:
+                yield from _fetch_event_one_by_one(ev_id, save)
+                continue
+            event = events[ev_id] or {}
+            for division in event.get("eventDivisions") or []:
+                data = {"data": {"eventDivision": division}}
+                if save:
+                    save_event_division_results(data, ev_id, division["id"])
+                yield ev_id, division["id"], data
 
 def flatten_heat_progression(data, event_id, division_id):
     try:
         ed = data["data"]["eventDivision"]
-        prog = ed["formatDefinition"]["progression"]
+        prog = ed["formatDefinition"]["progression"] or {}
         heats = ed["heats"]
         division_name = ed["division"]["name"]
     except (KeyError, TypeError):
         print(f"Skipping progression for {event_id}, {division_id}")
         return None
+    if not heats:
+        return None
     records = []
     for heat in heats:
         rec = {
@@ -249,68 +398,82 @@ def flatten_heat_progression(data, event_id, division_id):
     ]
     return df[cols]
 
+RESULT_COLUMNS = [
+    'source','event_id','heat_id','eventDivisionId','athleteId',
+    'result_total','winBy','needs','place','round','roundPosition'
+]
+SCORE_COLUMNS = [
+    'source','event_id','heat_id','eventDivisionId','athleteId',
+    'score','modified_total','modifier','type','counting','total_points'
+]
+
 def flatten_heat_results_and_scores(data, event_id, division_id):
+    """
+    Flatten a division payload into (heat results, ride scores) DataFrames.
+
+    Rows are appended straight into per-column lists rather than per-row
+    dicts. A division without heats or results gives (None, None) and one
+    whose results have no rides gives (results, None). Rides missing a
+    category get type None, and rides missing a scoring_ride flag are not
+    counting. total_points is each athlete's counting-ride total per heat;
+    score, modified_total and total_points are 0 where missing.
+    """
     try:
         heats = data['data']['eventDivision']['heats']
     except (KeyError, TypeError):
         print(f"Skipping results/scores for {event_id},{division_id}")
         return None, None
-    results_rows = []
-    scores_rows = []
-    for heat in heats:
+    res = {col: [] for col in RESULT_COLUMNS}
+    scr = {col: [] for col in SCORE_COLUMNS[:-1]}
+    for heat in heats or []:
         hid = heat.get('id')
         edid = heat.get('eventDivisionId')
         rlabel = heat.get('round')
         rpos = heat.get('roundPosition', 0)
-        for res in heat.get('result', []):
-            base = {
-                'source': 'Live Heats',
-                'event_id': event_id,
-                'heat_id': hid,
-                'eventDivisionId': edid,
-                'athleteId': res.get('athleteId'),
-                'result_total': res.get('total'),
-                'winBy': res.get('winBy'),
-                'needs': res.get('needs'),
-                'place': res.get('place'),
-                'round': rlabel,
-                'roundPosition': rpos
-            }
-            results_rows.append(base)
-            rides = res.get('rides') or {}
+        for result in heat.get('result') or []:
+            aid = result.get('athleteId')
+            res['source'].append('Live Heats')
+            res['event_id'].append(event_id)
+            res['heat_id'].append(hid)
+            res['eventDivisionId'].append(edid)
+            res['athleteId'].append(aid)
+            res['result_total'].append(result.get('total'))
+            res['winBy'].append(result.get('winBy'))
+            res['needs'].append(result.get('needs'))
+            res['place'].append(result.get('place'))
+            res['round'].append(rlabel)
+            res['roundPosition'].append(rpos)
+            rides = result.get('rides') or {}
             for ride_list in rides.values():
                 for ride in ride_list:
-                    scores_rows.append({
-                        'source': 'Live Heats',
-                        'event_id': event_id,
-                        'heat_id': hid,
-                        'eventDivisionId': edid,
-                        'athleteId': res.get('athleteId'),
-                        'score': ride.get('total'),
-                        'modified_total': ride.get('modified_total'),
-                        'modifier': ride.get('modifier'),
-                        'type': ride.get('category').rstrip('s'),
-                        'counting': ride.get('scoring_ride')
-                    })
-    df_res = pd.DataFrame(results_rows)[[
-        'source','event_id','heat_id','eventDivisionId','athleteId',
-        'result_total','winBy','needs','place','round','roundPosition'
-    ]]
-    df_scr = pd.DataFrame(scores_rows)
-    # Calculate total_points
-    summary = (
-        df_scr[df_scr['counting']]
-        .groupby(['heat_id','athleteId'])['score']
-        .sum()
-        .reset_index()
-        .rename(columns={'score':'total_points'})
+                    category = ride.get('category')
+                    scr['source'].append('Live Heats')
+                    scr['event_id'].append(event_id)
+                    scr['heat_id'].append(hid)
+                    scr['eventDivisionId'].append(edid)
+                    scr['athleteId'].append(aid)
+                    scr['score'].append(ride.get('total'))
+                    scr['modified_total'].append(ride.get('modified_total'))
+                    scr['modifier'].append(ride.get('modifier'))
+                    scr['type'].append(category.rstrip('s') if category else None)
+                    scr['counting'].append(ride.get('scoring_ride') is True)
+    if not res['athleteId']:
+        return None, None
+    df_res = pd.DataFrame(res)
+    if not scr['athleteId']:
+        return df_res, None
+
+    df_scr = pd.DataFrame(scr)
+    df_scr['score'] = pd.to_numeric(df_scr['score'])
+    df_scr['modified_total'] = pd.to_numeric(df_scr['modified_total'])
+    df_scr['total_points'] = (
+        df_scr['score'].where(df_scr['counting'])
+        .groupby([df_scr['heat_id'], df_scr['athleteId']])
+        .transform('sum')
     )
-    df_scr = pd.merge(df_scr, summary, on=['heat_id','athleteId'], how='left').fillna(0)
-    cols = [
-        'source','event_id','heat_id','eventDivisionId','athleteId',
-        'score','modified_total','modifier','type','counting','total_points'
-    ]
-    return df_res, df_scr[cols]
+    numeric = ['score', 'modified_total', 'total_points']
+    df_scr[numeric] = df_scr[numeric].fillna(0)
+    return df_res, df_scr
 
 def create_final_rank_no_heat_info(json_data, event_id, division_id):
     heats = json_data['data']['eventDivision']['heats']
@@ -330,34 +493,50 @@ def create_final_rank_no_heat_info(json_data, event_id, division_id):
         return None
     return pd.DataFrame(rows)
 
+def rank_final_heat_info(df_results):
+    """
+    Final ranks for any number of divisions in one vectorized pass over a
+    (concatenated) heat results frame with event_id, eventDivisionId,
+    athleteId, roundPosition and place columns.
+
+    Each athlete keeps their best result: the furthest round (highest
+    roundPosition), then the best place within it. Athletes are ordered by
+    (-roundPosition, place), ties keeping first-appearance order, and tied
+    athletes share the lowest rank (1, 2, 2, 4). Divisions come out in the
+    order they first appear.
+    """
+    group_cols = ['event_id', 'eventDivisionId']
+    df = df_results[group_cols + ['athleteId', 'roundPosition', 'place']].copy()
+    df['place'] = df['place'].astype(int)
+    df['_row'] = range(len(df))
+    df['_group_order'] = df.groupby(group_cols, sort=False)['_row'].transform('min')
+    df['_first_seen'] = df.groupby(group_cols + ['athleteId'], sort=False)['_row'].transform('min')
+
+    # Best (roundPosition, place) per athlete
+    best = (
+        df.sort_values(['roundPosition', 'place'], ascending=[False, True], kind='stable')
+        .drop_duplicates(group_cols + ['athleteId'], keep='first')
+        .sort_values(['_group_order', 'roundPosition', 'place', '_first_seen'],
+                     ascending=[True, False, True, True], kind='stable')
+    )
+
+    # Competition ranking: a tie takes the position of the first athlete in it
+    position = best.groupby('_group_order', sort=False).cumcount() + 1
+    rank = position.groupby([best['_group_order'], best['roundPosition'], best['place']]).transform('min')
+
+    return pd.DataFrame({
+        'source': 'Live Heats',
+        'event_id': best['event_id'].to_numpy(),
+        'eventDivisionId': best['eventDivisionId'].to_numpy(),
+        'athleteId': best['athleteId'].to_numpy(),
+        'place': rank.to_numpy(),
+    })
+
 def calculate_final_rank_heat_info(df_results, event_id, division_id):
-    athlete_best = {}
-    for _, row in df_results.iterrows():
-        aid = row['athleteId']
-        rp = row.get('roundPosition', 0)
-        pl = int(row.get('place', 999))
-        stored = athlete_best.get(aid)
-        if stored:
-            if rp > stored[0] or (rp == stored[0] and pl < stored[1]):
-                athlete_best[aid] = (rp, pl)
-        else:
-            athlete_best[aid] = (rp, pl)
-    sorted_ath = sorted(athlete_best.items(), key=lambda x: (-x[1][0], x[1][1]))
-    rows = []
-    prev_key = None
-    for i, (aid, (rp, pl)) in enumerate(sorted_ath):
-        rank = 1 if i == 0 else (i + 1 if (rp, pl) != prev_key else rank)
-        rows.append({
-            'source': 'Live Heats',
-            'event_id': event_id,
-            'eventDivisionId': division_id,
-            'athleteId': aid,
-            'place': rank
-        })
-        prev_key = (rp, pl)
-    if not rows:
+    df_final = rank_final_heat_info(df_results.assign(event_id=event_id, eventDivisionId=division_id))
+    if df_final.empty:
         return None
-    return pd.DataFrame(rows)
+    return df_final
 
 def is_no_heat_info(json_data):
     try:
@@ -392,3 +571,31 @@ def clean_heat_order(df, column='heat_order'):
     df[column] = df[column].astype(str).str.replace(r"\D+", "", regex=True)
     df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
     return df
+
+def flatten_event_division(data, event_id, division_id):
+    """
+    Flatten one division payload into the combined IWT output tables.
+    Returns a dict of table name -> DataFrame (None where a table is empty).
+    """
+    # Flatten progression and clean
+    df_prog = flatten_heat_progression(data, event_id, division_id)
+    if df_prog is not None:
+        df_prog = clean_heat_order(df_prog, "heat_order")
+
+    # Flatten results and scores
+    df_res, df_scr = flatten_heat_results_and_scores(data, event_id, division_id)
+
+    # Final ranking, from the results above rather than a second flatten
+    if is_no_heat_info(data):
+        df_final = create_final_rank_no_heat_info(data, event_id, division_id)
+    elif df_res is not None:
+        df_final = calculate_final_rank_heat_info(df_res, event_id, division_id)
+    else:
+        df_final = None
+
+    return {
+        "heat_progression": df_prog,
+        "heat_results": df_res,
+        "heat_scores": df_scr,
+        "final_ranks": df_final,
+    }
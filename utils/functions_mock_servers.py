@@ -0,0 +1,407 @@
+## Local stand-ins for LiveHeats GraphQL and the PWA site, served from recorded fixtures
+#
+# LiveHeats answers the GraphQL operations in utils/functions_iwt_scrape.py from
+# wave_tour_events_raw.json and the division payloads in
+# Historical Scrapes/Data/Raw/event_results. The PWA site (calendar, results,
+# ladder list, live_ladder XML and live_score heatsheets) is rebuilt from the
+# raw PWA CSVs. Both servers can add latency and fail a share of requests, so
+# scrapers can be measured reproducibly. Point the scrapers at them with the
+# LIVEHEATS_GRAPHQL_URL and PWA_BASE_URL environment variables.
+import glob
+import json
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape as xml_escape
+
+import pandas as pd
+
+# Fixture locations
+LIVEHEATS_EVENTS_FILE = "wave_tour_events_raw.json"
+LIVEHEATS_DIVISIONS_DIR = os.path.join("Historical Scrapes", "Data", "Raw", "event_results")
+PWA_RAW_DIR = os.path.join("Historical Scrapes", "Data", "Raw", "PWA")
+
+PWA_EVENT_PAGE_ID = 38
+PWA_RESULTS_PAGE_ID = 193
+PWA_LADDERS_PAGE_ID = 1900
+
+
+class FaultInjector:
+    """
+    Shared latency / error settings: every request sleeps latency seconds
+    (plus up to jitter more) and fails with error_status at error_rate.
+    Counts requests and injected errors for the benchmark.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def apply(self):
+        """Sleep, then return an error status to send, or None to serve normally."""
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            self.requests += 1
+            self.errors += fail
+        if delay:
+            time.sleep(delay)
+        return self.error_status if fail else None
+
+
+class _FixtureHandler(BaseHTTPRequestHandler):
+    """Base handler: fault injection, quiet logging and response helpers."""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True   # headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status in (429, 503):
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _fault(self):
+        status = self.server.faults.apply()
+        if status is not None:
+            self._send(status, "injected error", "text/plain")
+            return True
+        return False
+
+
+# =============================================================================
+# LiveHeats GraphQL
+# =============================================================================
+class LiveHeatsFixtures:
+    """Events list plus division payloads indexed by event and division ID."""
+
+    def __init__(self, events_file=LIVEHEATS_EVENTS_FILE, divisions_dir=LIVEHEATS_DIVISIONS_DIR):
+        with open(events_file, "r", encoding="utf-8") as f:
+            self.events = json.load(f)
+        self.division_files = {}
+        self.divisions_by_event = {}
+        # Absolute paths: payloads are read lazily, whatever the cwd is by then
+        for path in sorted(glob.glob(os.path.join(os.path.abspath(divisions_dir), "event_*_division_*.json"))):
+            match = re.match(r"event_(\w+)_division_(\w+)\.json$", os.path.basename(path))
+            if not match:
+                continue
+            event_id, division_id = match.groups()
+            self.division_files[division_id] = path
+            self.divisions_by_event.setdefault(event_id, []).append(division_id)
+        self.division = lru_cache(maxsize=None)(self._load_division)
+
+    def _load_division(self, division_id):
+        path = self.division_files.get(str(division_id))
+        if path is None:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return (json.load(f).get("data") or {}).get("eventDivision")
+
+    def event(self, event_id, nested):
+        division_ids = self.divisions_by_event.get(str(event_id))
+        if division_ids is None:
+            return None
+        divisions = [self.division(d) for d in division_ids]
+        if nested:
+            return {"id": str(event_id), "eventDivisions": divisions}
+        return {"eventDivisions": [
+            {"id": d["id"], "division": d.get("division") or {"id": None, "name": None}}
+            for d in divisions
+        ]}
+
+    def execute(self, query, variables):
+        """Answer one GraphQL request; returns (status, body dict)."""
+        if "organisationByShortName" in query:
+            return 200, self.events
+
+        match = re.search(r"eventDivision\(id:\s*\$(\w+)\)", query)
+        if match and not re.search(r"\bevent\(id:", query):
+            return 200, {"data": {"eventDivision": self.division(str(variables.get(match.group(1))))}}
+
+        fields = re.findall(r"(?:(\w+):\s*)?\bevent\(id:\s*\$(\w+)\)", query)
+        if fields:
+            nested = "heats" in query
+            return 200, {"data": {
+                alias or "event": self.event(variables.get(var), nested)
+                for alias, var in fields
+            }}
+
+        return 400, {"errors": [{"message": "Operation not supported by the mock server"}]}
+
+
+class LiveHeatsHandler(_FixtureHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self._fault():
+            return
+        status, body = self.server.fixtures.execute(payload.get("query", ""), payload.get("variables") or {})
+        self._send(status, json.dumps(body), "application/json")
+
+
+# =============================================================================
+# PWA site
+# =============================================================================
+def _read_raw_csv(name):
+    return pd.read_csv(os.path.join(PWA_RAW_DIR, name), dtype=str, keep_default_na=False,
+                       encoding="utf-8-sig")
+
+
+def _records_by(df, column):
+    """Group a frame's rows into {value: [row dicts]} keeping row order."""
+    grouped = {}
+    for record in df.to_dict("records"):
+        grouped.setdefault(record[column], []).append(record)
+    return grouped
+
+
+class PwaFixtures:
+    """Pages and feeds of the PWA site, rebuilt from the raw PWA exports."""
+
+    def __init__(self):
+        self.events = _read_raw_csv("pwa_event_data_raw.csv")
+        self.progression = _read_raw_csv("pwa_aggregated_heat_progression_raw.csv")
+        self.results = _read_raw_csv("pwa_aggregated_heat_results_raw.csv")
+        self.scores = _read_raw_csv("pwa_aggregated_heat_scores_raw.csv")
+        self.final_ranks = _read_raw_csv("pwa_final_ranks_raw.csv")
+        self.year_ids = dict(zip(self.events["id"], self.events["year"]))
+        # Pre-grouped plain records, so serving a feed costs no DataFrame work
+        self.heats_by_code = _records_by(self.progression, "eventDivisionId")
+        self.results_by_heat = _records_by(self.results, "heat_id")
+        self.scores_by_heat = _records_by(self.scores, "heat_id")
+
+    def calendar_page(self, page_id):
+        years = "".join(
+            f'<li><a href="index.php?id={year_id}">{year}</a></li>'
+            for year_id, year in self.year_ids.items()
+        )
+        cards = "".join(
+            f'<a class="event-calendar-link" href="index.php?id={PWA_EVENT_PAGE_ID}'
+            f'&amp;tx_pwaevent_pi1%5BshowUid%5D={row.event_id}">'
+            f'<span class="event-title">{escape(row.event_name)}</span>'
+            f'<span class="event-date">{escape(row.event_date)}</span></a>'
+            for row in self.events[self.events["id"] == page_id].itertuples()
+        )
+        return (
+            '<html><body><div class="nav-sub select-box"><span class="label">Year</span>'
+            f'<ul>{years}</ul></div>'
+            f'<div class="event-calendar-grid"><h3>Completed events</h3>{cards}</div>'
+            '</body></html>'
+        )
+
+    def results_index(self, event_id):
+        codes = self.final_ranks.loc[self.final_ranks["event_id"] == event_id, "eventDivisionid"].unique()
+        links = "".join(
+            f'<li><a href="index.php?id={PWA_RESULTS_PAGE_ID}&amp;type=21'
+            f'&amp;tx_pwaevent_pi1%5BeventDiscipline%5D={code}">Wave {i + 1}</a></li>'
+            for i, code in enumerate(codes)
+        )
+        return f"<html><body><ul>{links}</ul></body></html>"
+
+    def results_table(self, event_id, discipline_code):
+        rows = self.final_ranks[(self.final_ranks["event_id"] == event_id)
+                                & (self.final_ranks["eventDivisionid"] == discipline_code)]
+        body = "".join(
+            f'<tr><td>{row.place}</td><td><div class="rank-name">{escape(row.Name)}</div></td>'
+            f'<td>{escape(row.sail_no)}</td><td></td><td></td><td>{row.Points}</td></tr>'
+            for row in rows.itertuples()
+        )
+        return ("<html><body><table><tr><th>Place</th><th>Name</th><th>Sail</th>"
+                f"<th></th><th></th><th>Points</th></tr>{body}</table></body></html>")
+
+    def ladders_page(self, event_id):
+        ladders = self.progression.loc[self.progression["event_id"] == event_id,
+                                       ["eventDivisionId", "sex"]].drop_duplicates()
+        if ladders.empty:
+            return '<html><body><div class="no-entries-found-msg">No elimination ladders</div></body></html>'
+        links = "".join(
+            f'<a href="index.php?id={PWA_LADDERS_PAGE_ID}&amp;tx_pwaevent_pi1%5BshowUid%5D={event_id}'
+            f'&amp;tx_pwaevent_pi1%5Bladder%5D={row.eventDivisionId}">Wave {row.sex}</a>'
+            for row in ladders.itertuples()
+        )
+        return f"<html><body>{links}</body></html>"
+
+    def live_ladder(self, category_code):
+        heats = self.heats_by_code.get(category_code)
+        if heats is None:
+            return None
+        rounds = {}
+        for heat in heats:
+            rounds.setdefault(heat["round_name"], []).append(heat)
+
+        rounds_xml = []
+        for round_name, round_heats in rounds.items():
+            heats_xml = []
+            for heat in round_heats:
+                sailors = "".join(
+                    "<sailor><sailorName>{}</sailorName><sailNr>{}</sailNr><place>{}</place></sailor>".format(
+                        *(xml_escape(v) for v in (*row["athleteId"].rsplit("_", 1), row["place"])))
+                    for row in self.results_by_heat.get(heat["heat_id"], [])
+                    if "_" in row["athleteId"]
+                )
+                heats_xml.append(
+                    f"<heat><heatId>{xml_escape(heat['heat_id'])}</heatId><heatName>{heat['heat_order']}</heatName>"
+                    f"<sailors>{sailors}</sailors></heat>"
+                )
+            rounds_xml.append(
+                f"<round><name>{round_name.replace('Round ', '')}</name>"
+                f"<toAdvance>{round_heats[0]['total_winners_progressing']}</toAdvance>"
+                f"<heats><heatGroup>{''.join(heats_xml)}</heatGroup></heats></round>"
+            )
+        first = heats[0]
+        sex = "male" if first["sex"] == "Men" else "female"
+        return (
+            "<?xml version=\"1.0\" encoding=\"UTF-8\"?><ladders><elimination>"
+            f"<discipline>wave</discipline><event>{first['event_id']}</event>"
+            f"<name>Wave {first['sex']}</name><sex>{sex}</sex>"
+            f"<eventDivisionId>{category_code}</eventDivisionId>"
+            f"<rounds>{''.join(rounds_xml)}</rounds></elimination></ladders>"
+        )
+
+    def heatsheet(self, heat_id):
+        rows = self.scores_by_heat.get(heat_id)
+        if rows is None:
+            return None
+        sailors = {}
+        for row in rows:
+            athlete_id = row["athleteId"]
+            if athlete_id not in sailors:
+                name, _, sail_no = athlete_id.rpartition("_")
+                sailors[athlete_id] = {
+                    "sailorName": name, "sailNo": sail_no,
+                    "totalWave": row["total_wave"], "totalJump": row["total_jump"],
+                    "totalPoints": row["total_points"], "totalPos": "",
+                    "scores": {"wave": [], "jump": []},
+                }
+            score = {"score": row["score"], "counting": row["counting"] == "Yes"}
+            if row["type"] == "Wave":
+                sailors[athlete_id]["scores"]["wave"].append(score)
+            else:
+                sailors[athlete_id]["scores"]["jump"].append({**score, "type": row["type"]})
+        return json.dumps({"heat": {
+            "heatId": heat_id, "heatNo": heat_id, "waveCount": "", "jumpsCount": "",
+            "waveFactor": "", "jumpFactor": "",
+            "sailors": [{"sailor": sailor} for sailor in sailors.values()],
+        }})
+
+
+class PwaHandler(_FixtureHandler):
+
+    def do_GET(self):
+        if self._fault():
+            return
+        fixtures = self.server.fixtures
+        url = urlparse(self.path)
+        body, content_type = None, "text/html; charset=utf-8"
+
+        ladder = re.match(r"/fileadmin/live_ladder/live_ladder_(\w+)\.xml$", url.path)
+        score = re.match(r"/fileadmin/live_score/(.+)\.json$", url.path)
+        if ladder:
+            body, content_type = fixtures.live_ladder(ladder.group(1)), "application/xml"
+        elif score:
+            body, content_type = fixtures.heatsheet(score.group(1)), "application/json"
+        elif url.path.endswith("index.php"):
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            page_id = query.get("id")
+            event_id = query.get("tx_pwaevent_pi1[showUid]", "").replace(".xml", "")
+            action = query.get("tx_pwaevent_pi1[action]")
+            if action == "results" and "tx_pwaevent_pi1[eventDiscipline]" in query:
+                body = fixtures.results_table(event_id, query["tx_pwaevent_pi1[eventDiscipline]"])
+            elif action == "results":
+                body = fixtures.results_index(event_id)
+            elif action == "ladders":
+                body = fixtures.ladders_page(event_id)
+            elif page_id in fixtures.year_ids:
+                body = fixtures.calendar_page(page_id)
+
+        if body is None:
+            self._send(404, "not found", "text/plain")
+        else:
+            self._send(200, body, content_type)
+
+
+# =============================================================================
+# Server lifecycle
+# =============================================================================
+class MockServers:
+    """
+    Both stand-in servers on 127.0.0.1, each on its own thread.
+    Use as a context manager or call shutdown() when done.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None,
+                 liveheats_port=0, pwa_port=0):
+        self.faults = FaultInjector(latency, jitter, error_rate, error_status, seed)
+        self._servers = []
+        self.liveheats = self._start(LiveHeatsHandler, LiveHeatsFixtures(), liveheats_port)
+        self.pwa = self._start(PwaHandler, PwaFixtures(), pwa_port)
+        self.graphql_url = f"http://127.0.0.1:{self.liveheats.server_port}/api/graphql"
+        self.pwa_base_url = f"http://127.0.0.1:{self.pwa.server_port}/"
+
+    def _start(self, handler, fixtures, port):
+        server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        server.daemon_threads = True
+        server.fixtures = fixtures
+        server.faults = self.faults
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self._servers.append(server)
+        return server
+
+    def environ(self):
+        """Environment overrides that point the scrapers at these servers."""
+        return {"LIVEHEATS_GRAPHQL_URL": self.graphql_url, "PWA_BASE_URL": self.pwa_base_url}
+
+    def shutdown(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+if __name__ == "__main__":
+    # Serve until interrupted, e.g.
+    #   python -m utils.functions_mock_servers --latency 0.05 --error-rate 0.02
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the LiveHeats and PWA stand-ins until interrupted.")
+    parser.add_argument("--latency", type=float, default=0.0, help="server latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests failed with 503")
+    parser.add_argument("--seed", type=int, default=None, help="seed for injected latency/errors")
+    parser.add_argument("--liveheats-port", type=int, default=8765)
+    parser.add_argument("--pwa-port", type=int, default=8766)
+    args = parser.parse_args()
+    servers = MockServers(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          seed=args.seed, liveheats_port=args.liveheats_port, pwa_port=args.pwa_port)
+    for name, value in servers.environ().items():
+        print(f"{name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servers.shutdown()
@@ -1,8 +1,141 @@
-import requests
+import io
+import os
 import xml.etree.ElementTree as ET
 import pandas as pd
 import unicodedata
 import ast
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.functions_http import http_get, http_get_cached
+
+# Site root (override with PWA_BASE_URL, e.g. to point at utils/functions_mock_servers.py)
+PWA_BASE_URL = os.getenv("PWA_BASE_URL", "https://www.pwaworldtour.com/")
+
+# Concurrency for live_score heatsheet downloads (request pace is set by the
+# per-host rate limiter in utils.functions_http)
+HEAT_SCORES_MAX_WORKERS = 8
+
+def _child_text(elem, tag):
+    child = elem.find(tag)
+    return child.text if child is not None else None
+
+
+def parse_ladder_xml(xml_content, event_id, category_code):
+    """
+    Stream a live_ladder XML with iterparse and return
+    (sailor-level heat result rows, heat progression rows) in document order.
+
+    Only 'wave' eliminations are kept. Heats are read as each one closes and
+    rounds/eliminations are cleared once processed, so memory stays flat
+    however large the ladder is. Rows are buffered per elimination because the
+    discipline/sex fields may appear after the rounds.
+    """
+    all_data = []                # Sailor-level heat results
+    heat_progression_data = []   # Heat progression information
+
+    path = []
+    rounds = []             # (round_name_raw, round_toadvance, heats) for the current elimination
+    heats = []              # (heat_id, heat_name, sailors) for the current round
+    rounds_closed = False   # only the first <rounds> block of an elimination is used
+
+    for event, elem in ET.iterparse(io.BytesIO(xml_content), events=('start', 'end')):
+        if event == 'start':
+            path.append(elem.tag)
+            continue
+
+        rel_path = path[1:]
+        path.pop()
+
+        if rel_path == ['elimination', 'rounds', 'round', 'heats', 'heatGroup', 'heat']:
+            sailors_node = elem.find('sailors')
+            sailors = None
+            if sailors_node is not None:
+                sailors = [
+                    (_child_text(sailor, 'sailorName'), _child_text(sailor, 'sailNr'), _child_text(sailor, 'place'))
+                    for sailor in sailors_node.findall('sailor')
+                ]
+            heats.append((_child_text(elem, 'heatId'), _child_text(elem, 'heatName'), sailors))
+            elem.clear()
+
+        elif rel_path == ['elimination', 'rounds', 'round']:
+            if not rounds_closed:
+                rounds.append((_child_text(elem, 'name'), _child_text(elem, 'toAdvance'), heats))
+            heats = []
+            elem.clear()
+
+        elif rel_path == ['elimination', 'rounds']:
+            rounds_closed = True
+
+        elif rel_path == ['elimination']:
+            discipline = _child_text(elem, 'discipline')
+            if discipline == 'wave':  # Only process 'wave' discipline
+                _append_ladder_rows(elem, rounds, discipline, event_id, category_code,
+                                    all_data, heat_progression_data)
+            rounds = []
+            heats = []
+            rounds_closed = False
+            elem.clear()
+
+    return all_data, heat_progression_data
+
+
+def _append_ladder_rows(elimination, rounds, discipline, event_id, category_code,
+                        all_data, heat_progression_data):
+    """
+    Turn the buffered rounds of one wave elimination into progression and
+    sailor-level result rows.
+    """
+    event = _child_text(elimination, 'event')
+    elimination_name = _child_text(elimination, 'name')
+    sex = _child_text(elimination, 'sex')
+    # Extract toAdvance from elimination level
+    elimination_toadvance = _child_text(elimination, 'toAdvance')
+
+    for round_name_raw, round_toadvance, heats in rounds:
+        # Use toAdvance from the round; if missing, fall back to elimination level
+        toadvance = round_toadvance if round_toadvance is not None else elimination_toadvance
+
+        # Compute round_order (numeric round value minus 1) and add "Round " prefix to round_name
+        if round_name_raw and round_name_raw.isdigit():
+            round_order = int(round_name_raw) - 1
+            round_name = f"Round {round_name_raw}"
+        else:
+            round_order = None
+            round_name = f"Round {round_name_raw}" if round_name_raw else None
+
+        for heat_id, heat_name, sailors in heats:
+            # --- Heat progression data ---
+            heat_progression_data.append({
+                'event_id': event_id,
+                'eventDivisionId': category_code,
+                'sex': sex,
+                'round_name': round_name,
+                'round_order': round_order,
+                'heat_id': heat_id,
+                'heat_order': heat_name,
+                'total_winners_progressing': toadvance,
+                'winners_progressing_to_round_order': '',
+                'total_losers_progressing': '',
+                'losers_progressing_to_round_order': ''
+            })
+
+            # --- Sailor-level heat results ---
+            for sailor_name, sail_nr, place in sailors or []:
+                all_data.append({
+                    'event_id': event_id,
+                    'Event': event,
+                    'Elimination Name': elimination_name,
+                    'Discipline': discipline,
+                    'eventDivision': sex,
+                    'Round': round_name,
+                    'Heat ID': heat_id,
+                    'Heat Name': heat_name,
+                    'Sailor Name': sailor_name,
+                    'Sailor Number': sail_nr,
+                    'Place': place,
+                    'Category Code': category_code
+                })
+
 
 def export_heat_progression_and_results(event_id, category_code):
     """
@@ -11,101 +144,15 @@ def export_heat_progression_and_results(event_id, category_code):
     return the heat results DataFrame, heat progression DataFrame, and the list
     of unique heat IDs.
     """
-    xml_url = f'https://www.pwaworldtour.com/fileadmin/live_ladder/live_ladder_{category_code}.xml'
-    response = requests.get(xml_url)
+    xml_url = f'{PWA_BASE_URL}fileadmin/live_ladder/live_ladder_{category_code}.xml'
+    response = http_get_cached(xml_url)
     
     if response.status_code != 200:
         print(f"Failed to fetch XML for category code {category_code}. Status code: {response.status_code}")
         return None, None, []
     
-    xml_content = response.content
-    root = ET.fromstring(xml_content)
-    
-    all_data = []                # Sailor-level heat results
-    heat_progression_data = []   # Heat progression information
-    
-    # Process each elimination block in the XML
-    for elimination in root.findall('elimination'):
-        discipline = elimination.find('discipline').text if elimination.find('discipline') is not None else None
-        if discipline != 'wave':
-            continue  # Only process 'wave' discipline
-        
-        event = elimination.find('event').text if elimination.find('event') is not None else None
-        elimination_name = elimination.find('name').text if elimination.find('name') is not None else None
-        sex = elimination.find('sex').text if elimination.find('sex') is not None else None
-        event_division_id = elimination.find('eventDivisionId').text if elimination.find('eventDivisionId') is not None else None
-        # Extract toAdvance from elimination level
-        elimination_toadvance = elimination.find('toAdvance').text if elimination.find('toAdvance') is not None else None
-
-        rounds = elimination.find('rounds')
-        if rounds is None:
-            continue
-        
-        # Loop through each round
-        for round_elem in rounds.findall('round'):
-            round_name_raw = round_elem.find('name').text if round_elem.find('name') is not None else None
-            # Try to extract toAdvance from the round; if missing, fall back to elimination level
-            round_toadvance_elem = round_elem.find('toAdvance')
-            if round_toadvance_elem is not None and round_toadvance_elem.text is not None:
-                toadvance = round_toadvance_elem.text
-            else:
-                toadvance = elimination_toadvance
-            
-            # Compute round_order (numeric round value minus 1) and add "Round " prefix to round_name
-            if round_name_raw and round_name_raw.isdigit():
-                round_order = int(round_name_raw) - 1
-                round_name = f"Round {round_name_raw}"
-            else:
-                round_order = None
-                round_name = f"Round {round_name_raw}" if round_name_raw else None
-            
-            # --- Extract heat progression data ---
-            for heat_group in round_elem.findall('heats/heatGroup'):
-                for heat in heat_group.findall('heat'):
-                    heat_id = heat.find('heatId').text if heat.find('heatId') is not None else None
-                    heat_name = heat.find('heatName').text if heat.find('heatName') is not None else None
-                    
-                    heat_progression_data.append({
-                        'event_id': event_id,
-                        'eventDivisionId': category_code,
-                        'sex': sex,
-                        'round_name': round_name,
-                        'round_order': round_order,
-                        'heat_id': heat_id,
-                        'heat_order': heat_name,
-                        'total_winners_progressing': toadvance,
-                        'winners_progressing_to_round_order': '',
-                        'total_losers_progressing': '',
-                        'losers_progressing_to_round_order': ''
-                    })
-            
-            # --- Extract sailor-level heat results ---
-            for heat_group in round_elem.findall('heats/heatGroup'):
-                for heat in heat_group.findall('heat'):
-                    heat_id = heat.find('heatId').text if heat.find('heatId') is not None else None
-                    heat_name = heat.find('heatName').text if heat.find('heatName') is not None else None
-                    sailors_node = heat.find('sailors')
-                    if sailors_node is None:
-                        continue
-                    for sailor in sailors_node.findall('sailor'):
-                        sailor_name = sailor.find('sailorName').text if sailor.find('sailorName') is not None else None
-                        sail_nr = sailor.find('sailNr').text if sailor.find('sailNr') is not None else None
-                        place = sailor.find('place').text if sailor.find('place') is not None else None
-                        
-                        all_data.append({
-                            'event_id': event_id,
-                            'Event': event,
-                            'Elimination Name': elimination_name,
-                            'Discipline': discipline,
-                            'eventDivision': sex,
-                            'Round': round_name,
-                            'Heat ID': heat_id,
-                            'Heat Name': heat_name,
-                            'Sailor Name': sailor_name,
-                            'Sailor Number': sail_nr,
-                            'Place': place,
-                            'Category Code': category_code
-                        })
+    # Heat progression and sailor-level heat results in one streaming pass
+    all_data, heat_progression_data = parse_ladder_xml(response.content, event_id, category_code)
     
     # Convert lists to DataFrames
     final_df = pd.DataFrame(all_data)
@@ -165,69 +212,120 @@ def export_heat_progression_and_results(event_id, category_code):
     return final_df, heat_progression_df, unique_heat_ids
 
 
-def export_heat_scores(event_id, category_code, heat_ids):
+def _fetch_heatsheet(api_url):
+    """
+    Fetch a single live_score heatsheet JSON.
+    """
+    response = http_get_cached(api_url)
+    response.raise_for_status()
+    return response.json()
+
+
+def _parse_heatsheet(heatsheet_json, event_id, category_code, heat_id):
+    """
+    Flatten one heatsheet JSON into score rows (one per wave/jump).
+    """
+    heat_rows = []
+
+    # Basic heat info
+    heat_info = {
+        'Heat ID': heatsheet_json['heat']['heatId'],
+        'Heat No': heatsheet_json['heat']['heatNo'],
+        'Wave Count': heatsheet_json['heat']['waveCount'],
+        'Jumps Count': heatsheet_json['heat']['jumpsCount'],
+        'Wave Factor': heatsheet_json['heat']['waveFactor'],
+        'Jump Factor': heatsheet_json['heat']['jumpFactor'],
+    }
+
+    # Process each sailor in the heat
+    for sailor_info in heatsheet_json['heat']['sailors']:
+        sailor = sailor_info['sailor']
+        # Use .get() so that missing keys return an empty string
+        sailor_name = unicodedata.normalize('NFKD', sailor.get('sailorName', ''))
+        base_info = {
+            'event_id': event_id,   # Include event_id from XML extraction
+            'Category': category_code,
+            'Sailor Name': sailor.get('sailorName', ''),
+            'Sail Number': sailor.get('sailNo', ''),
+            'Heatsheet ID': heat_id,
+            'Heat No': heatsheet_json['heat']['heatNo'],
+            'Total Wave': sailor.get('totalWave', ''),
+            'Total Jump': sailor.get('totalJump', ''),
+            'Total Points': sailor.get('totalPoints', ''),
+            'Position': sailor.get('totalPos', ''),
+        }
+
+        combined_info = {**heat_info, **base_info}
+
+        # Process each score (wave or jump)
+        for score_type, score_list in sailor.get('scores', {}).items():
+            for score in score_list:
+                if not isinstance(score, dict):
+                    continue
+                row = combined_info.copy()
+                row['Type'] = 'Wave' if score_type == 'wave' else score.get('type', '')
+                row['Score'] = score.get('score', None)
+                row['Counting'] = 'Yes' if score.get('counting') else 'No'
+
+                heat_rows.append(row)
+
+    return heat_rows
+
+
+def export_heat_scores(event_id, category_code, heat_ids,
+                       max_workers=HEAT_SCORES_MAX_WORKERS, return_failed=False):
     """
     For each heat_id provided, fetch heat scores from the JSON API.
     Instead of writing the CSV immediately, return the heat scores DataFrame.
     The event_id (from the XML export) is included in the data.
+
+    Heatsheets are fetched concurrently on a bounded thread pool
+    (max_workers requests in flight, paced by the shared PWA host rate
+    limit). Rows are assembled in heat_ids order, so the output matches a
+    sequential run. Use max_workers=1 to fetch one heat at a time.
+
+    A heatsheet that cannot be fetched or parsed is reported and left out.
+    With return_failed=True the result is (DataFrame, failed heat IDs), so
+    callers can tell a complete export from a partial one.
+    """
+    heat_data, failed_heats = _fetch_heat_scores(event_id, category_code, heat_ids, max_workers)
+    heatsheet_df = _heat_scores_frame(heat_data)
+    return (heatsheet_df, failed_heats) if return_failed else heatsheet_df
+
+
+def _fetch_heat_scores(event_id, category_code, heat_ids, max_workers):
     """
-    api_base_url = "https://www.pwaworldtour.com/fileadmin/live_score/"
+    Fetch and parse the heatsheets of heat_ids. Returns (score rows in
+    heat_ids order, IDs of heats that failed).
+    """
+    api_base_url = f"{PWA_BASE_URL}fileadmin/live_score/"
     heat_data = []
-    
-    for heat_id in heat_ids:
-        try:
-            api_url = f"{api_base_url}{heat_id}.json"
-            response = requests.get(api_url)
-            response.raise_for_status()
-            heatsheet_json = response.json()
-            
-            # Basic heat info
-            heat_info = {
-                'Heat ID': heatsheet_json['heat']['heatId'],
-                'Heat No': heatsheet_json['heat']['heatNo'],
-                'Wave Count': heatsheet_json['heat']['waveCount'],
-                'Jumps Count': heatsheet_json['heat']['jumpsCount'],
-                'Wave Factor': heatsheet_json['heat']['waveFactor'],
-                'Jump Factor': heatsheet_json['heat']['jumpFactor'],
-            }
-            
-            # Process each sailor in the heat
-            for sailor_info in heatsheet_json['heat']['sailors']:
-                sailor = sailor_info['sailor']
-                # Use .get() so that missing keys return an empty string
-                sailor_name = unicodedata.normalize('NFKD', sailor.get('sailorName', ''))
-                base_info = {
-                    'event_id': event_id,   # Include event_id from XML extraction
-                    'Category': category_code,
-                    'Sailor Name': sailor.get('sailorName', ''),
-                    'Sail Number': sailor.get('sailNo', ''),
-                    'Heatsheet ID': heat_id,
-                    'Heat No': heatsheet_json['heat']['heatNo'],
-                    'Total Wave': sailor.get('totalWave', ''),
-                    'Total Jump': sailor.get('totalJump', ''),
-                    'Total Points': sailor.get('totalPoints', ''),
-                    'Position': sailor.get('totalPos', ''),
-                }
-                
-                combined_info = {**heat_info, **base_info}
-                
-                # Process each score (wave or jump)
-                for score_type, score_list in sailor.get('scores', {}).items():
-                    for score in score_list:
-                        if not isinstance(score, dict):
-                            continue
-                        row = combined_info.copy()
-                        row['Type'] = 'Wave' if score_type == 'wave' else score.get('type', '')
-                        row['Score'] = score.get('score', None)
-                        row['Counting'] = 'Yes' if score.get('counting') else 'No'
-                        
-                        heat_data.append(row)
-            
-            print(f"Successfully parsed heatsheet for Heat ID {heat_id}")
-        except Exception as e:
-            print(f"Failed to retrieve or parse heatsheet for Heat ID {heat_id}. Error: {e}")
-            continue
-    
+    failed_heats = []
+
+    max_workers = max(1, int(max_workers))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_fetch_heatsheet, f"{api_base_url}{heat_id}.json")
+            for heat_id in heat_ids
+        ]
+
+        # Collect in submission order so the DataFrame is identical to a sequential fetch
+        for heat_id, future in zip(heat_ids, futures):
+            try:
+                heatsheet_json = future.result()
+                heat_data.extend(_parse_heatsheet(heatsheet_json, event_id, category_code, heat_id))
+                print(f"Successfully parsed heatsheet for Heat ID {heat_id}")
+            except Exception as e:
+                print(f"Failed to retrieve or parse heatsheet for Heat ID {heat_id}. Error: {e}")
+                failed_heats.append(heat_id)
+    return heat_data, failed_heats
+
+
+def _heat_scores_frame(heat_data):
+    """
+    Build the heat scores DataFrame from the parsed heatsheet rows.
+    """
     # Define the required columns for the output DataFrame
     required_columns = [
         'source',
@@ -357,13 +455,10 @@ def export_heat_data(event_id, category_code):
 # if __name__ == '__main__':
 # export_heat_data(363, 931)
 
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
 
 import re
-import requests
-from bs4 import BeautifulSoup
 
 def extract_wave_links_with_labels(event_id):
     """
@@ -376,8 +471,8 @@ def extract_wave_links_with_labels(event_id):
     Returns:
       dict: A dictionary with keys as labels and values as the extracted numeric code.
     """
-    url = f"https://www.pwaworldtour.com/index.php?id=193&type=21&tx_pwaevent_pi1%5Baction%5D=results&tx_pwaevent_pi1%5BshowUid%5D={event_id}.xml"
-    response = requests.get(url)
+    url = f"{PWA_BASE_URL}index.php?id=193&type=21&tx_pwaevent_pi1%5Baction%5D=results&tx_pwaevent_pi1%5BshowUid%5D={event_id}.xml"
+    response = http_get(url)
     if response.status_code != 200:
         raise Exception(f"Failed to retrieve data: {response.status_code}")
     
@@ -422,10 +517,10 @@ def extract_pwa_results(event_id, discipline_code):
       pd.DataFrame: A DataFrame with columns: source, event_id, eventDivisionid, Name, sail_no, athlete_id, place, Points.
     """
     # Build the URL with event_id and discipline_code
-    url = f"https://www.pwaworldtour.com/index.php?id=193&type=21&tx_pwaevent_pi1%5Baction%5D=results&tx_pwaevent_pi1%5BshowUid%5D={event_id}.xml&tx_pwaevent_pi1%5BeventDiscipline%5D={discipline_code}"
+    url = f"{PWA_BASE_URL}index.php?id=193&type=21&tx_pwaevent_pi1%5Baction%5D=results&tx_pwaevent_pi1%5BshowUid%5D={event_id}.xml&tx_pwaevent_pi1%5BeventDiscipline%5D={discipline_code}"
     
     # Request the XML/HTML content from the URL
-    response = requests.get(url)
+    response = http_get(url)
     if response.status_code != 200:
         raise Exception(f"Failed to retrieve data: {response.status_code}")
     
@@ -510,3 +605,128 @@ def extract_pwa_results(event_id, discipline_code):
 #         print("No results to save.")
 
 #extract_wave_links_with_labels(357)
+
+
+# =============================================================================
+# Browserless event-calendar crawl (replaces the Selenium walk in historical_scrape_pwa.py)
+# =============================================================================
+from urllib.parse import urljoin
+
+PWA_CALENDAR_PAGE_ID = 2310
+
+
+def _get_soup(url):
+    response = http_get(url)
+    if response.status_code != 200:
+        raise Exception(f"Failed to retrieve {url}: {response.status_code}")
+    return BeautifulSoup(response.content, 'lxml')
+
+
+def fetch_pwa_calendar_years(min_year=2016):
+    """
+    Read the year dropdown from the server-rendered event calendar page.
+
+    Returns:
+      list: [{'year': '2024', 'id': '2310'}, ...] for years >= min_year.
+    """
+    soup = _get_soup(f"{PWA_BASE_URL}index.php?id={PWA_CALENDAR_PAGE_ID}")
+    year_data = []
+    for year_element in soup.select(".nav-sub.select-box ul a[href]"):
+        year_text = year_element.get_text(strip=True)
+        try:
+            year_int = int(year_text)
+        except ValueError:
+            continue  # Skip if conversion fails
+        if year_int < min_year:
+            continue
+        year_id = year_element['href'].split("id=")[-1]
+        year_data.append({"year": year_text, "id": year_id})
+    return year_data
+
+
+def fetch_pwa_completed_events(year, year_id):
+    """
+    Extract the "Completed events" cards from a calendar year page.
+
+    Returns:
+      list: Event dicts with year, id, section, event_name, event_href, event_date.
+    """
+    soup = _get_soup(f"{PWA_BASE_URL}index.php?id={year_id}")
+    events = []
+    for section in soup.select(".event-calendar-grid"):
+        title = section.find("h3")
+        section_title = title.get_text(strip=True) if title else ""
+        if section_title.lower() != "completed events":
+            continue
+        for event in section.select("a.event-calendar-link"):
+            event_title = event.select_one(".event-title")
+            event_date = event.select_one(".event-date")
+            events.append({
+                "year": year,
+                "id": year_id,
+                "section": section_title,
+                "event_name": event_title.get_text(strip=True) if event_title else "",
+                "event_href": urljoin(PWA_BASE_URL, event.get("href", "")),
+                "event_date": event_date.get_text(strip=True) if event_date else ""
+            })
+    return events
+
+
+def fetch_pwa_ladder_codes(event_id):
+    """
+    Extract elimination ladder category codes and names for an event.
+
+    Returns:
+      tuple: (ladder_url, category_codes, elimination_names); the lists are
+      empty when the page shows the "no elimination ladders" message.
+    """
+    ladder_url = f"{PWA_BASE_URL}index.php?id=1900&type=21&tx_pwaevent_pi1%5Baction%5D=ladders&tx_pwaevent_pi1%5BshowUid%5D={event_id}"
+    soup = _get_soup(ladder_url)
+    category_codes = []
+    elimination_names = []
+    if soup.select_one(".no-entries-found-msg"):
+        return ladder_url, category_codes, elimination_names
+    for ladder_link in soup.select("a[href*='tx_pwaevent_pi1%5BshowUid%5D']"):
+        ladder_href = ladder_link['href']
+        if '%5Bladder%5D=' not in ladder_href:
+            continue
+        category_codes.append(ladder_href.split('%5Bladder%5D=')[-1].split('&')[0])
+        elimination_names.append(ladder_link.get_text(strip=True))
+    return ladder_url, category_codes, elimination_names
+
+
+def crawl_pwa_event_calendar(min_year=2016):
+    """
+    Crawl the PWA event calendar over plain HTTP (no browser).
+
+    Returns the same event dicts the Selenium crawl produced: year, id,
+    section, event_name, event_href, event_date, event_id, final_rank,
+    ladder_url and, where ladders exist, category_codes/elimination_names.
+    """
+    event_data_by_year = []
+    for year_info in fetch_pwa_calendar_years(min_year):
+        event_data_by_year.extend(fetch_pwa_completed_events(year_info["year"], year_info["id"]))
+
+    for event in event_data_by_year:
+        event_id = event['event_href'].split('%5BshowUid%5D=')[-1].split('&')[0]
+        event['event_id'] = event_id
+
+        try:
+            event['final_rank'] = extract_wave_links_with_labels(event_id)
+        except Exception as e:
+            print(f"Error collecting final rank data for event {event['event_name']} (ID: {event_id}): {e}")
+            event['final_rank'] = []
+
+        try:
+            ladder_url, category_codes, elimination_names = fetch_pwa_ladder_codes(event_id)
+        except Exception as e:
+            print(f"Failed to load ladder links for event: {event['event_name']} in year {event['year']}: {e}")
+            continue
+        event['ladder_url'] = ladder_url
+        if not category_codes:
+            print(f"No elimination ladders for event: {event['event_name']} in year {event['year']}")
+            continue
+        event['category_codes'] = category_codes
+        event['elimination_names'] = elimination_names
+
+    return event_data_by_year
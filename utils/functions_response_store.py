@@ -0,0 +1,173 @@
+## Content-addressed store of raw HTTP responses (record / replay)
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Store settings (env vars override the defaults)
+RESPONSE_STORE_DIR = os.getenv("RESPONSE_STORE_DIR", "response_store")
+RESPONSE_STORE_TTL = float(os.getenv("RESPONSE_STORE_TTL", "0")) or None   # seconds, None = never expire
+RESPONSE_STORE_MAX_BYTES = int(os.getenv("RESPONSE_STORE_MAX_BYTES", str(1024 ** 3)))
+
+
+class ReplayMissError(requests.RequestException):
+    """Raised in replay mode when a request has no stored response."""
+
+
+def request_key(method, url, params=None, json_body=None, data=None):
+    """
+    Content address for a request: sha256 of method + full URL + body hash.
+    JSON bodies (GraphQL query + variables) are hashed in canonical form so
+    key order and whitespace do not matter.
+    """
+    full_url = requests.Request(method, url, params=params).prepare().url
+    if json_body is not None:
+        body = json.dumps(json_body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    elif isinstance(data, str):
+        body = data.encode("utf-8")
+    else:
+        body = data or b""
+    body_hash = hashlib.sha256(body).hexdigest()
+    return hashlib.sha256(f"{method.upper()}\n{full_url}\n{body_hash}".encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """
+    On-disk response store. Bodies live under objects/<key[:2]>/<key>, and a
+    small SQLite index keeps URL, headers, store time and last access for
+    TTL expiry and least-recently-used eviction once max_bytes is exceeded.
+    """
+
+    def __init__(self, directory=RESPONSE_STORE_DIR, ttl=RESPONSE_STORE_TTL,
+                 max_bytes=RESPONSE_STORE_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                method TEXT,
+                url TEXT,
+                status_code INTEGER,
+                headers TEXT,
+                encoding TEXT,
+                size INTEGER,
+                stored_at REAL,
+                last_access REAL
+            )
+        """)
+        self._db.commit()
+
+    def _object_path(self, key):
+        return os.path.join(self.directory, "objects", key[:2], key)
+
+    def _is_expired(self, stored_at):
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def get(self, key):
+        """
+        Return the stored requests.Response for key, or None if missing/expired.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status_code, headers, encoding, stored_at FROM responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            url, status_code, headers, encoding, stored_at = row
+            if self._is_expired(stored_at):
+                self._delete(key)
+                self._db.commit()
+                return None
+            try:
+                with open(self._object_path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                self._delete(key)
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = body
+        response.url = url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response.from_store = True
+        return response
+
+    def put(self, key, method, response):
+        """
+        Store response under key, then evict least-recently-used entries
+        until the store is back under max_bytes.
+        """
+        body = response.content
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        headers = {k: v for k, v in response.headers.items()
+                   if k.lower() in ("content-type", "etag", "last-modified")}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, method.upper(), response.url, response.status_code, json.dumps(headers),
+                 response.encoding, len(body), now, now)
+            )
+            self._evict()
+            self._db.commit()
+
+    def _delete(self, key):
+        self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+        try:
+            os.remove(self._object_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        if self.ttl is not None:
+            expired = self._db.execute(
+                "SELECT key FROM responses WHERE stored_at < ?", (time.time() - self.ttl,)
+            ).fetchall()
+            for (key,) in expired:
+                self._delete(key)
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            self._delete(key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_response_store():
+    """Return the process-wide ResponseStore, creating it on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ResponseStore()
+    return _store
@@ -0,0 +1,332 @@
+## Typed Parquet storage for the Clean and Combined datasets
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+CLEAN_DIR = os.path.join("Historical Scrapes", "Data", "Clean")
+
+# Explicit dtypes per table. Columns a frame has that are not listed keep the
+# dtype pandas gives them; listed columns a frame lacks are ignored. Heat and
+# athlete IDs stay strings: PWA uses IDs like '841_1a' and 'BRA-105'.
+_ID = "Int64"
+_COMMON = {
+    "source": "category",
+    "event_id": _ID,
+    "division_id": _ID,
+    "eventDivisionId": _ID,
+    "heat_id": "string",
+    "athlete_id": "string",
+    "heat_id_athlete_id": "string",
+    "year": "Int64",
+}
+
+# Hive partition columns of the combined datasets (<root>/source=/year=/event_id=/).
+# Directory names are written as-is ('source=Live Heats', not 'Live%20Heats')
+# and read back with these types rather than pyarrow's dictionary-encoded guess.
+PARTITION_COLUMNS = ["source", "year", "event_id"]
+PARTITIONING = ds.HivePartitioning(
+    pa.schema([("source", pa.string()), ("year", pa.int64()), ("event_id", pa.int64())])
+)
+# Directory value of a missing year / event_id (read back as null)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+SCHEMAS = {
+    "heat_scores": {
+        **_COMMON,
+        "score": "float64",
+        "modified_total": "float64",
+        "modifier": "string",
+        "type": "category",
+        "counting": "boolean",
+        "total_wave": "float64",
+        "total_jump": "float64",
+        "total_points": "float64",
+    },
+    "heat_results": {
+        **_COMMON,
+        "result_total": "float64",
+        "win_by": "float64",
+        "needs": "float64",
+        "place": "Int64",
+        "round": "category",
+        "round_position": "Int64",
+    },
+    "heat_progression": {
+        **_COMMON,
+        "sex": "category",
+        "round_name": "category",
+        "round_order": "Int64",
+        "heat_order": "string",
+        "total_winners_progressing": "Int64",
+        "winners_progressing_to_round_order": "Int64",
+        "total_losers_progressing": "Int64",
+        "losers_progressing_to_round_order": "Int64",
+        "Total_Round_Heats": "Int64",
+        "Max_Heats": "Int64",
+        "actual_heat_order": "Int64",
+        "y_pos": "float64",
+    },
+    "final_ranks": {
+        **_COMMON,
+        "name": "string",
+        "place": "Int64",
+        "incomplete": "boolean",
+    },
+    "events": {
+        **_COMMON,
+        "event_name": "string",
+        "results_status": "category",
+        "day_window": "Int64",
+        "start_date": "string",
+        "finish_date": "string",
+        "location": "category",
+        "stars": "Int64",
+        "division_name": "category",
+        "sex": "category",
+        "event_link": "string",
+        "elimination_name": "string",
+        "elimination_id": _ID,
+        "elimination_type": "category",
+        "standard_event_name": "string",
+    },
+}
+
+# Spellings of the counting flag across sources (IWT True/False, PWA Yes/No)
+_BOOLEAN_VALUES = {"true": True, "yes": True, "1": True, "false": False, "no": False, "0": False}
+
+
+def _cast(series, dtype):
+    if dtype == "boolean":
+        if series.dtype == "boolean":
+            return series
+        text = series.astype("string").str.strip().str.lower()
+        return text.map(_BOOLEAN_VALUES).astype("boolean")
+    if dtype in ("Int64", "float64"):
+        return pd.to_numeric(series).astype(dtype)
+    return series.astype(dtype)
+
+
+def apply_schema(df, table):
+    """
+    Cast df's columns to SCHEMAS[table] and drop a stray 'Unnamed: 0' index
+    column left by CSVs written with the index.
+    """
+    df = df.drop(columns="Unnamed: 0", errors="ignore")
+    schema = SCHEMAS[table]
+    return df.assign(**{
+        col: _cast(df[col], dtype)
+        for col, dtype in schema.items()
+        if col in df.columns and str(df[col].dtype) != dtype
+    })
+
+
+def write_table(df, table, path, export_csv=False):
+    """
+    Write df as Parquet with the table's schema applied. path is the
+    .parquet file; with export_csv=True a CSV copy (no index) is written next
+    to it. Returns the typed frame.
+    """
+    df = apply_schema(df, table)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    df.to_parquet(path, index=False)
+    if export_csv:
+        df.to_csv(os.path.splitext(path)[0] + ".csv", index=False)
+    return df
+
+
+def read_table(table, path, columns=None, compact=False, keys=None):
+    """
+    Read a table written by write_table. If only the CSV next to path exists
+    (data from before the Parquet switch), it is read and typed instead.
+    compact / keys: see compact_frame.
+    """
+    if os.path.exists(path):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        df = apply_schema(pd.read_csv(csv_path, usecols=columns, low_memory=False), table)
+    return compact_frame(df, keys) if compact or keys is not None else df
+
+
+def add_event_year(df, events_df):
+    """
+    Add each row's event year from the events table, matched on event_id and
+    source (case-insensitive: 'Live Heats' rows match 'live heats' events).
+    """
+    years = (
+        events_df.assign(_source=events_df["source"].astype(str).str.lower())
+        .drop_duplicates(["_source", "event_id"])[["_source", "event_id", "year"]]
+    )
+    keyed = df.drop(columns="year", errors="ignore").assign(_source=df["source"].astype(str).str.lower())
+    merged = keyed.merge(years, on=["_source", "event_id"], how="left", validate="many_to_one")
+    return merged.drop(columns="_source")
+
+
+def write_partitioned(df, table, root, export_csv=False):
+    """
+    Write df (which must have a year column, see add_event_year) as a
+    hive-partitioned dataset root/source=<s>/year=<y>/event_id=<id>/, so
+    read_partitioned only opens the partitions a query needs. root is
+    rewritten from scratch; export_csv=True also writes root + '.csv'.
+    Returns the typed frame.
+    """
+    df = apply_schema(df, table)
+    # One Arrow schema for every file (a column that is all null in one
+    # partition keeps its type), without pandas metadata: that would describe
+    # the partition columns, which live in the directory names
+    data = pa.Table.from_pandas(df.drop(columns=PARTITION_COLUMNS), preserve_index=False)
+    data = data.replace_schema_metadata(None)
+    shutil.rmtree(root, ignore_errors=True)
+    parts = df.groupby(PARTITION_COLUMNS, dropna=False, observed=True, sort=False).indices
+    for values, rows in parts.items():
+        part_dir = os.path.join(root, *(
+            f"{col}={NULL_PARTITION if pd.isna(value) else value}"
+            for col, value in zip(PARTITION_COLUMNS, values)
+        ))
+        os.makedirs(part_dir, exist_ok=True)
+        pq.write_table(data.take(rows), os.path.join(part_dir, "part-0.parquet"))
+    if export_csv:
+        df.to_csv(root + ".csv", index=False)
+    return df
+
+
+def read_partitioned(table, root, source=None, years=None, event_ids=None, athlete_ids=None,
+                     columns=None, compact=True, keys=True):
+    """
+    Read a dataset written by write_partitioned, filtered at the partition
+    level on source ('Live Heats' / 'PWA'), years (a year or an inclusive
+    (first, last) range) and event_ids; athlete_ids is applied to the rows of
+    the partitions that remain. Filters left as None are not applied.
+
+    The frame comes back compacted (see compact_frame) with heat and athlete
+    IDs coded by keys, SHARED_KEYS by default, so the tables loaded in one
+    process join on integers. keys=None keeps the IDs as strings;
+    compact=False returns the typed frame as stored.
+    """
+    filters = []
+    if source is not None:
+        filters.append(ds.field("source").isin([source] if isinstance(source, str) else list(source)))
+    if years is not None:
+        first, last = (years, years) if isinstance(years, int) else years
+        filters += [ds.field("year") >= first, ds.field("year") <= last]
+    if event_ids is not None:
+        filters.append(ds.field("event_id").isin([int(e) for e in event_ids]))
+    if athlete_ids is not None:
+        filters.append(ds.field("athlete_id").isin([str(a) for a in athlete_ids]))
+
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING)
+    expression = None
+    for condition in filters:
+        expression = condition if expression is None else expression & condition
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+    df = apply_schema(df, table)
+    if not compact:
+        return df
+    return compact_frame(df, SHARED_KEYS if keys is True else keys)
+
+
+class KeyDictionary:
+    """
+    Integer codes for heat and athlete IDs, shared by every frame encoded
+    with the same instance so those frames join on integers. Codes are
+    assigned in first-seen order and never change; -1 marks a missing ID.
+    The composite heat/athlete key is heat code * 2**32 + athlete code.
+    """
+
+    COLUMNS = ("heat_id", "athlete_id")
+
+    def __init__(self):
+        self._values = {column: pd.Index([], dtype=object) for column in self.COLUMNS}
+
+    def encode(self, column, values):
+        """Return int32 codes for values, adding unseen IDs to the dictionary."""
+        values = pd.Series(values, dtype=object).where(pd.notna(values), None).to_numpy()
+        index = self._values[column]
+        codes = index.get_indexer(values)
+        unseen = pd.unique(values[(codes == -1) & pd.notna(values)])
+        if len(unseen):
+            index = self._values[column] = index.append(pd.Index(unseen, dtype=object))
+            codes = index.get_indexer(values)
+        return codes.astype(np.int32)
+
+    def decode(self, column, codes):
+        """Return the IDs for codes (None for -1)."""
+        codes = np.asarray(codes)
+        values = self._values[column].to_numpy()[codes]
+        return np.where(codes == -1, None, values)
+
+    @staticmethod
+    def composite(heat_codes, athlete_codes):
+        """int64 heat/athlete key; -1 when either code is missing."""
+        heat_codes = np.asarray(heat_codes, dtype=np.int64)
+        athlete_codes = np.asarray(athlete_codes, dtype=np.int64)
+        key = (heat_codes << 32) | athlete_codes
+        return np.where((heat_codes == -1) | (athlete_codes == -1), -1, key)
+
+    @staticmethod
+    def split(keys):
+        """(heat codes, athlete codes) of composite keys."""
+        keys = np.asarray(keys, dtype=np.int64)
+        missing = keys == -1
+        heat_codes = np.where(missing, -1, keys >> 32).astype(np.int32)
+        athlete_codes = np.where(missing, -1, keys & 0xFFFFFFFF).astype(np.int32)
+        return heat_codes, athlete_codes
+
+
+# Codes read_partitioned gives heat / athlete IDs by default (decode with
+# SHARED_KEYS.decode / SHARED_KEYS.split)
+SHARED_KEYS = KeyDictionary()
+
+
+def _smallest_int(series):
+    """Downcast an integer column (numpy or nullable) to the smallest dtype holding it."""
+    nullable = isinstance(series.dtype, pd.Int64Dtype) or str(series.dtype) in ("Int8", "Int16", "Int32")
+    low, high = series.min(), series.max()
+    for bits in (8, 16, 32):
+        info = np.iinfo(f"int{bits}")
+        if pd.isna(low) or (info.min <= low and high <= info.max):
+            return series.astype(f"Int{bits}" if nullable else f"int{bits}")
+    return series
+
+
+def compact_frame(df, keys=None, max_category_ratio=0.5):
+    """
+    Shrink a loaded frame for analysis:
+      - text columns with few distinct values (at most max_category_ratio of
+        the rows) become categoricals
+      - integer columns take the smallest integer dtype that holds them
+      - float columns become float32 only where that is lossless, so scores
+        keep their exact values
+    With a KeyDictionary, heat_id and athlete_id are replaced by its int32
+    codes and heat_id_athlete_id by the int64 composite key, so joins between
+    frames compacted with the same dictionary run on integers; decode them
+    with keys.decode / keys.split.
+    """
+    df = df.copy()
+    if keys is not None:
+        for column in KeyDictionary.COLUMNS:
+            if column in df.columns:
+                df[column] = keys.encode(column, df[column])
+        if "heat_id_athlete_id" in df.columns and set(KeyDictionary.COLUMNS) <= set(df.columns):
+            df["heat_id_athlete_id"] = keys.composite(df["heat_id"], df["athlete_id"])
+
+    for column in df.columns:
+        series = df[column]
+        kind = series.dtype.kind
+        if isinstance(series.dtype, pd.CategoricalDtype) or kind == "b" or str(series.dtype) == "boolean":
+            continue
+        if kind in "iu" or str(series.dtype).startswith("Int"):
+            if keys is None or column not in KeyDictionary.COLUMNS + ("heat_id_athlete_id",):
+                df[column] = _smallest_int(series)
+        elif kind == "f":
+            as_float32 = series.astype(np.float32)
+            if ((as_float32.astype(np.float64) == series) | series.isna()).all():
+                df[column] = as_float32
+        elif kind in "OTU" or isinstance(series.dtype, pd.StringDtype):
+            if series.nunique() <= max_category_ratio * len(series):
+                df[column] = series.astype("category")
+    return df